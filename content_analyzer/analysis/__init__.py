@@ -0,0 +1,31 @@
+"""
+LegalKlarity Analysis - Helpers around the LLM document analysis: the
+shared LLM clients and their circuit breaker and deadlines, the result
+schema, the analysis result cache,
+map-reduce analysis of long documents, incremental analysis of revised
+versions, compaction of prompt input, retrieval of the chunks relevant to
+a chat question, parsing of streamed and malformed output and an offline
+stand-in for the model.
+"""
+from .schema import ANALYSIS_FIELDS, is_valid_analysis
+from .cache import AnalysisCache, get_analysis_cache, normalize_text
+from .resilience import (
+    CircuitBreaker, CircuitOpenError, DeadlineExceeded, run_with_deadline, get_deadline_pool
+)
+from .llm import (
+    LLMProvider, LLMClient, LLMRegistry, PROVIDERS, PROFILES,
+    get_llm_client, get_llm_registry, prewarm_llm
+)
+from .mapreduce import (
+    split_sections, merge_analyses, map_reduce_analysis, get_section_pool,
+    ANALYSIS_SECTION_CHARS, ANALYSIS_MAX_SECTIONS
+)
+from .incremental import incremental_analysis, split_clauses, ClauseDiff
+from .compaction import (
+    Compaction, compact_text, clean_text, fit_to_budget, estimate_tokens,
+    CHARS_PER_TOKEN, PAGE_BREAK, ANALYSIS_TOKEN_BUDGET
+)
+from .retrieval import ChunkIndex, IndexCache, get_index_cache, tokenize, CHAT_TOP_K, CHAT_TOKEN_BUDGET
+from .streaming import StreamingFieldParser
+from .salvage import SalvagedAnalysis, salvage_analysis, repair_json
+from .mock import MockProvider, MockSettings, LatencyModel, MockLLMError
@@ -0,0 +1,81 @@
+"""
+Analysis result cache - Stores LLM analyses on disk keyed by a hash of the
+normalized document text, the document type, the prompt version and the
+model, so identical documents are not sent to the model again.
+
+Built on the extraction package's DiskCache: one SQLite database in WAL
+mode shared by every gunicorn worker, bounded in size with LRU eviction,
+and with a TTL so analyses are refreshed periodically.
+"""
+import os
+import json
+import zlib
+import hashlib
+import unicodedata
+
+from extraction import DiskCache
+
+from .schema import is_valid_analysis
+
+
+def normalize_text(text):
+    """
+    Text with Unicode normalized and whitespace runs collapsed, so
+    re-extractions that differ only in layout share a cache entry
+    """
+    return " ".join(unicodedata.normalize("NFC", text or "").split())
+
+
+class AnalysisCache:
+    """
+    Caches successful analyses by document content and analysis settings
+
+    Args:
+        cache_dir (str): Directory for the SQLite database
+        max_bytes (int): Total size of stored analyses before LRU eviction
+        ttl_seconds (int): Age after which a cached analysis is recomputed
+    """
+
+    def __init__(self, cache_dir, max_bytes, ttl_seconds):
+        self.store = DiskCache(os.path.join(cache_dir, 'analysis.sqlite3'), max_bytes, ttl_seconds=ttl_seconds)
+
+    @staticmethod
+    def make_key(text, document_type, prompt_version, model):
+        digest = hashlib.sha256(normalize_text(text).encode('utf-8')).hexdigest()
+        return f"p{prompt_version}:{model}:{document_type}:{digest}"
+
+    def get(self, key):
+        value = self.store.get(key)
+        if value is None:
+            return None
+        return json.loads(zlib.decompress(value).decode('utf-8'))
+
+    def set(self, key, analysis):
+        """
+        Store an analysis; anything that is not a complete, schema-valid
+        result (fallbacks, error dicts) is ignored
+        """
+        if not is_valid_analysis(analysis):
+            return False
+        self.store.set(key, zlib.compress(json.dumps(analysis).encode('utf-8')))
+        return True
+
+    def stats(self):
+        return self.store.stats()
+
+
+# Global analysis cache instance
+analysis_cache = None
+
+
+def get_analysis_cache():
+    """
+    Get the global analysis cache instance
+    """
+    global analysis_cache
+    if analysis_cache is None:
+        cache_dir = os.getenv('ANALYSIS_CACHE_DIR', 'analysis_cache')
+        max_mb = int(os.getenv('ANALYSIS_CACHE_MAX_MB', '64'))
+        ttl = int(os.getenv('ANALYSIS_CACHE_TTL_SECONDS', str(7 * 24 * 3600)))
+        analysis_cache = AnalysisCache(cache_dir, max_mb * 1024 * 1024, ttl)
+    return analysis_cache
@@ -0,0 +1,315 @@
+"""
+Prompt input compaction - Cleans extracted text before it is sent to the
+model and fits it into a token budget.
+
+Extraction leaves page headers and footers repeated on every page, page
+numbers, words hyphenated across line breaks, whitespace runs and
+boilerplate pasted more than once. Pages are separated by PAGE_BREAK, so
+headers, footers and bare page numbers are only looked for where they
+sit: at the top or bottom of a page. None of it helps the model, and every
+token costs latency and money. When the cleaned text is still over budget
+the most informative passages (obligations, dates, amounts, headings,
+words from the user's question) are kept in document order rather than
+cutting the text off at a fixed length.
+"""
+import os
+import re
+import math
+import unicodedata
+from collections import Counter
+
+from .mapreduce import split_sections, SECTION_HEADING, ANALYSIS_SECTION_CHARS, ANALYSIS_MAX_SECTIONS
+
+
+# Rough size of a token for English prose with Gemini and similar models
+CHARS_PER_TOKEN = 4
+
+# Estimated tokens of document text sent for one analysis (across all its
+# sections), after headers, footers and other noise are removed; the least
+# informative passages are left out beyond it
+ANALYSIS_TOKEN_BUDGET = int(os.getenv(
+    'ANALYSIS_TOKEN_BUDGET', str(ANALYSIS_MAX_SECTIONS * ANALYSIS_SECTION_CHARS // CHARS_PER_TOKEN)
+))
+
+# Size of the passages the budget selects between
+PASSAGE_CHARS = 1200
+
+# Extractors put this between the pages of a document (as pdftotext does)
+PAGE_BREAK = "\f"
+
+# Lines at the top and at the bottom of a page where headers, footers and
+# page numbers sit
+EDGE_LINES = 2
+
+# A short line at a page edge on this many pages is a running header or footer
+REPEAT_MIN = 3
+REPEAT_MAX_LINE_CHARS = 120
+
+# Shorter lines and paragraphs are never treated as duplicated boilerplate
+DUPLICATE_MIN_CHARS = 200
+
+GAP_MARKER = "[...]"
+
+# "Page 3", "page 3 of 10" and "- 3 -" are page numbers wherever they stand
+# on their own line. "3 of 10" and a bare "3" are only taken for page numbers
+# at a page edge (a bare number only when the numbers follow the pages), since
+# elsewhere they are usually quantities, amounts or years
+PAGE_LABEL = r"(?:page\s*\d{1,4}(?:\s*(?:of|/)\s*\d{1,4})?|[-–—]\s*\d{1,4}\s*[-–—])"
+PAGE_NUMBER = rf"(?:{PAGE_LABEL}|(?<![\d/.-])\d{{1,4}}\s*(?:of|/)\s*\d{{1,4}}(?![\d/.-]))"
+PAGE_LABEL_LINE = re.compile(rf"^\s*{PAGE_LABEL}\s*$", re.IGNORECASE)
+PAGE_OF_LINE = re.compile(r"^\s*\d{1,4}\s+of\s+\d{1,4}\s*$", re.IGNORECASE)
+BARE_NUMBER_LINE = re.compile(r"^\s*(\d{1,4})\s*$")
+PAGE_NUMBER_IN_LINE = re.compile(rf"^\s*{PAGE_LABEL}\W*|\W*{PAGE_NUMBER}\s*$", re.IGNORECASE)
+
+# Lines with a date or an amount carry content (signature dates, fees) even
+# when they look alike, so they are never taken for headers or footers
+MONTH = r"(?:jan|feb|mar|apr|may|jun|jul|aug|sep|sept|oct|nov|dec)[a-z]*\.?"
+DATE_OR_AMOUNT = re.compile(
+    rf"\b\d{{1,4}}[/.-]\d{{1,2}}[/.-]\d{{1,4}}\b|\b\d{{1,2}}(?:st|nd|rd|th)?\s+{MONTH}\s+\d{{2,4}}\b|"
+    rf"\b{MONTH}\s+\d{{1,2}}(?:st|nd|rd|th)?,?\s+\d{{2,4}}\b|[$€£¥₹]\s*\d|"
+    r"\b\d[\d,.]*\s*(?:usd|eur|gbp|inr|dollars|euros|pounds|rupees)\b|\b(?:rs|inr|usd)\.?\s*\d|\bdated?\b",
+    re.IGNORECASE
+)
+HYPHENATED_BREAK = re.compile(r"(\w)[-\u00ad]\n[ \t]*([a-z])")
+CONTROL_CHARS = re.compile(r"[\x00-\x08\x0b\x0e-\x1f\x7f\u200b\ufeff]")
+
+INFORMATIVE = re.compile(
+    r"\b(?:shall|must|agree[sd]?|terminat\w*|liab\w*|indemn\w*|pay\w*|fee\w*|rent|deposit|penalt\w*|"
+    r"interest|notice|warrant\w*|breach\w*|confidential\w*|govern\w*|jurisdiction|arbitration|"
+    r"obligat\w*|effective|expir\w*|renew\w*|party|parties)\b",
+    re.IGNORECASE
+)
+FIGURE = re.compile(r"\d")
+
+
+def estimate_tokens(text):
+    """
+    Approximate token count of text (about four characters per token)
+    """
+    return math.ceil(len(text or "") / CHARS_PER_TOKEN)
+
+
+class Compaction:
+    """
+    Compacted text and what was removed to get it
+
+    Attributes:
+        text (str): Text to put in the prompt
+        original_tokens (int): Estimated tokens before compaction
+        tokens (int): Estimated tokens after compaction
+        removed (dict): Count of lines or paragraphs removed by each step
+        omitted_passages (int): Passages left out to meet the token budget
+    """
+
+    def __init__(self, text, original_tokens, removed, omitted_passages=0):
+        self.text = text
+        self.original_tokens = original_tokens
+        self.tokens = estimate_tokens(text)
+        self.removed = removed
+        self.omitted_passages = omitted_passages
+
+    @property
+    def reduction(self):
+        """
+        Share of the estimated tokens removed, from 0 to 1
+        """
+        if not self.original_tokens:
+            return 0.0
+        return max(0.0, 1 - self.tokens / self.original_tokens)
+
+    def report(self):
+        return {
+            "original_tokens": self.original_tokens,
+            "tokens": self.tokens,
+            "reduction": round(self.reduction, 3),
+            "removed": dict(self.removed),
+            "omitted_passages": self.omitted_passages,
+        }
+
+
+def _line_key(line):
+    return " ".join(PAGE_NUMBER_IN_LINE.sub(" ", line).lower().split())
+
+
+def _edges(lines):
+    # Indexes of the first and last EDGE_LINES non-empty lines of a page
+    filled = [i for i, line in enumerate(lines) if line]
+    return sorted(set(filled[:EDGE_LINES] + filled[-EDGE_LINES:]))
+
+
+def _page_numbers(pages, edges):
+    """
+    (page, line) of the page numbers at page edges
+
+    Explicit forms ("3 of 10") are taken as they are. A bare number is a
+    page number when it is at most its page's position in the document
+    (front matter may be unnumbered) and at least one other page agrees
+    on the offset between the two; a single page may only be numbered 1.
+    """
+    found, bare = set(), []
+    for p, lines in enumerate(pages):
+        for i in edges[p]:
+            if PAGE_LABEL_LINE.match(lines[i]) or PAGE_OF_LINE.match(lines[i]):
+                found.add((p, i))
+                continue
+            match = BARE_NUMBER_LINE.match(lines[i])
+            if match and 1 <= int(match.group(1)) <= p + 1:
+                bare.append((p, i, int(match.group(1)) - p))
+    offsets = Counter(offset for _, offset in {(p, offset) for p, _, offset in bare})
+    for p, i, offset in bare:
+        if offsets[offset] >= 2 or (len(pages) == 1 and offset == 1):
+            found.add((p, i))
+    return found
+
+
+def _running_lines(pages, edges):
+    """
+    Header and footer keys: short lines at an edge of REPEAT_MIN or more
+    pages (ignoring their page numbers). Lines with a date or an amount
+    are never counted.
+    """
+    pages_by_key = {}
+    for p, lines in enumerate(pages):
+        for i in edges[p]:
+            line = lines[i]
+            if len(line) <= REPEAT_MAX_LINE_CHARS and not DATE_OR_AMOUNT.search(line):
+                key = _line_key(line)
+                if key:
+                    pages_by_key.setdefault(key, set()).add(p)
+    return {key for key, on_pages in pages_by_key.items() if len(on_pages) >= REPEAT_MIN}
+
+
+def clean_text(text):
+    """
+    Remove extraction noise from text
+
+    Joins words hyphenated across line breaks, collapses whitespace, drops
+    page-number lines, repeats of running headers and footers (short lines
+    at the top or bottom of REPEAT_MIN or more pages; the first occurrence
+    is kept) and repeated lines and paragraphs of boilerplate. Lines in
+    the body of a page are only ever removed as duplicated boilerplate.
+
+    Returns:
+        tuple: (cleaned text, dict of removal counts)
+    """
+    removed = {"hyphenations": 0, "page_numbers": 0, "headers_footers": 0, "duplicates": 0}
+    text = unicodedata.normalize("NFKC", text or "").replace("\r\n", "\n").replace("\r", "\n")
+    text = CONTROL_CHARS.sub("", text)
+    text, removed["hyphenations"] = HYPHENATED_BREAK.subn(r"\1\2", text)
+
+    pages = [[" ".join(line.split()) for line in page.split("\n")] for page in text.split(PAGE_BREAK)]
+    edges = [_edges(lines) for lines in pages]
+    page_numbers = _page_numbers(pages, edges)
+    running = _running_lines(pages, edges)
+
+    kept, seen, seen_long = [], set(), set()
+    for p, lines in enumerate(pages):
+        for i, line in enumerate(lines):
+            if (p, i) in page_numbers or (line and PAGE_LABEL_LINE.match(line)):
+                removed["page_numbers"] += 1
+                continue
+            if i in edges[p] and _line_key(line) in running:
+                key = _line_key(line)
+                if key in seen:
+                    removed["headers_footers"] += 1
+                    continue
+                seen.add(key)
+            elif len(line) >= DUPLICATE_MIN_CHARS:
+                key = line.lower()
+                if key in seen_long:
+                    removed["duplicates"] += 1
+                    continue
+                seen_long.add(key)
+            kept.append(line)
+
+    paragraphs, seen = [], set()
+    for paragraph in re.split(r"\n{2,}", "\n".join(kept)):
+        paragraph = paragraph.strip("\n")
+        if not paragraph:
+            continue
+        if len(paragraph) >= DUPLICATE_MIN_CHARS:
+            key = paragraph.lower()
+            if key in seen:
+                removed["duplicates"] += 1
+                continue
+            seen.add(key)
+        paragraphs.append(paragraph)
+    return "\n\n".join(paragraphs), removed
+
+
+def _passage_score(index, passage, query_words):
+    words = re.findall(r"\w+", passage.lower())
+    if not words:
+        return 0.0
+    score = len(INFORMATIVE.findall(passage)) + 0.2 * len(FIGURE.findall(passage))
+    score += 3 * len(SECTION_HEADING.findall(passage))
+    if query_words:
+        score += 5 * sum(1 for w in words if w in query_words)
+    # Repetitive runs (tables of blanks, OCR noise) carry little information
+    score *= len(set(words)) / len(words)
+    if index == 0:
+        # The opening names the document and its parties
+        score += 50
+    return score / estimate_tokens(passage)
+
+
+def fit_to_budget(text, max_tokens, query=None):
+    """
+    Keep the most informative passages of text that fit in max_tokens
+
+    Passages are ranked by informative words per token, with the opening
+    passage and passages sharing words with query favoured, and are
+    returned in document order with GAP_MARKER where text was left out.
+
+    Args:
+        text (str): Cleaned text
+        max_tokens (int): Token budget; 0 or None keeps everything
+        query (str, optional): Question the text should help answer
+
+    Returns:
+        tuple: (text within the budget, number of passages omitted)
+    """
+    if not max_tokens or estimate_tokens(text) <= max_tokens:
+        return text, 0
+    passages = split_sections(text, PASSAGE_CHARS)
+    query_words = {w for w in re.findall(r"\w+", (query or "").lower()) if len(w) > 3}
+    ranked = sorted(range(len(passages)), key=lambda i: -_passage_score(i, passages[i], query_words))
+
+    # Leave room for the gap markers
+    budget = max_tokens * CHARS_PER_TOKEN
+    chosen, used = set(), 0
+    for i in ranked:
+        size = len(passages[i]) + len(GAP_MARKER) + 2
+        if used + size <= budget:
+            chosen.add(i)
+            used += size
+    if not chosen:
+        return text[:budget], len(passages)
+
+    parts, previous = [], -1
+    for i in sorted(chosen):
+        if i != previous + 1:
+            parts.append(GAP_MARKER)
+        parts.append(passages[i].strip())
+        previous = i
+    if previous != len(passages) - 1:
+        parts.append(GAP_MARKER)
+    return "\n\n".join(parts), len(passages) - len(chosen)
+
+
+def compact_text(text, max_tokens=None, query=None):
+    """
+    Clean text and fit it into a token budget
+
+    Args:
+        text (str): Extracted document text
+        max_tokens (int, optional): Token budget; 0 or None only cleans
+        query (str, optional): Question the text should help answer
+
+    Returns:
+        Compaction: The compacted text and a report of the reduction
+    """
+    original_tokens = estimate_tokens(text)
+    cleaned, removed = clean_text(text)
+    fitted, omitted = fit_to_budget(cleaned, max_tokens, query)
+    return Compaction(fitted, original_tokens, removed, omitted)
@@ -0,0 +1,172 @@
+"""
+Incremental re-analysis - Analyzes a revised version of a document by
+sending only the clauses that changed since a previous, already analyzed
+version, and folding the result into the previous analysis.
+
+Negotiated contracts come back with small redlines; a 30-page agreement
+with two edited clauses then costs one small model call instead of a full
+analysis.
+"""
+import difflib
+
+from .schema import is_valid_analysis
+from .mapreduce import SECTION_HEADING, split_sections, merge_analyses, _norm
+from .retrieval import tokenize
+
+
+# Clauses without a heading inside them are split into paragraphs beyond this
+CLAUSE_MAX_CHARS = 3000
+
+# Entry field quoted from the document; an entry whose value was in the
+# removed text and is no longer in the document is dropped
+QUOTED_FIELDS = {
+    "key_terms": "term",
+    "main_clauses": "name",
+    "critical_dates": "date",
+    "parties": "name",
+}
+
+# Fields derived from the clauses rather than quoted from them; an entry is
+# tied to removed or edited clauses when it uses a word found there and
+# nowhere in the unchanged text
+DERIVED_FIELDS = ("obligations", "risks", "recommendations", "compliance_issues", "next_steps")
+
+# Words are compared on their first letters so "indemnify" matches "indemnity"
+TERM_PREFIX_CHARS = 6
+
+NOT_SPECIFIED = ("not available", "not analyzed", "not specified", "")
+
+
+def split_clauses(text):
+    """
+    Split text into clauses at section headings (paragraphs for long
+    stretches without headings)
+
+    Returns:
+        list: Clause texts in document order
+    """
+    starts = sorted({0, *(m.start() for m in SECTION_HEADING.finditer(text))})
+    clauses = []
+    for a, b in zip(starts, starts[1:] + [len(text)]):
+        clause = text[a:b]
+        clauses.extend(split_sections(clause, CLAUSE_MAX_CHARS) if len(clause) > CLAUSE_MAX_CHARS else [clause])
+    return [clause for clause in clauses if clause.strip()]
+
+
+class ClauseDiff:
+    """
+    Clause-level difference between two versions of a document
+
+    Attributes:
+        total (int): Clauses in the new version
+        changed (list): New or edited clauses of the new version
+        removed (list): Deleted or edited clauses of the previous version
+        unchanged (list): Clauses of the new version found in the previous one
+    """
+
+    def __init__(self, old_text, new_text):
+        old, new = split_clauses(old_text), split_clauses(new_text)
+        matcher = difflib.SequenceMatcher(None, [_norm(c) for c in old], [_norm(c) for c in new], autojunk=False)
+        self.total = len(new)
+        self.changed, self.removed, self.unchanged = [], [], []
+        for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+            if tag == "equal":
+                self.unchanged.extend(new[j1:j2])
+            else:
+                self.removed.extend(old[i1:i2])
+                self.changed.extend(new[j1:j2])
+        self.changed_ratio = sum(len(c) for c in self.changed) / max(1, len(new_text))
+
+    def report(self):
+        return {
+            "clauses": self.total,
+            "changed": len(self.changed),
+            "removed": len(self.removed),
+            "changed_ratio": round(self.changed_ratio, 3),
+        }
+
+
+def _terms(text):
+    return {word[:TERM_PREFIX_CHARS] for word in tokenize(text) if len(word) >= 4}
+
+
+def _entry_text(entry):
+    if isinstance(entry, dict):
+        return " ".join(str(v) for k, v in entry.items() if k != "severity")
+    return str(entry or "")
+
+
+def _prune_stale(analysis, removed_text, text, unchanged_text):
+    """
+    Previous analysis without entries quoting text that was removed, and
+    without the derived entries (risks, obligations, ...) tied to removed
+    or edited clauses; the analysis of the changed clauses re-derives
+    those that still apply
+    """
+    removed_norm, text_norm = f" {_norm(removed_text)} ", f" {_norm(text)} "
+    stale_terms = _terms(removed_text) - _terms(unchanged_text)
+    pruned = dict(analysis)
+    for field in DERIVED_FIELDS:
+        pruned[field] = [
+            entry for entry in analysis.get(field) or []
+            if not (_terms(_entry_text(entry)) & stale_terms)
+        ]
+    for field, quoted in QUOTED_FIELDS.items():
+        entries = []
+        for entry in analysis.get(field) or []:
+            value = f" {_norm(entry.get(quoted))} " if isinstance(entry, dict) else ""
+            if value.strip() and value in removed_norm and value not in text_norm:
+                continue
+            entries.append(entry)
+        pruned[field] = entries
+    return pruned
+
+
+def incremental_analysis(previous_text, previous_analysis, text, analyze_changes, max_changed_ratio):
+    """
+    Analysis of text built from the analysis of its previous version
+
+    Args:
+        previous_text (str): Text of the analyzed previous version
+        previous_analysis (dict): Its analysis
+        text (str): Text of the new version
+        analyze_changes (callable): analyze_changes(changed clauses text) ->
+            analysis dict of just those clauses; may raise
+        max_changed_ratio (float): Share of the new text that may have
+            changed before a full analysis is the better deal
+
+    Returns:
+        dict or None: Merged analysis with an "incremental" entry
+            describing the diff, or None when the previous analysis is
+            unusable or too much changed
+    """
+    if not is_valid_analysis(previous_analysis):
+        return None
+    diff = ClauseDiff(previous_text, text)
+    if diff.changed_ratio > max_changed_ratio:
+        print(f"Incremental analysis skipped: {diff.changed_ratio:.0%} of the text changed")
+        return None
+
+    previous = {k: v for k, v in previous_analysis.items() if k not in ("incremental", "sections", "compaction")}
+    previous = _prune_stale(previous, "\n".join(diff.removed), text, "\n".join(diff.unchanged))
+    if not diff.changed:
+        merged = previous
+    else:
+        changes = analyze_changes("\n".join(diff.changed))
+        # Updated entries come first and replace previous ones for the
+        # same risk, party, ... (an edit can lower a risk's severity)
+        merged = merge_analyses([changes, previous], prefer_first=True)
+        # The summary and missing clauses describe the whole document; a
+        # section-scoped call can only see part of it
+        merged["summary"] = previous.get("summary") or merged["summary"]
+        if _norm(changes.get("jurisdiction")) in NOT_SPECIFIED:
+            merged["jurisdiction"] = previous.get("jurisdiction", merged["jurisdiction"])
+        found = {_norm(c.get("name")) for c in merged["main_clauses"] if isinstance(c, dict)}
+        merged["missing_clauses"] = [
+            c for c in previous.get("missing_clauses") or []
+            if not (isinstance(c, dict) and _norm(c.get("clause")) in found)
+        ]
+        if changes.get("incomplete"):
+            merged["incomplete"] = changes["incomplete"]
+    merged["incremental"] = diff.report()
+    return merged
@@ -0,0 +1,244 @@
+"""
+LLM clients - One long-lived client per process and model, shared by every
+request, with the provider, model name and generation settings configured
+in one place.
+
+Building a GenerativeModel on every call pays client setup and a fresh TLS
+handshake each time. A shared client keeps its gRPC channel, a single
+HTTP/2 connection that multiplexes concurrent requests, open between
+requests, and prewarm_llm() opens it when the worker starts instead of on
+the first user request.
+"""
+import os
+import time
+import threading
+
+from .resilience import CircuitBreaker, CircuitOpenError
+
+
+# Model used when LLM_MODEL is not set
+DEFAULT_MODEL = "gemini-1.5-flash-001"
+
+# Generation settings per use of the model
+PROFILES = {
+    "analysis": {
+        "temperature": 0.4,
+        "top_p": 0.8,
+        "top_k": 40,
+        "max_output_tokens": 8192,
+    },
+    # Model defaults
+    "chat": {},
+}
+
+
+class LLMProvider:
+    """
+    Base class for LLM backends
+
+    Args:
+        model (str): Model name
+    """
+    name = None
+
+    def __init__(self, model):
+        self.model = model
+
+    def generate(self, prompt, generation_config=None):
+        """
+        Generate a completion
+
+        Returns:
+            str: Response text
+        """
+        raise NotImplementedError
+
+    def generate_stream(self, prompt, generation_config=None):
+        """
+        Generate a completion as it is produced
+
+        Yields:
+            str: Successive pieces of the response text
+        """
+        yield self.generate(prompt, generation_config)
+
+    def warm(self):
+        """
+        Open connections ahead of the first request
+        """
+
+
+class VertexGeminiProvider(LLMProvider):
+    name = "vertex"
+
+    def __init__(self, model):
+        super().__init__(model)
+        from vertexai.generative_models import GenerativeModel
+        self.client = GenerativeModel(model)
+
+    def generate(self, prompt, generation_config=None):
+        response = self.client.generate_content(prompt, generation_config=generation_config or None)
+        return response.text
+
+    def generate_stream(self, prompt, generation_config=None):
+        responses = self.client.generate_content(prompt, generation_config=generation_config or None, stream=True)
+        for response in responses:
+            yield response.text
+
+    def warm(self):
+        # A cheap call that creates the channel and completes the handshake
+        self.client.count_tokens("ping")
+
+
+PROVIDERS = {provider.name: provider for provider in (VertexGeminiProvider,)}
+
+
+class LLMClient:
+    """
+    A shared provider bound to the generation settings of one profile
+
+    Calls go through the provider's circuit breaker, if given: they raise
+    CircuitOpenError without reaching the model while it is open, and
+    their outcome and latency are recorded on it.
+    """
+
+    def __init__(self, provider, profile, generation_config, breaker=None):
+        self.provider = provider
+        self.profile = profile
+        self.generation_config = dict(generation_config)
+        self.breaker = breaker
+
+    @property
+    def model_id(self):
+        """
+        Provider and model, e.g. "vertex/gemini-1.5-flash-001"
+        """
+        return f"{self.provider.name}/{self.provider.model}"
+
+    def _admit(self):
+        if self.breaker is not None and not self.breaker.allow():
+            raise CircuitOpenError(f"LLM circuit open ({self.model_id})")
+        return time.monotonic()
+
+    def _record(self, started, ok):
+        if self.breaker is not None:
+            self.breaker.record_call(started, ok)
+
+    def generate(self, prompt):
+        started = self._admit()
+        try:
+            text = self.provider.generate(prompt, self.generation_config)
+        except Exception:
+            self._record(started, False)
+            raise
+        self._record(started, True)
+        return text
+
+    def generate_stream(self, prompt):
+        started = self._admit()
+        try:
+            for piece in self.provider.generate_stream(prompt, self.generation_config):
+                yield piece
+        except GeneratorExit:
+            # Consumer stopped reading; says nothing about the model
+            if self.breaker is not None:
+                self.breaker.release()
+            raise
+        except Exception:
+            self._record(started, False)
+            raise
+        self._record(started, True)
+
+
+class LLMRegistry:
+    """
+    Per-process registry of LLM clients
+
+    The provider is created once, on first use, and shared by every
+    profile and thread.
+
+    Args:
+        provider_name (str): Key of PROVIDERS
+        model (str): Model name
+        profiles (dict): Profile name -> generation settings
+        breaker (CircuitBreaker, optional): Shared by every client of the provider
+    """
+
+    def __init__(self, provider_name, model, profiles, breaker=None):
+        if provider_name not in PROVIDERS:
+            raise ValueError(f"Unknown LLM provider {provider_name!r}; expected one of {sorted(PROVIDERS)}")
+        self.provider_name = provider_name
+        self.model = model
+        self.profiles = profiles
+        self.breaker = breaker
+        self._provider = None
+        self._clients = {}
+        self._lock = threading.Lock()
+
+    def provider(self):
+        with self._lock:
+            if self._provider is None:
+                self._provider = PROVIDERS[self.provider_name](self.model)
+        return self._provider
+
+    def client(self, profile="analysis"):
+        """
+        The client for a profile
+
+        Raises:
+            KeyError: If the profile is not configured
+        """
+        client = self._clients.get(profile)
+        if client is None:
+            client = LLMClient(self.provider(), profile, self.profiles[profile], self.breaker)
+            self._clients[profile] = client
+        return client
+
+    def warm(self):
+        try:
+            self.provider().warm()
+            print(f"LLM client warmed ({self.provider_name}/{self.model})")
+        except Exception as e:
+            print(f"LLM warm-up failed: {e}")
+
+
+# Global registry (recreated after a fork; gRPC channels are not fork-safe)
+llm_registry = None
+_llm_registry_pid = None
+_llm_registry_lock = threading.Lock()
+
+
+def get_llm_registry():
+    """
+    Get the global LLM registry instance
+    """
+    global llm_registry, _llm_registry_pid
+    with _llm_registry_lock:
+        if llm_registry is None or _llm_registry_pid != os.getpid():
+            llm_registry = LLMRegistry(
+                os.getenv('LLM_PROVIDER', 'vertex'),
+                os.getenv('LLM_MODEL', DEFAULT_MODEL),
+                PROFILES,
+                CircuitBreaker.from_env()
+            )
+            _llm_registry_pid = os.getpid()
+    return llm_registry
+
+
+def get_llm_client(profile="analysis"):
+    """
+    Get the shared LLM client for a profile ("analysis" or "chat")
+    """
+    return get_llm_registry().client(profile)
+
+
+def prewarm_llm():
+    """
+    Create the shared client and open its connection in the background,
+    unless LLM_PREWARM is disabled
+    """
+    if os.getenv('LLM_PREWARM', 'true').lower() not in ('1', 'true', 'yes'):
+        return None
+    thread = threading.Thread(target=get_llm_registry().warm, name="llm-prewarm", daemon=True)
+    thread.start()
+    return thread
@@ -0,0 +1,251 @@
+"""
+Map-reduce analysis - Analyzes documents longer than one prompt allows by
+splitting them on section boundaries, analyzing the sections concurrently
+and merging the per-section results into one analysis.
+
+Sections run on a shared per-process pool, so a long document takes about
+as long as its slowest section while the number of model calls in flight
+stays capped.
+"""
+import os
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from .schema import ANALYSIS_FIELDS
+
+
+# Documents longer than this are analyzed section by section and merged
+ANALYSIS_SECTION_CHARS = int(os.getenv('ANALYSIS_SECTION_CHARS', '50000'))
+ANALYSIS_MAX_SECTIONS = int(os.getenv('ANALYSIS_MAX_SECTIONS', '12'))
+
+# Lines that open a new section: "Section 4", "ARTICLE IV", "Schedule A",
+# "12. Termination", "4.2 Payment", "IV. Remedies" or an all-caps heading
+SECTION_HEADING = re.compile(
+    r"^[ \t]*(?:"
+    r"(?i:section|article|clause|schedule|annexure|annex|appendix|exhibit|part)\s+[\w.-]+"
+    r"|\d+(?:\.\d+)*[.)]?[ \t]+[A-Z]"
+    r"|[IVXLC]+[.)][ \t]+\S"
+    r"|[A-Z][A-Z0-9 ,&/'-]{3,}[ \t]*$"
+    r")",
+    re.MULTILINE
+)
+
+SEVERITY_RANK = {"high": 3, "medium": 2, "low": 1}
+
+# Fields merged as lists, with the entry fields identifying duplicates
+LIST_KEYS = {
+    "key_terms": ("term",),
+    "main_clauses": ("name",),
+    "critical_dates": ("date", "event"),
+    "parties": ("name",),
+    "obligations": ("party", "responsibility"),
+    "risks": ("risk",),
+    "missing_clauses": ("clause",),
+    "compliance_issues": ("issue",),
+    "recommendations": (),
+    "next_steps": (),
+}
+
+
+def _hard_split(text, max_chars):
+    pieces = []
+    while len(text) > max_chars:
+        cut = text.rfind(" ", 0, max_chars)
+        cut = cut if cut > max_chars // 2 else max_chars
+        pieces.append(text[:cut])
+        text = text[cut:]
+    pieces.append(text)
+    return pieces
+
+
+def _split_oversized(segment, max_chars):
+    """
+    Split a section longer than max_chars on paragraphs, then lines, then
+    whitespace
+    """
+    for separator in ("\n\n", "\n"):
+        parts = segment.split(separator)
+        parts = [p for p in [p + separator for p in parts[:-1]] + parts[-1:] if p]
+        if len(parts) > 1:
+            pieces = []
+            for part in parts:
+                pieces.extend(_split_oversized(part, max_chars) if len(part) > max_chars else [part])
+            return _pack(pieces, max_chars)
+    return _hard_split(segment, max_chars)
+
+
+def _pack(segments, max_chars):
+    chunks, current = [], ""
+    for segment in segments:
+        if current and len(current) + len(segment) > max_chars:
+            chunks.append(current)
+            current = ""
+        current += segment
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def split_sections(text, max_chars):
+    """
+    Split text into chunks of at most max_chars, breaking at section
+    headings where possible
+
+    Consecutive sections are packed together until the next one would not
+    fit; sections longer than max_chars are split on paragraphs.
+
+    Returns:
+        list: Chunks whose concatenation is the original text
+    """
+    if len(text) <= max_chars:
+        return [text]
+    starts = sorted({0, *(m.start() for m in SECTION_HEADING.finditer(text))})
+    segments = [text[a:b] for a, b in zip(starts, starts[1:] + [len(text)])]
+    pieces = []
+    for segment in segments:
+        pieces.extend(_split_oversized(segment, max_chars) if len(segment) > max_chars else [segment])
+    return [chunk for chunk in _pack(pieces, max_chars) if chunk.strip()]
+
+
+def _norm(value):
+    return " ".join(re.sub(r"[^\w\s]", " ", str(value or "").lower()).split())
+
+
+def _entry_key(entry, fields):
+    if not fields or not isinstance(entry, dict):
+        return _norm(entry if not isinstance(entry, dict) else sorted(entry.items()))
+    return tuple(_norm(entry.get(field)) for field in fields)
+
+
+def _merge_list(lists, fields, key, prefer_first=False):
+    merged, index = [], {}
+    for items in lists:
+        for entry in items or []:
+            k = _entry_key(entry, fields)
+            if not any(k if isinstance(k, tuple) else (k,)):
+                continue
+            if k not in index:
+                index[k] = len(merged)
+                merged.append(entry)
+            elif key == "risks" and not prefer_first:
+                # Keep the most severe assessment of the same risk
+                kept = merged[index[k]]
+                if SEVERITY_RANK.get(_norm(entry.get("severity")), 0) > SEVERITY_RANK.get(_norm(kept.get("severity")), 0):
+                    merged[index[k]] = entry
+    return merged
+
+
+def merge_analyses(analyses, prefer_first=False):
+    """
+    Merge per-section analyses into one analysis
+
+    The section summaries are joined in document order (without repeats);
+    the jurisdiction comes from the first section that has one; list fields are concatenated in document order with duplicates
+    (same party, date and event, risk, ...) removed. Clauses reported
+    missing by one section but found in another are dropped.
+
+    Args:
+        analyses (list): Section analyses in document order
+        prefer_first (bool): A duplicate keeps the earliest entry; by
+            default a risk keeps its most severe assessment
+
+    Returns:
+        dict: Analysis with every ANALYSIS_FIELDS key
+    """
+    merged = {}
+    for field, kind in ANALYSIS_FIELDS.items():
+        if kind is str:
+            values = [a.get(field) for a in analyses if isinstance(a.get(field), str) and a.get(field).strip()]
+            specific = [v for v in values if _norm(v) not in ("not available", "not analyzed", "not specified")]
+            if field == "summary":
+                merged[field] = " ".join(dict.fromkeys(v.strip() for v in specific or values))
+            else:
+                merged[field] = (specific or values or [""])[0]
+        else:
+            merged[field] = _merge_list(
+                [a.get(field) for a in analyses], LIST_KEYS.get(field, ()), field, prefer_first
+            )
+
+    found = {_norm(c.get("name")) for c in merged["main_clauses"] if isinstance(c, dict)}
+    merged["missing_clauses"] = [
+        c for c in merged["missing_clauses"]
+        if not (isinstance(c, dict) and _norm(c.get("clause")) in found)
+    ]
+    return merged
+
+
+def map_reduce_analysis(text, analyze_section, max_chars, max_sections, executor, summarize=None):
+    """
+    Analyze a long document section by section and merge the results
+
+    Args:
+        text (str): Full document text
+        analyze_section (callable): analyze_section(section text) -> analysis
+            dict; may raise
+        max_chars (int): Largest section sent in one call
+        max_sections (int): Most sections analyzed; text beyond them is dropped
+        executor: Pool the sections run on
+        summarize (callable, optional): summarize(section summaries) ->
+            one summary of the whole document; without it, or if it
+            fails, the section summaries are joined
+
+    Returns:
+        dict: Merged analysis with a "sections" entry giving how many
+            sections there were, how many were analyzed and the error
+            types of the ones that failed, and the "incomplete" fields of
+            any section
+
+    Raises:
+        Exception: The first section's error, if every section failed
+    """
+    sections = split_sections(text, max_chars)
+    if len(sections) > max_sections:
+        print(f"Analyzing the first {max_sections} of {len(sections)} sections")
+        sections = sections[:max_sections]
+
+    futures = [executor.submit(analyze_section, section) for section in sections]
+    results, errors = [], []
+    for i, future in enumerate(futures):
+        try:
+            results.append(future.result())
+        except Exception as e:
+            print(f"Section {i + 1}/{len(sections)} analysis failed: {e}")
+            errors.append(e)
+
+    if not results:
+        raise errors[0]
+
+    merged = merge_analyses(results)
+    summaries = [r.get("summary") for r in results if isinstance(r.get("summary"), str) and r.get("summary").strip()]
+    if summarize and len(summaries) > 1:
+        try:
+            merged["summary"] = summarize(summaries) or merged["summary"]
+        except Exception as e:
+            print(f"Summary of the section summaries failed: {e}")
+    merged["sections"] = {"total": len(sections), "analyzed": len(results)}
+    if errors:
+        merged["sections"]["errors"] = sorted({type(e).__name__ for e in errors})
+    incomplete = sorted({field for result in results for field in result.get("incomplete", ())})
+    if incomplete:
+        merged["incomplete"] = incomplete
+    return merged
+
+
+# Global section pool (one per gunicorn worker)
+section_pool = None
+_section_pool_lock = threading.Lock()
+
+
+def get_section_pool():
+    """
+    Get the global pool that section analyses run on
+    """
+    global section_pool
+    with _section_pool_lock:
+        if section_pool is None:
+            section_pool = ThreadPoolExecutor(
+                max_workers=int(os.getenv('ANALYSIS_MAP_CONCURRENCY', '4')),
+                thread_name_prefix="analysis-section"
+            )
+    return section_pool
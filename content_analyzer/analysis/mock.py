@@ -0,0 +1,294 @@
+"""
+Offline LLM stand-in - A provider that answers analysis and chat prompts
+locally with schema-valid output built from the document text, after a
+simulated model latency, and fails or returns malformed JSON at
+configurable rates.
+
+Select it with LLM_PROVIDER=mock to run the whole pipeline (worker pools,
+streaming, caches, map-reduce) on a machine without Vertex AI, e.g. for
+load tests.
+
+Latency specs (seconds):
+    fixed:1.5            always 1.5
+    uniform:0.5,3        uniform between 0.5 and 3
+    normal:2,0.5         mean 2, standard deviation 0.5 (floored at 0)
+    lognormal:2,0.5      median 2, log-space sigma 0.5 (long right tail)
+    exp:2                exponential with mean 2
+"""
+import os
+import re
+import json
+import math
+import time
+import random
+
+from .llm import LLMProvider, PROVIDERS
+from .mapreduce import SECTION_HEADING
+
+
+class MockLLMError(Exception):
+    """Simulated model failure"""
+
+
+class LatencyModel:
+    """
+    Random delay drawn from a named distribution
+
+    Args:
+        kind (str): "fixed", "uniform", "normal", "lognormal" or "exp"
+        params (tuple): Distribution parameters, in seconds
+    """
+
+    KINDS = {"fixed": 1, "uniform": 2, "normal": 2, "lognormal": 2, "exp": 1}
+
+    def __init__(self, kind, params):
+        if kind not in self.KINDS or len(params) != self.KINDS[kind]:
+            raise ValueError(f"Latency must be one of {sorted(self.KINDS)} with matching parameters")
+        self.kind = kind
+        self.params = tuple(params)
+
+    @classmethod
+    def parse(cls, spec):
+        """
+        Parse a spec such as "lognormal:2,0.5"
+        """
+        kind, _, args = (spec or "fixed:0").partition(":")
+        params = [float(a) for a in args.split(",") if a.strip()]
+        return cls(kind.strip().lower(), params)
+
+    def sample(self, rng):
+        p = self.params
+        if self.kind == "fixed":
+            return max(0.0, p[0])
+        if self.kind == "uniform":
+            return rng.uniform(p[0], p[1])
+        if self.kind == "normal":
+            return max(0.0, rng.gauss(p[0], p[1]))
+        if self.kind == "lognormal":
+            return rng.lognormvariate(math.log(p[0]), p[1]) if p[0] > 0 else 0.0
+        return rng.expovariate(1 / p[0]) if p[0] > 0 else 0.0
+
+    def __repr__(self):
+        return f"{self.kind}:{','.join(str(v) for v in self.params)}"
+
+
+class MockSettings:
+    """
+    Behaviour of the mock provider
+
+    Args:
+        latency (LatencyModel): Time to the complete response
+        error_rate (float): Fraction of calls that raise MockLLMError
+        malformed_rate (float): Fraction of analysis responses cut off mid-JSON
+        stream_chunks (int): Pieces a streamed response is split into
+        first_chunk_fraction (float): Share of the latency before the first piece
+        seed (int, optional): Seed for reproducible runs
+    """
+
+    def __init__(self, latency, error_rate=0.0, malformed_rate=0.0, stream_chunks=20,
+                 first_chunk_fraction=0.2, seed=None):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.malformed_rate = malformed_rate
+        self.stream_chunks = max(1, stream_chunks)
+        self.first_chunk_fraction = first_chunk_fraction
+        self.seed = seed
+
+    @classmethod
+    def from_env(cls):
+        seed = os.getenv('MOCK_LLM_SEED')
+        return cls(
+            latency=LatencyModel.parse(os.getenv('MOCK_LLM_LATENCY', 'lognormal:2,0.5')),
+            error_rate=float(os.getenv('MOCK_LLM_ERROR_RATE', '0')),
+            malformed_rate=float(os.getenv('MOCK_LLM_MALFORMED_RATE', '0')),
+            stream_chunks=int(os.getenv('MOCK_LLM_STREAM_CHUNKS', '20')),
+            seed=int(seed) if seed else None
+        )
+
+
+# Cue word -> risk reported when it appears in the document
+RISK_CUES = {
+    "penalt": ("Penalty exposure", "medium", "The document imposes penalties that should be reviewed."),
+    "indemn": ("Broad indemnity", "high", "Indemnification obligations may be open-ended."),
+    "terminat": ("Termination terms", "medium", "Check notice periods and termination triggers."),
+    "liabilit": ("Liability allocation", "medium", "Review caps and exclusions of liability."),
+    "interest": ("Interest charges", "low", "Late payment interest may accumulate."),
+}
+
+# Clauses expected in most agreements -> cue words showing they are present
+EXPECTED_CLAUSES = {
+    "Termination": ("terminat",),
+    "Confidentiality": ("confidential",),
+    "Dispute resolution": ("arbitration", "dispute"),
+    "Governing law": ("governing law", "jurisdiction"),
+}
+
+# Longest clause name and description taken from the document
+CLAUSE_NAME_CHARS = 80
+CLAUSE_DESCRIPTION_CHARS = 160
+
+DATE_PATTERN = re.compile(
+    r"\b(?:\d{4}-\d{2}-\d{2}|\d{1,2}[/.-]\d{1,2}[/.-]\d{2,4}|"
+    r"(?:January|February|March|April|May|June|July|August|September|October|November|December)"
+    r"\s+\d{1,2},?\s+\d{4})\b"
+)
+
+
+def _prompt_document(prompt, marker):
+    _, _, text = prompt.partition(marker)
+    return text.strip()
+
+
+def _clauses(document, limit=8):
+    """
+    main_clauses from the document's section headings: the whole heading
+    line as the name (each name once) and the start of its section as the
+    description
+    """
+    clauses, seen = [], set()
+    starts = [m.start() for m in SECTION_HEADING.finditer(document)]
+    for start, next_start in zip(starts, starts[1:] + [len(document)]):
+        end = document.find("\n", start, next_start)
+        end = next_start if end < 0 else end
+        name = " ".join(document[start:end].split())[:CLAUSE_NAME_CHARS].rstrip(" .:-")
+        if not name or name.lower() in seen:
+            continue
+        seen.add(name.lower())
+        body = " ".join(document[end:min(next_start, end + 400)].split())
+        description = body[:CLAUSE_DESCRIPTION_CHARS].rsplit(" ", 1)[0] if len(body) > CLAUSE_DESCRIPTION_CHARS else body
+        clauses.append({"name": name, "description": description or "Section of the document"})
+        if len(clauses) >= limit:
+            break
+    return clauses
+
+
+def _sentences(text):
+    return [s.strip() for s in re.split(r"(?<=[.!?])\s+", " ".join(text.split())) if s.strip()]
+
+
+def mock_analysis(prompt):
+    """
+    Schema-valid analysis derived from the document in an analysis prompt
+    """
+    document = _prompt_document(prompt, "Document Text:")
+    lower = document.lower()
+    sentences = _sentences(document)
+    match = re.search(r"Analyze the following (.+?) and provide", prompt)
+    document_type = match.group(1) if match else "legal document"
+
+    parties = []
+    between = re.search(r"between\s+(.{3,80}?)\s+and\s+(.{3,80}?)(?:[,.;(]|$)", document, re.IGNORECASE | re.MULTILINE)
+    if between:
+        parties = [{"name": name.strip(), "role": "Party"} for name in between.groups()]
+
+    dates = []
+    for m in DATE_PATTERN.finditer(document):
+        if len(dates) >= 5:
+            break
+        context = document[max(0, m.start() - 60):m.end() + 60]
+        dates.append({"date": m.group(0), "event": " ".join(context.split())})
+
+    clauses = _clauses(document)
+    missing = [
+        {"clause": clause, "importance": f"Most {document_type}s address {clause.lower()}."}
+        for clause, cues in EXPECTED_CLAUSES.items() if not any(c in lower for c in cues)
+    ]
+    jurisdiction = next(
+        (s for s in sentences if "jurisdiction" in s.lower() or "governing law" in s.lower()),
+        "Not specified"
+    )
+
+    return {
+        "summary": " ".join(sentences[:2])[:400] or f"This {document_type} could not be summarized.",
+        "key_terms": [
+            {"term": term, "definition": "Defined in the document"}
+            for term in dict.fromkeys(re.findall(r'"([A-Z][^"]{2,40})"', document))
+        ][:5],
+        "main_clauses": clauses,
+        "critical_dates": dates,
+        "parties": parties,
+        "jurisdiction": jurisdiction[:300],
+        "obligations": [
+            {"party": "Unspecified", "responsibility": s[:200]}
+            for s in sentences if " shall " in f" {s.lower()} "
+        ][:5],
+        "risks": [
+            {"risk": risk, "severity": severity, "description": description}
+            for cue, (risk, severity, description) in RISK_CUES.items() if cue in lower
+        ],
+        "recommendations": [f"Add a {m['clause'].lower()} clause" for m in missing]
+                           or ["Have a legal professional review this document"],
+        "missing_clauses": missing,
+        "compliance_issues": [],
+        "next_steps": ["Review document with legal counsel"]
+    }
+
+
+def mock_answer(prompt):
+    """
+    Answer a chat prompt with the document sentence sharing most words
+    with the question
+    """
+    document = _prompt_document(prompt, "Document:").split("Question:")[0]
+    question = _prompt_document(prompt, "Question:").split("Answer:")[0]
+    words = {w for w in re.findall(r"\w+", question.lower()) if len(w) > 3}
+    sentences = _sentences(document)
+    if not sentences:
+        return "The document does not contain enough text to answer that."
+    return max(sentences, key=lambda s: len(words & set(re.findall(r"\w+", s.lower()))))
+
+
+class MockProvider(LLMProvider):
+    """
+    Local stand-in for the model (LLM_PROVIDER=mock)
+    """
+    name = "mock"
+
+    def __init__(self, model, settings=None):
+        super().__init__(model)
+        self.settings = settings or MockSettings.from_env()
+        self.rng = random.Random(self.settings.seed)
+        print(f"Mock LLM: latency {self.settings.latency}, errors {self.settings.error_rate:.0%}, "
+              f"malformed {self.settings.malformed_rate:.0%}")
+
+    def _respond(self, prompt):
+        """
+        Draw the outcome of one call
+
+        Returns:
+            tuple: (latency in seconds, response text)
+        """
+        latency = self.settings.latency.sample(self.rng)
+        if self.rng.random() < self.settings.error_rate:
+            time.sleep(latency)
+            raise MockLLMError("Simulated model error (503 Service Unavailable)")
+        if "Question:" in prompt and "Document Text:" not in prompt:
+            return latency, mock_answer(prompt)
+        if "Section summaries:" in prompt:
+            lines = _prompt_document(prompt, "Section summaries:").splitlines()
+            firsts = [_sentences(re.sub(r"^\s*\d+\.\s*", "", line))[:1] for line in lines]
+            return latency, " ".join(sentence for first in firsts for sentence in first[:1])[:600]
+        text = json.dumps(mock_analysis(prompt), indent=2)
+        if self.rng.random() < self.settings.malformed_rate:
+            # Output cut off part way, as when the token limit is hit
+            text = text[:self.rng.randint(1, max(1, len(text) - 1))]
+        return latency, text
+
+    def generate(self, prompt, generation_config=None):
+        latency, text = self._respond(prompt)
+        time.sleep(latency)
+        return text
+
+    def generate_stream(self, prompt, generation_config=None):
+        latency, text = self._respond(prompt)
+        n = self.settings.stream_chunks
+        size = max(1, math.ceil(len(text) / n))
+        pieces = [text[i:i + size] for i in range(0, len(text), size)] or [""]
+        first = latency * self.settings.first_chunk_fraction
+        rest = (latency - first) / max(1, len(pieces) - 1)
+        for i, piece in enumerate(pieces):
+            time.sleep(first if i == 0 else rest)
+            yield piece
+
+
+PROVIDERS[MockProvider.name] = MockProvider
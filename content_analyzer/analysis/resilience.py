@@ -0,0 +1,197 @@
+"""
+LLM resilience - A per-request deadline for model work and a circuit
+breaker around the model, so a slow or failing provider costs each request
+at most the deadline, and nothing at all once the breaker has tripped.
+
+The breaker opens after a run of consecutive failures: errors, calls slower
+than slow_call_seconds and requests that ran out of deadline. A call that
+succeeds only clears failures recorded after it started, so a timed-out
+call finishing late does not undo its own deadline failure. While it is open, callers
+skip the model and use a local analysis. After a cool-down it lets a single
+probe call through (half-open) and closes again if that call succeeds. Its
+state is kept per worker.
+"""
+import os
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling the model while the circuit breaker is open"""
+
+
+class DeadlineExceeded(Exception):
+    """Raised when model work does not finish within its deadline"""
+
+
+class CircuitBreaker:
+    """
+    Consecutive-failure circuit breaker
+
+    Args:
+        failure_threshold (int): Consecutive failures that open the circuit
+        reset_seconds (float): Time open before a probe call is let through
+        slow_call_seconds (float, optional): Calls that succeed but take
+            longer than this count as failures
+    """
+
+    def __init__(self, failure_threshold=5, reset_seconds=30, slow_call_seconds=None):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.slow_call_seconds = slow_call_seconds or None
+        self.failures = 0
+        self.opened_at = None
+        self.last_failure_at = None
+        # When the half-open probe call started, while it is in flight
+        self.probe_started = None
+        self.trips = 0
+        self.rejected = 0
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        """
+        "closed", "open" or "half_open"
+        """
+        if self.opened_at is None:
+            return "closed"
+        if self.probe_started is not None or time.monotonic() - self.opened_at >= self.reset_seconds:
+            return "half_open"
+        return "open"
+
+    def _probe_in_flight(self):
+        # A probe that never reported back stops blocking after reset_seconds
+        return self.probe_started is not None and time.monotonic() - self.probe_started < self.reset_seconds
+
+    def is_open(self):
+        """
+        True while calls would be rejected without trying the model (a
+        half-open breaker without a probe in flight is not open: the next
+        call may probe it)
+        """
+        with self._lock:
+            state = self.state
+            return state == "open" or (state == "half_open" and self._probe_in_flight())
+
+    def allow(self):
+        """
+        Claim permission for one call; in the half-open state only one
+        probe is allowed at a time
+        """
+        with self._lock:
+            state = self.state
+            if state == "closed":
+                return True
+            if state == "half_open" and not self._probe_in_flight():
+                self.probe_started = time.monotonic()
+                return True
+            self.rejected += 1
+            return False
+
+    def release(self):
+        """
+        Give back a call permission without an outcome (e.g. the caller
+        stopped reading a stream), so a probe does not stay claimed
+        """
+        with self._lock:
+            self.probe_started = None
+
+    def record_call(self, started, ok):
+        """
+        Record the outcome of one model call
+
+        Args:
+            started (float): time.monotonic() when the call started
+            ok (bool): The call succeeded
+        """
+        if ok and not (self.slow_call_seconds and time.monotonic() - started > self.slow_call_seconds):
+            self.record_success(started)
+        else:
+            self.record_failure()
+
+    def record_success(self, started=None):
+        with self._lock:
+            if started is not None and self.last_failure_at is not None and started < self.last_failure_at:
+                return
+            if self.opened_at is not None:
+                print("LLM circuit closed")
+            self.failures = 0
+            self.opened_at = None
+            self.probe_started = None
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self.last_failure_at = time.monotonic()
+            if self.probe_started is not None or (self.opened_at is None and self.failures >= self.failure_threshold):
+                if self.opened_at is None:
+                    self.trips += 1
+                print(f"LLM circuit open after {self.failures} consecutive failures")
+                self.opened_at = time.monotonic()
+                self.probe_started = None
+
+    def stats(self):
+        with self._lock:
+            return {
+                "state": self.state,
+                "consecutive_failures": self.failures,
+                "trips": self.trips,
+                "rejected": self.rejected,
+                "failure_threshold": self.failure_threshold,
+                "reset_seconds": self.reset_seconds,
+                "slow_call_seconds": self.slow_call_seconds
+            }
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            failure_threshold=int(os.getenv('LLM_BREAKER_FAILURES', '5')),
+            reset_seconds=float(os.getenv('LLM_BREAKER_RESET_SECONDS', '30')),
+            slow_call_seconds=float(os.getenv('LLM_BREAKER_SLOW_CALL_SECONDS', '60'))
+        )
+
+
+def run_with_deadline(fn, timeout, executor):
+    """
+    Run fn() on executor and wait at most timeout seconds for it
+
+    The work is not interrupted on timeout (threads cannot be); it finishes
+    in the background and its result is discarded.
+
+    Args:
+        fn (callable): Work to run
+        timeout (float): Seconds to wait; 0 or None waits without limit
+        executor: Pool the work runs on
+
+    Raises:
+        DeadlineExceeded: If fn has not finished in time
+        Exception: Whatever fn raised
+    """
+    if not timeout:
+        return fn()
+    future = executor.submit(fn)
+    try:
+        return future.result(timeout=timeout)
+    except FutureTimeout:
+        future.cancel()
+        raise DeadlineExceeded(f"Model work did not finish within {timeout:g} s")
+
+
+# Global pool that deadline-bound model work runs on (one per gunicorn worker)
+deadline_pool = None
+_deadline_pool_lock = threading.Lock()
+
+
+def get_deadline_pool():
+    """
+    Get the global pool for deadline-bound model work
+    """
+    global deadline_pool
+    with _deadline_pool_lock:
+        if deadline_pool is None:
+            deadline_pool = ThreadPoolExecutor(
+                max_workers=int(os.getenv('ANALYSIS_DEADLINE_WORKERS', '8')),
+                thread_name_prefix="analysis-deadline"
+            )
+    return deadline_pool
@@ -0,0 +1,216 @@
+"""
+Retrieval for document chat - A BM25 index over clause-sized chunks of a
+document, so each chat question sends the model only the few chunks that
+bear on it instead of a fixed slice from the start of the document.
+
+Indexes are built once per document and kept in a small per-process LRU
+keyed by the document text; the analysis request builds the index, so the
+chat questions that follow find it ready.
+"""
+import os
+import re
+import math
+import hashlib
+import threading
+from collections import Counter, OrderedDict
+
+from .cache import normalize_text
+from .compaction import clean_text, CHARS_PER_TOKEN, GAP_MARKER
+from .mapreduce import split_sections
+
+
+# Chunks of the document retrieved for each chat question, and the most
+# estimated tokens of them sent
+CHAT_TOP_K = int(os.getenv('CHAT_TOP_K', '4'))
+CHAT_TOKEN_BUDGET = int(os.getenv('CHAT_TOKEN_BUDGET', '2500'))
+
+# Chunks are packed from whole clauses up to this size
+CHUNK_CHARS = 1500
+
+# BM25 parameters (standard defaults)
+K1 = 1.5
+B = 0.75
+
+STOPWORDS = frozenset(
+    "a an and are as at be been by can could do does did for from has have how i if in into is it its "
+    "may me my of on or our should so than that the their them then there these they this those to "
+    "under upon us was we were what when where which who whom why will with would you your".split()
+)
+
+
+def tokenize(text):
+    """
+    Lower-cased index terms of text, without stopwords and with plural
+    "s" removed
+    """
+    terms = []
+    for word in re.findall(r"[a-z0-9]+", text.lower()):
+        if word in STOPWORDS or len(word) < 2:
+            continue
+        if len(word) > 4 and word.endswith("s") and not word.endswith("ss"):
+            word = word[:-1]
+        terms.append(word)
+    return terms
+
+
+class ChunkIndex:
+    """
+    BM25 index over the chunks of one document
+
+    Args:
+        chunks (list): Chunk texts in document order
+    """
+
+    def __init__(self, chunks):
+        self.chunks = chunks
+        self.postings = {}
+        self.lengths = []
+        for i, chunk in enumerate(chunks):
+            counts = Counter(tokenize(chunk))
+            self.lengths.append(sum(counts.values()))
+            for term, tf in counts.items():
+                self.postings.setdefault(term, []).append((i, tf))
+        self.avg_length = (sum(self.lengths) / len(self.lengths)) if self.lengths else 0.0
+
+    def to_dict(self):
+        return {"chunks": self.chunks, "lengths": self.lengths, "postings": self.postings}
+
+    @classmethod
+    def from_dict(cls, data):
+        """
+        Rebuild an index saved with to_dict() without re-tokenizing
+        """
+        index = cls.__new__(cls)
+        index.chunks = data["chunks"]
+        index.lengths = data["lengths"]
+        index.postings = {term: [tuple(p) for p in postings] for term, postings in data["postings"].items()}
+        index.avg_length = (sum(index.lengths) / len(index.lengths)) if index.lengths else 0.0
+        return index
+
+    @classmethod
+    def build(cls, text, chunk_chars=CHUNK_CHARS):
+        """
+        Index cleaned text split at section headings into chunks of at
+        most chunk_chars
+        """
+        cleaned, _ = clean_text(text)
+        return cls(split_sections(cleaned, chunk_chars) if cleaned.strip() else [])
+
+    def search(self, query, k):
+        """
+        The k chunks that best match query
+
+        Returns:
+            list: (chunk index, score) pairs, best first; only chunks
+                sharing a term with the query
+        """
+        n = len(self.chunks)
+        scores = {}
+        for term in set(tokenize(query)):
+            postings = self.postings.get(term)
+            if not postings:
+                continue
+            idf = math.log(1 + (n - len(postings) + 0.5) / (len(postings) + 0.5))
+            for i, tf in postings:
+                norm = K1 * (1 - B + B * self.lengths[i] / (self.avg_length or 1))
+                scores[i] = scores.get(i, 0.0) + idf * tf * (K1 + 1) / (tf + norm)
+        return sorted(scores.items(), key=lambda item: (-item[1], item[0]))[:k]
+
+    def excerpt(self, query, k, max_tokens):
+        """
+        The chunks that best match query, in document order, within max_tokens
+
+        The opening chunks stand in when nothing matches (e.g. "summarize
+        this"). Gaps between non-adjacent chunks are marked with GAP_MARKER.
+
+        Returns:
+            tuple: (excerpt text, chunk indexes used)
+        """
+        ranked = [i for i, _ in self.search(query, k)] or list(range(min(k, len(self.chunks))))
+        budget = max_tokens * CHARS_PER_TOKEN if max_tokens else None
+        chosen, used = [], 0
+        for i in ranked:
+            size = len(self.chunks[i]) + len(GAP_MARKER) + 2
+            if budget is not None and used + size > budget:
+                continue
+            chosen.append(i)
+            used += size
+        if not chosen and ranked:
+            # A single oversized chunk still gets its first part in
+            i = ranked[0]
+            return self.chunks[i][:budget], [i]
+
+        parts, previous = [], -1
+        for i in sorted(chosen):
+            if i != previous + 1:
+                parts.append(GAP_MARKER)
+            parts.append(self.chunks[i].strip())
+            previous = i
+        if chosen and previous != len(self.chunks) - 1:
+            parts.append(GAP_MARKER)
+        return "\n\n".join(parts), sorted(chosen)
+
+
+class IndexCache:
+    """
+    Per-process LRU of chunk indexes keyed by document text
+
+    Args:
+        max_entries (int): Indexes kept before the least recently used is dropped
+    """
+
+    def __init__(self, max_entries=32):
+        self.max_entries = max_entries
+        self._indexes = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(text):
+        return hashlib.sha256(normalize_text(text).encode('utf-8')).hexdigest()
+
+    def get_or_build(self, text):
+        """
+        The index of text, built on first use
+        """
+        key = self.make_key(text)
+        with self._lock:
+            index = self._indexes.get(key)
+            if index is not None:
+                self._indexes.move_to_end(key)
+                self.hits += 1
+                return index
+            self.misses += 1
+        index = ChunkIndex.build(text)
+        with self._lock:
+            self._indexes[key] = index
+            self._indexes.move_to_end(key)
+            while len(self._indexes) > self.max_entries:
+                self._indexes.popitem(last=False)
+        return index
+
+    def stats(self):
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'entries': len(self._indexes),
+                'max_entries': self.max_entries
+            }
+
+
+# Global index cache (one per gunicorn worker)
+index_cache = None
+_index_cache_lock = threading.Lock()
+
+
+def get_index_cache():
+    """
+    Get the global chunk index cache instance
+    """
+    global index_cache
+    with _index_cache_lock:
+        if index_cache is None:
+            index_cache = IndexCache(int(os.getenv('RETRIEVAL_INDEX_CACHE_ENTRIES', '32')))
+    return index_cache
@@ -0,0 +1,140 @@
+"""
+Tolerant parsing of model analyses - Gets as much of the 12-category
+analysis as possible out of a response that is not clean JSON, so a
+response with a defect costs a follow-up request for the missing
+categories instead of the whole analysis.
+
+Well-formed responses are parsed directly. Otherwise markdown fences and
+surrounding prose are dropped, trailing commas removed and raw control
+characters inside strings escaped. A response cut off part way (e.g. at
+the output token limit) keeps every top-level field completed before the
+cut. Fields are then checked against ANALYSIS_FIELDS; the ones absent or
+of the wrong type are reported missing.
+"""
+import json
+
+from .schema import ANALYSIS_FIELDS
+from .streaming import StreamingFieldParser
+
+
+CONTROL_ESCAPES = {"\n": "\\n", "\r": "\\r", "\t": "\\t"}
+
+
+class SalvagedAnalysis:
+    """
+    Result of salvage_analysis()
+
+    Args:
+        fields (dict): Requested fields that parsed and match the schema
+        missing (list): Requested fields that did not, in schema order
+        repairs (list): Defects repaired: "surrounding_text" (fences or
+            prose around the object), "trailing_commas",
+            "control_characters" and "truncated"
+    """
+
+    def __init__(self, fields, missing, repairs):
+        self.fields = fields
+        self.missing = missing
+        self.repairs = repairs
+
+    @property
+    def complete(self):
+        return not self.missing
+
+
+def repair_json(text):
+    """
+    The JSON object in text with common model output defects repaired
+
+    Text before the first "{" (e.g. a ```json fence) and after the object
+    closes is dropped, trailing commas before "}" or "]" are removed and
+    newlines and tabs inside strings are escaped. A truncated object is
+    left open; salvage_analysis() keeps its completed fields.
+
+    Returns:
+        tuple: (repaired text, list of the repairs made)
+    """
+    start = text.find("{")
+    if start < 0:
+        return "", []
+    repairs = set()
+    if text[:start].strip():
+        repairs.add("surrounding_text")
+
+    out = []
+    depth = 0
+    in_string = escape = False
+    pending_comma = None
+    for i in range(start, len(text)):
+        ch = text[i]
+        if in_string:
+            if escape:
+                escape = False
+            elif ch == "\\":
+                escape = True
+            elif ch == '"':
+                in_string = False
+            elif ch in CONTROL_ESCAPES:
+                ch = CONTROL_ESCAPES[ch]
+                repairs.add("control_characters")
+            out.append(ch)
+            continue
+        if ch.isspace():
+            out.append(ch)
+            continue
+        if pending_comma is not None:
+            if ch in "}]":
+                out[pending_comma] = ""
+                repairs.add("trailing_commas")
+            pending_comma = None
+        if ch == ",":
+            pending_comma = len(out)
+        elif ch == '"':
+            in_string = True
+        elif ch in "{[":
+            depth += 1
+        elif ch in "}]":
+            depth -= 1
+        out.append(ch)
+        if depth == 0:
+            break
+
+    if depth > 0:
+        repairs.add("truncated")
+    elif text[i + 1:].strip():
+        repairs.add("surrounding_text")
+    return "".join(out), sorted(repairs)
+
+
+def salvage_analysis(text, fields=None):
+    """
+    Parse a model analysis response, keeping every field that can be used
+
+    Args:
+        text (str): Model response
+        fields (list, optional): Fields that were asked for (default: all
+            of ANALYSIS_FIELDS)
+
+    Returns:
+        SalvagedAnalysis: The usable fields and the ones to ask for again
+    """
+    fields = list(fields or ANALYSIS_FIELDS)
+    repairs = []
+    try:
+        parsed = json.loads(text or "")
+    except ValueError:
+        repaired, repairs = repair_json(text or "")
+        try:
+            parsed = json.loads(repaired)
+        except ValueError:
+            # Keep the top-level fields that were complete
+            parser = StreamingFieldParser()
+            parsed = dict(parser.feed(repaired) + parser.close())
+    if not isinstance(parsed, dict):
+        parsed = {}
+
+    kept = {
+        field: parsed[field] for field in fields
+        if isinstance(parsed.get(field), ANALYSIS_FIELDS[field])
+    }
+    return SalvagedAnalysis(kept, [field for field in fields if field not in kept], repairs)
@@ -0,0 +1,31 @@
+"""
+Analysis result schema - The fields every analysis returned by
+analyze_legal_document carries, matching the JSON schema in its prompt.
+"""
+
+
+# Field -> expected JSON type
+ANALYSIS_FIELDS = {
+    "summary": str,
+    "key_terms": list,
+    "main_clauses": list,
+    "critical_dates": list,
+    "parties": list,
+    "jurisdiction": str,
+    "obligations": list,
+    "risks": list,
+    "recommendations": list,
+    "missing_clauses": list,
+    "compliance_issues": list,
+    "next_steps": list
+}
+
+
+def is_valid_analysis(analysis):
+    """
+    True if analysis is a complete, error-free result matching the schema
+    (an analysis with "incomplete" fields filled in locally is not)
+    """
+    if not isinstance(analysis, dict) or "error" in analysis or analysis.get("incomplete"):
+        return False
+    return all(isinstance(analysis.get(field), kind) for field, kind in ANALYSIS_FIELDS.items())
@@ -0,0 +1,93 @@
+"""
+Streaming analysis output - Picks complete top-level fields out of the
+model's JSON while it is still being generated, so each analysis section
+can be sent to the client as soon as the model has finished writing it.
+"""
+import json
+
+
+class StreamingFieldParser:
+    """
+    Incremental parser for a JSON object arriving in pieces
+
+    feed() returns the top-level (key, value) pairs completed by each new
+    piece. Text before the opening brace (e.g. a ```json fence) and after
+    the closing one is ignored. A value that does not parse is skipped;
+    the caller still parses the full text at the end.
+    """
+
+    def __init__(self):
+        self.text = ""
+        self._pos = 0
+        self._depth = 0
+        self._started = False
+        self._closed = False
+        self._in_string = False
+        self._escape = False
+        self._key = None
+        self._key_start = None
+        self._value_start = None
+
+    def feed(self, chunk):
+        """
+        Add the next piece of output
+
+        Returns:
+            list: (key, value) for every top-level field completed by it
+        """
+        self.text += chunk or ""
+        text, fields = self.text, []
+        i = self._pos
+        while i < len(text) and not self._closed:
+            ch = text[i]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+                    if self._depth == 1 and self._key is None and self._key_start is not None:
+                        self._key = json.loads(text[self._key_start:i + 1])
+            elif not self._started:
+                if ch == "{":
+                    self._started, self._depth = True, 1
+            elif ch == '"':
+                self._in_string = True
+                if self._depth == 1 and self._key is None:
+                    self._key_start = i
+            elif ch in "{[":
+                self._depth += 1
+            elif ch in "}]":
+                self._depth -= 1
+                if self._depth == 0:
+                    self._finish(text, i, fields)
+                    self._closed = True
+            elif ch == ":" and self._depth == 1 and self._key is not None and self._value_start is None:
+                self._value_start = i + 1
+            elif ch == "," and self._depth == 1:
+                self._finish(text, i, fields)
+            i += 1
+        self._pos = i
+        return fields
+
+    def close(self):
+        """
+        End of output
+
+        Returns:
+            list: The last top-level field, if the output stopped (e.g. was
+                cut off) after its value but before the closing brace
+        """
+        fields = []
+        if self._started and not self._closed and not self._in_string and self._depth == 1:
+            self._finish(self.text, len(self.text), fields)
+        return fields
+
+    def _finish(self, text, end, fields):
+        if self._key is not None and self._value_start is not None:
+            try:
+                fields.append((self._key, json.loads(text[self._value_start:end])))
+            except ValueError:
+                pass
+        self._key = self._key_start = self._value_start = None
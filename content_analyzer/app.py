@@ -1,22 +1,20 @@
 import io
-import re
-import pdfplumber
+import sys
 import docx
-import pytesseract
-import fitz
-from PIL import Image
-from flask import Flask, request, jsonify, send_file
+from flask import Flask, Request, Response, request, jsonify, send_file, stream_with_context
 from reportlab.platypus import SimpleDocTemplate, Paragraph
 from reportlab.lib.styles import getSampleStyleSheet
 import json
 import os
 from datetime import datetime
 import textwrap
+import queue
+import threading
+import time
 
 # Try to import Vertex AI components
 try:
     import google.cloud.aiplatform as aiplatform
-    from vertexai.generative_models import GenerativeModel, Part
     VERTEX_AI_AVAILABLE = True
 except ImportError:
     VERTEX_AI_AVAILABLE = False
@@ -25,6 +23,12 @@ except Exception as e:
     VERTEX_AI_AVAILABLE = False
     print(f"Vertex AI initialization failed: {e}")
 
+# The app's own packages (learning, extraction, analysis, ...) sit next to
+# this file; make them importable when it is loaded as content_analyzer.app
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+if APP_DIR not in sys.path:
+    sys.path.insert(0, APP_DIR)
+
 # Import learning module
 try:
     from learning import get_learning_manager
@@ -34,8 +38,40 @@ except ImportError as e:
     LEARNING_AVAILABLE = False
     print(f"Learning system not available: {e}")
 
+from extraction import (
+    get_ocr_pool, iter_pdf_pages, get_extraction_cache, file_digest,
+    named_spool_file, stream_path, SPOOL_THRESHOLD_BYTES, ExtractionBudget,
+    admit_extraction, extract_docx_text
+)
+
+class SpoolingRequest(Request):
+    """
+    Request that writes large uploads straight to a named temp file
+    
+    Extractors can then open the upload by path instead of copying it
+    into memory. The file is deleted when Flask closes the request.
+    """
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        if total_content_length is None or total_content_length > SPOOL_THRESHOLD_BYTES:
+            suffix = os.path.splitext(filename or "")[1].lower()
+            return named_spool_file(suffix=suffix)
+        return io.BytesIO()
+
+from jobs import get_job_manager, JobQueueFull
+from batch import get_batch_runner, collect_batch, detach_upload, BatchTooLarge
+from analysis import (
+    get_analysis_cache, get_llm_client, prewarm_llm, map_reduce_analysis, get_section_pool,
+    StreamingFieldParser, salvage_analysis, compact_text, CHARS_PER_TOKEN, incremental_analysis, get_index_cache,
+    get_llm_registry, run_with_deadline, get_deadline_pool, DeadlineExceeded, CircuitOpenError, PAGE_BREAK,
+    ANALYSIS_SECTION_CHARS, ANALYSIS_MAX_SECTIONS, ANALYSIS_TOKEN_BUDGET, CHAT_TOP_K, CHAT_TOKEN_BUDGET
+)
+from documents import get_document_store
+from singleflight import get_single_flight
+from classification import CueMatcher, BatchClassifier
+
 # Flask app
 app = Flask(__name__)
+app.request_class = SpoolingRequest
 
 # Google Cloud configuration
 GOOGLE_CLOUD_PROJECT = os.environ.get("GOOGLE_CLOUD_PROJECT", "your-google-cloud-project-id")
@@ -49,12 +85,18 @@ if VERTEX_AI_AVAILABLE:
             location=GOOGLE_CLOUD_LOCATION
         )
         print("Vertex AI initialized successfully")
+        # Each gunicorn worker imports this module, so this runs once per worker
+        prewarm_llm()
     except Exception as e:
         VERTEX_AI_AVAILABLE = False
         print(f"Vertex AI initialization failed: {e}")
 else:
     print("Vertex AI not available")
 
+# Any provider other than Vertex (e.g. LLM_PROVIDER=mock for offline load
+# tests) runs without Vertex AI
+LLM_AVAILABLE = VERTEX_AI_AVAILABLE or os.environ.get("LLM_PROVIDER", "vertex") != "vertex"
+
 # Section cues to check for agreements
 POSITIVE_LABELS = [
     "agreement", "legal contract", "rental agreement", "lease agreement",
@@ -72,10 +114,50 @@ SECTION_CUES = [
     "attendance", "leaves", "certificate", "offer letter"
 ]
 
+# Document type patterns
+DOCUMENT_TYPE_PATTERNS = {
+    "rental agreement": ["rent", "lease", "tenant", "landlord", "security deposit"],
+    "employment contract": ["employment", "employee", "employer", "salary", "position"],
+    "service agreement": ["service", "provider", "client", "deliverable"],
+    "loan agreement": ["loan", "borrower", "lender", "interest rate"],
+    "nda": ["confidential", "non-disclosure", "secrecy"],
+    "purchase agreement": ["purchase", "buy", "sell", "buyer", "seller"],
+    "internship agreement": ["internship", "intern", "supervisor", "internship period"]
+}
+
+# One precompiled matcher counts every cue above in a single pass
+CUE_MATCHER = CueMatcher(SECTION_CUES + [k for keywords in DOCUMENT_TYPE_PATTERNS.values() for k in keywords])
+
+# Chunk score needed for a chunk to vote "agreement", and the vote ratio
+# or whole-text score needed to accept a document
+CHUNK_THRESHOLD = 0.5
+ACCEPT_THRESHOLD = 0.4
+
+# Pages read between checks for an early rejection of a streamed document.
+# Cues found in part of a document undercount the whole, so it is only
+# rejected before the end when its vote ratio and whole-text score are both
+# this far below ACCEPT_THRESHOLD
+CLASSIFY_MAX_PAGES = int(os.environ.get("CLASSIFY_MAX_PAGES", "5"))
+CLASSIFY_REJECT_MARGIN = float(os.environ.get("CLASSIFY_REJECT_MARGIN", "0.35"))
+
+# Limits for one /batch_analysis request. Larger batches than
+# BATCH_STREAM_MAX_FILES must run as a background job (async=true): a
+# streamed batch holds a gunicorn worker and has to finish within its timeout
+BATCH_MAX_FILES = int(os.environ.get("BATCH_MAX_FILES", "50"))
+BATCH_STREAM_MAX_FILES = int(os.environ.get("BATCH_STREAM_MAX_FILES", "4"))
+BATCH_MAX_UNZIPPED_MB = int(os.environ.get("BATCH_MAX_UNZIPPED_MB", "200"))
+
+# Seconds between keep-alive comments on idle server-sent event streams
+SSE_KEEPALIVE_SECONDS = 15
+
 # Helpers
 def safe_join_text(parts):
     return "\n".join([p for p in parts if p])
 
+def join_pages(pages):
+    # Empty pages are kept so compaction can tell where each page sits
+    return PAGE_BREAK.join(page or "" for page in pages)
+
 def chunk_text(text, max_words=300, max_chunks=10):
     """
     Split text into chunks of specified word count
@@ -93,8 +175,8 @@ def chunk_text(text, max_words=300, max_chunks=10):
     return chunks[:max_chunks]
 
 def heuristic_score(text):
-    t = (text or "").lower()
-    found = sum(1 for k in SECTION_CUES if re.search(r"\b" + re.escape(k) + r"\b", t))
+    counts = CUE_MATCHER.scan(text)
+    found = sum(1 for k in SECTION_CUES if counts.present(k))
     return found / max(1, len(SECTION_CUES))
 
 def classify_agreement(text):
@@ -112,7 +194,6 @@ def classify_agreement(text):
     chunks = chunk_text(text, max_words=300, max_chunks=10)
     details["chunks"] = len(chunks)
     votes, per_chunk_scores = 0, []
-    CHUNK_THRESHOLD = 0.5
     for ch in chunks:
         # Simple keyword-based classification instead of ML model
         score = heuristic_score(ch)
@@ -127,35 +208,83 @@ def classify_agreement(text):
         "heuristic": round(heur, 3),
         "avg_chunk_score": round(sum(per_chunk_scores) / max(1, len(per_chunk_scores)), 3)
     })
-    accept = (ratio >= 0.4) or (heur >= 0.4)
+    accept = (ratio >= ACCEPT_THRESHOLD) or (heur >= ACCEPT_THRESHOLD)
     if not accept:
         details["reason"] = "low_confidence"
     return accept, details
 
+def clearly_rejected(details):
+    """
+    Whether classify_agreement details of part of a document are far
+    enough below ACCEPT_THRESHOLD that reading the rest won't accept it
+    """
+    floor = ACCEPT_THRESHOLD - CLASSIFY_REJECT_MARGIN
+    return details["vote_ratio"] < floor and details["heuristic"] < floor
+
+def classify_agreement_stream(pages, max_pages=None, max_words=300, max_chunks=10):
+    """
+    Classify a document while it is still being extracted
+    
+    The text read so far is checked once it fills every classification
+    chunk or reaches max_pages pages, then every max_pages pages. A
+    document is rejected early only when a check is clearly negative (see
+    clearly_rejected); its details are then those of the partial text and
+    carry "partial": True. Any other document is extracted in full and
+    classified on the complete text, so its decision and details are the
+    same as classify_agreement's.
+    
+    Args:
+        pages (iterator): Page texts, e.g. from iter_document_pages
+        max_pages (int, optional): Pages read between checks
+        
+    Returns:
+        tuple: (accepted, details, extracted text)
+    """
+    max_pages = max_pages or CLASSIFY_MAX_PAGES
+    words_needed = max_words * max_chunks
+    seen, words, checked = [], 0, 0
+    for page in pages:
+        seen.append(page)
+        words += len((page or "").split())
+        if checked is None:
+            continue
+        # Enough text to fill every classification chunk, or enough pages
+        # since the last check
+        if len(seen) - checked >= max_pages or (not checked and words >= words_needed):
+            checked = len(seen)
+            is_ok, details = classify_agreement(join_pages(seen))
+            if is_ok:
+                # Likely an agreement: only the full text decides now
+                checked = None
+            elif clearly_rejected(details):
+                if hasattr(pages, "close"):
+                    pages.close()
+                details.update({"pages_examined": len(seen), "partial": True})
+                return False, details, join_pages(seen)
+    
+    text = join_pages(seen)
+    is_ok, details = classify_agreement(text)
+    details["pages_examined"] = len(seen)
+    return is_ok, details, text
+
 # Document type detection
 def detect_document_type(text):
     """
     Enhanced document type detection
     
+    Plain substring checks stop at the first occurrence of each keyword,
+    which is much faster for one document than a full CueMatcher scan
+    (see benchmark_classification.py); detect_document_types batches
+    use the matcher.
+    
     Returns:
         str: Detected document type
     """
     text_lower = text.lower()
     
-    # Document type patterns
-    patterns = {
-        "rental agreement": ["rent", "lease", "tenant", "landlord", "security deposit"],
-        "employment contract": ["employment", "employee", "employer", "salary", "position"],
-        "service agreement": ["service", "provider", "client", "deliverable"],
-        "loan agreement": ["loan", "borrower", "lender", "interest rate"],
-        "nda": ["confidential", "non-disclosure", "secrecy"],
-        "purchase agreement": ["purchase", "buy", "sell", "buyer", "seller"],
-        "internship agreement": ["internship", "intern", "supervisor", "internship period"]
-    }
-    
     # Score each document type
     scores = {}
-    for doc_type, keywords in patterns.items():
+    for doc_type, keywords in DOCUMENT_TYPE_PATTERNS.items():
         score = sum(1 for keyword in keywords if keyword in text_lower)
         scores[doc_type] = score
     
@@ -167,6 +296,34 @@ def detect_document_type(text):
     
     return "general legal document"
 
+BATCH_CLASSIFIER = BatchClassifier(
+    CUE_MATCHER, SECTION_CUES, DOCUMENT_TYPE_PATTERNS, chunk_text,
+    chunk_threshold=CHUNK_THRESHOLD, accept_threshold=ACCEPT_THRESHOLD
+)
+
+def classify_agreements(texts, with_document_type=False):
+    """
+    classify_agreement for many documents at once, e.g. for backfills
+    
+    Args:
+        texts (list): Document texts
+        with_document_type (bool): Add detect_document_type's result to
+            each details dict as "document_type"
+        
+    Returns:
+        list: (accepted, details) per text
+    """
+    return BATCH_CLASSIFIER.classify(texts, with_document_type=with_document_type)
+
+def detect_document_types(texts):
+    """
+    detect_document_type for many documents at once
+    
+    Returns:
+        list: Detected document type per text
+    """
+    return BATCH_CLASSIFIER.document_types(texts)
+
 # Fallback analysis function
 def create_fallback_analysis(text, document_type):
     """
@@ -194,114 +351,305 @@ def create_fallback_analysis(text, document_type):
         "next_steps": ["Review document with legal counsel"]
     }
 
+# Bump when the analysis prompt changes so cached analyses are not reused
+ANALYSIS_PROMPT_VERSION = 3
+
+# Follow-up requests for analysis fields missing from a malformed or
+# truncated model response, before they are filled in locally
+ANALYSIS_REPAIR_ATTEMPTS = int(os.environ.get("ANALYSIS_REPAIR_ATTEMPTS", "1"))
+
+# Revisions with more of their text changed than this are analyzed in full
+INCREMENTAL_MAX_CHANGED = float(os.environ.get("INCREMENTAL_MAX_CHANGED", "0.5"))
+
+# Longest one analysis request may take, counted from the start of the
+# request so extraction and OCR time is included, before the model is given
+# up on and the local fallback analysis answers (0 waits indefinitely);
+# keep it under the gunicorn timeout
+ANALYSIS_DEADLINE_SECONDS = float(os.environ.get("ANALYSIS_DEADLINE_SECONDS", "60"))
+
+def analysis_deadline(started=None):
+    """
+    time.monotonic() value by which a request that started at started
+    (default: now) must have its model analysis, or None without a deadline
+    """
+    if not ANALYSIS_DEADLINE_SECONDS:
+        return None
+    return (time.monotonic() if started is None else started) + ANALYSIS_DEADLINE_SECONDS
+
+def served_by(path, started, reason=None):
+    """
+    Response metadata naming the path that produced an analysis
+    """
+    meta = {"path": path, "seconds": round(time.monotonic() - started, 3)}
+    if reason:
+        meta["reason"] = reason
+    return meta
+
+def log_compaction(label, compaction):
+    print(f"{label} input compacted: {compaction.original_tokens} -> {compaction.tokens} tokens "
+          f"({compaction.reduction:.0%} smaller, {compaction.omitted_passages} passages omitted)")
+
+# Example of each analysis field, shown to the model as the schema to follow
+ANALYSIS_PROMPT_SCHEMA = {
+    "summary": "Brief 2-3 sentence overview of the entire document",
+    "key_terms": [{"term": "Defined term", "definition": "Clear definition from the document"}],
+    "main_clauses": [{"name": "Clause name/title", "description": "Brief description of what this clause covers"}],
+    "critical_dates": [{"date": "YYYY-MM-DD or date range", "event": "What happens on this date"}],
+    "parties": [{"name": "Party name", "role": "Their role in the agreement"}],
+    "jurisdiction": "Governing law and jurisdiction information",
+    "obligations": [{"party": "Which party", "responsibility": "What they must do"}],
+    "risks": [{"risk": "Identified risk", "severity": "high/medium/low", "description": "Explanation of the risk"}],
+    "recommendations": ["Actionable recommendation to address identified issues"],
+    "missing_clauses": [{"clause": "Missing clause name", "importance": "Why it's important"}],
+    "compliance_issues": [{"issue": "Compliance concern", "regulation": "Relevant law/regulation (if identifiable)"}],
+    "next_steps": ["Action item that should be taken next"]
+}
+
+def build_analysis_prompt(text, document_type, section=False, fields=None):
+    """
+    Prompt asking for the 12-category analysis of text
+    
+    Args:
+        section (bool): text is one section of a longer document
+        fields (list, optional): Ask for only these analysis fields
+    """
+    # Enhanced prompt engineering for comprehensive analysis
+    scope = " This text is one section of a longer document; analyze only what it contains." if section else ""
+    if fields:
+        scope += " Only the parts of the analysis in the schema below are needed."
+    schema = json.dumps({field: ANALYSIS_PROMPT_SCHEMA[field] for field in fields or ANALYSIS_PROMPT_SCHEMA}, indent=4)
+    prompt = f"""
+    Analyze the following {document_type or 'legal document'} and provide a comprehensive analysis.{scope}
+    Return ONLY valid JSON that strictly matches this schema:
+    
+{textwrap.indent(schema, "    ")}
+    
+    Document Text:
+    {text}
+    """
+    return prompt
+
+def summarize_sections(summaries, document_type):
+    """
+    One short overview of a long document from the summaries of its sections
+    """
+    numbered = "\n".join(f"{i}. {summary}" for i, summary in enumerate(summaries, 1))
+    prompt = f"""
+    The following are summaries of consecutive sections of one {document_type or 'legal document'}.
+    Write a brief 2-3 sentence overview of the entire document. Return only the overview text.
+    
+    Section summaries:
+    {numbered}
+    """
+    return get_llm_client("chat").generate(prompt).strip()
+
+def salvage_model_analysis(llm, response_text, text, document_type, section=False):
+    """
+    The analysis in a model response, with the fields that did not parse
+    asked for again
+    
+    Fields still missing after ANALYSIS_REPAIR_ATTEMPTS follow-up requests,
+    or after a follow-up request fails, are taken from the local fallback
+    analysis and listed under "incomplete" (such analyses are not cached).
+    
+    Raises:
+        json.JSONDecodeError: If not a single field could be parsed
+    """
+    salvaged = salvage_analysis(response_text)
+    if salvaged.repairs:
+        print(f"Analysis output repaired: {', '.join(salvaged.repairs)}")
+    analysis, missing = salvaged.fields, salvaged.missing
+    for attempt in range(ANALYSIS_REPAIR_ATTEMPTS):
+        if not missing:
+            break
+        print(f"Re-requesting {len(missing)} analysis fields: {', '.join(missing)}")
+        try:
+            response_text = llm.generate(build_analysis_prompt(text, document_type, section, fields=missing))
+        except Exception as e:
+            # What was already salvaged is kept; the rest is filled in locally
+            print(f"Re-request failed: {e}")
+            break
+        retry = salvage_analysis(response_text, missing)
+        analysis.update(retry.fields)
+        missing = retry.missing
+    
+    if missing:
+        if not analysis:
+            raise json.JSONDecodeError("No analysis field could be parsed", response_text or "", 0)
+        print(f"Analysis fields filled in locally: {', '.join(missing)}")
+        fallback = create_fallback_analysis(text, document_type)
+        analysis.update({field: fallback[field] for field in missing})
+        analysis["incomplete"] = missing
+    return analysis
+
+def generate_analysis(text, document_type, section=False, on_field=None):
+    """
+    Model analysis of text, served from the analysis cache when possible
+    
+    Args:
+        on_field (callable, optional): Called with (name, value) for each
+            top-level analysis field as soon as it is available; single
+            calls stream the model output to find them
+    
+    Raises:
+        json.JSONDecodeError: If no analysis field can be parsed from the
+            model's responses
+        Exception: If the model call fails
+    """
+    # Identical documents analyzed recently are served from the cache
+    llm = get_llm_client("analysis")
+    cache = get_analysis_cache()
+    cache_type = f"{document_type}#section" if section else document_type
+    cache_key = cache.make_key(text, cache_type, ANALYSIS_PROMPT_VERSION, llm.model_id)
+    analysis = cache.get(cache_key)
+    if analysis is not None:
+        print("Analysis cache hit")
+        for name, value in analysis.items():
+            on_field and on_field(name, value)
+        return analysis
+    
+    if len(text) > ANALYSIS_SECTION_CHARS:
+        # Sections are analyzed concurrently and each is cached on its own
+        analysis = map_reduce_analysis(
+            text,
+            lambda chunk: generate_analysis(chunk, document_type, section=True),
+            max_chars=ANALYSIS_SECTION_CHARS,
+            max_sections=ANALYSIS_MAX_SECTIONS,
+            executor=get_section_pool(),
+            summarize=lambda summaries: summarize_sections(summaries, document_type)
+        )
+        print(f"Merged analysis of {analysis['sections']['analyzed']}/{analysis['sections']['total']} sections")
+        for name, value in analysis.items():
+            on_field and on_field(name, value)
+        if analysis["sections"]["analyzed"] < analysis["sections"]["total"]:
+            # Partial results are returned but not stored
+            return analysis
+    else:
+        emitted = set()
+        if on_field:
+            # Stream the response, handing on each field once it is complete
+            parser = StreamingFieldParser()
+            for piece in llm.generate_stream(build_analysis_prompt(text, document_type, section)):
+                for name, value in parser.feed(piece):
+                    emitted.add(name)
+                    on_field(name, value)
+            response_text = parser.text
+        else:
+            # Generate response on the shared, pre-warmed client
+            response_text = llm.generate(build_analysis_prompt(text, document_type, section))
+        
+        # Keep every field that parses and ask again for the rest only
+        analysis = salvage_model_analysis(llm, response_text, text, document_type, section)
+        for name, value in analysis.items():
+            if on_field and name not in emitted:
+                on_field(name, value)
+    
+    # Only complete, schema-valid analyses are stored
+    cache.set(cache_key, analysis)
+    return analysis
+
 # Enhanced document analysis function
-def analyze_legal_document(text, document_type=None):
+def analyze_legal_document(text, document_type=None, emit=None, previous=None, deadline=None):
     """
     Comprehensive legal document analysis using Gemini AI
     
+    The text is compacted to ANALYSIS_TOKEN_BUDGET first. Documents still
+    longer than ANALYSIS_SECTION_CHARS are split on section boundaries,
+    analyzed section by section in parallel and merged. Given a previous
+    version, only the clauses that changed since it are analyzed and the
+    result is merged into its analysis.
+    
     Args:
         text (str): Extracted text from legal document
         document_type (str, optional): Type of document (auto-detected if None)
+        emit (callable, optional): emit(event, data) progress callback; gets
+            "document_type", "compacted" and then a "section" event per
+            analysis field as the model produces it
+        previous (dict, optional): Stored previous version of the document
+            (see documents.DocumentStore)
+        deadline (float, optional): time.monotonic() value the model must
+            answer by, e.g. from analysis_deadline(request start) (default:
+            ANALYSIS_DEADLINE_SECONDS from now)
+    
+    Past the deadline, or while the model's circuit breaker is open, the
+    local fallback analysis is returned instead.
     
     Returns:
-        dict: Structured analysis with 12 categories
+        dict: Structured analysis with 12 categories, a "served_by" entry
+            saying which path produced it ("model"; "partial" with a reason
+            when some sections of a long document failed; "fallback" with a
+            reason; or "error") and a "compaction" report when the model
+            was used
     """
     
     # Auto-detect document type if not provided
     if not document_type:
         document_type = detect_document_type(text)
+    if emit:
+        emit("document_type", {"document_type": document_type})
+    
+    # Drop extraction noise and fit the text into the token budget
+    compaction = compact_text(text, ANALYSIS_TOKEN_BUDGET)
+    log_compaction("Analysis", compaction)
+    if emit:
+        emit("compacted", compaction.report())
     
-    # If Vertex AI is not available, use fallback analysis
-    if not VERTEX_AI_AVAILABLE:
+    started = time.monotonic()
+    def fallback(reason):
+        analysis = create_fallback_analysis(compaction.text, document_type)
+        analysis["served_by"] = served_by("fallback", started, reason)
+        return analysis
+    
+    # If no model is available, use fallback analysis
+    if not LLM_AVAILABLE:
         print("Using fallback analysis - Vertex AI not available")
-        return create_fallback_analysis(text, document_type)
+        return fallback("llm_unavailable")
     
-    # Enhanced prompt engineering for comprehensive analysis
-    prompt = f"""
-    Analyze the following {document_type or 'legal document'} and provide a comprehensive analysis.
-    Return ONLY valid JSON that strictly matches this schema:
+    # A provider that keeps failing is not waited on again until it recovers
+    breaker = get_llm_registry().breaker
+    if breaker.is_open():
+        print("Using fallback analysis - LLM circuit open")
+        return fallback("circuit_open")
     
-    {{
-        "summary": "Brief 2-3 sentence overview of the entire document",
-        "key_terms": [
-            {{
-                "term": "Defined term",
-                "definition": "Clear definition from the document"
-            }}
-        ],
-        "main_clauses": [
-            {{
-                "name": "Clause name/title",
-                "description": "Brief description of what this clause covers"
-            }}
-        ],
-        "critical_dates": [
-            {{
-                "date": "YYYY-MM-DD or date range",
-                "event": "What happens on this date"
-            }}
-        ],
-        "parties": [
-            {{
-                "name": "Party name",
-                "role": "Their role in the agreement"
-            }}
-        ],
-        "jurisdiction": "Governing law and jurisdiction information",
-        "obligations": [
-            {{
-                "party": "Which party",
-                "responsibility": "What they must do"
-            }}
-        ],
-        "risks": [
-            {{
-                "risk": "Identified risk",
-                "severity": "high/medium/low",
-                "description": "Explanation of the risk"
-            }}
-        ],
-        "recommendations": [
-            "Actionable recommendation to address identified issues"
-        ],
-        "missing_clauses": [
-            {{
-                "clause": "Missing clause name",
-                "importance": "Why it's important"
-            }}
-        ],
-        "compliance_issues": [
-            {{
-                "issue": "Compliance concern",
-                "regulation": "Relevant law/regulation (if identifiable)"
-            }}
-        ],
-        "next_steps": [
-            "Action item that should be taken next"
-        ]
-    }}
+    # Sections arriving after the deadline must not follow the final event
+    abandoned = threading.Event()
+    on_field = (
+        lambda name, value: abandoned.is_set() or emit("section", {"name": name, "value": value})
+    ) if emit else None
     
-    Document Text:
-    {text[:50000]}  # Limit to prevent token overflow
-    """
+    def model_analysis():
+        analysis = None
+        if previous and previous.get("model_analysis"):
+            analysis = incremental_analysis(
+                compact_text(previous["text"], ANALYSIS_TOKEN_BUDGET).text, previous["analysis"], compaction.text,
+                lambda changes: generate_analysis(changes, document_type, section=True),
+                max_changed_ratio=INCREMENTAL_MAX_CHANGED
+            )
+            if analysis is not None:
+                print(f"Incremental analysis: {analysis['incremental']}")
+                for name, value in analysis.items():
+                    on_field and on_field(name, value)
+        if analysis is None:
+            analysis = generate_analysis(compaction.text, document_type, on_field=on_field)
+        return analysis
+    
+    if deadline is None:
+        deadline = analysis_deadline(started)
+    remaining = None if deadline is None else deadline - time.monotonic()
+    if remaining is not None and remaining <= 0:
+        print("Using fallback analysis - request deadline passed during extraction")
+        return fallback("deadline")
     
     try:
-        # Initialize Gemini model
-        model = GenerativeModel("gemini-1.5-flash-001")
-        
-        # Generate response
-        response = model.generate_content(
-            prompt,
-            generation_config={
-                "temperature": 0.4,
-                "top_p": 0.8,
-                "top_k": 40,
-                "max_output_tokens": 8192,
-            }
-        )
-        
-        # Parse and validate JSON response
-        analysis = json.loads(response.text)
+        analysis = run_with_deadline(model_analysis, remaining, get_deadline_pool())
+        analysis["compaction"] = compaction.report()
+        analysis["served_by"] = served_by("model", started)
+        sections = analysis.get("sections") or {}
+        if sections.get("analyzed", 0) < sections.get("total", 0):
+            # Sections refused while the breaker was half-open (or that
+            # failed) are missing from the merged analysis
+            reason = "circuit_open" if "CircuitOpenError" in sections.get("errors", ()) else "section_errors"
+            analysis["served_by"] = served_by("partial", started, reason)
         
         # If learning is available, enhance the analysis
         if LEARNING_AVAILABLE:
@@ -312,15 +660,26 @@ def analyze_legal_document(text, document_type=None):
         
         return analysis
         
+    except DeadlineExceeded as e:
+        abandoned.set()
+        # Only count it against the model if extraction left it a fair share
+        if remaining >= ANALYSIS_DEADLINE_SECONDS / 2:
+            breaker.record_failure()
+        print(f"Analysis deadline exceeded: {e}")
+        return fallback("deadline")
+    except CircuitOpenError as e:
+        print(f"Analysis skipped: {e}")
+        return fallback("circuit_open")
     except json.JSONDecodeError as e:
         print(f"JSON parsing failed: {e}")
         # Fallback to basic analysis if JSON parsing fails
-        return create_fallback_analysis(text, document_type)
+        return fallback("invalid_json")
     except Exception as e:
         print(f"Analysis failed: {e}")
         # Return error structure
         return {
             "error": f"Analysis failed: {str(e)}",
+            "served_by": served_by("error", started),
             "summary": "Document analysis could not be completed due to technical issues.",
             "key_terms": [],
             "main_clauses": [],
@@ -335,13 +694,286 @@ def analyze_legal_document(text, document_type=None):
             "next_steps": []
         }
 
+def classify_upload(file_stream, filename, emit=None):
+    """
+    Extract and classify one uploaded document
+    
+    Args:
+        emit (callable, optional): emit(event, data) progress callback; gets
+            "extracted" and "classified" events
+    
+    Returns:
+        tuple: (rejection body or None, HTTP status, extracted text, ExtractionBudget)
+    """
+    # Extract text page by page, classifying as soon as enough is read
+    budget = ExtractionBudget.from_env()
+    pages = iter_document_pages(file_stream, filename.lower(), budget)
+    if pages is None:
+        print(f"Unsupported file type: {filename}")
+        return {"error": "Unsupported file type"}, 400, "", None
+    
+    if not admit_extraction():
+        print("Extraction refused: worker over its memory limit")
+        return {"error": "Server busy, please retry shortly"}, 503, "", None
+    
+    is_ok, details, text = classify_agreement_stream(budget.limit(pages))
+    print(f"Extracted text length: {len(text)}")
+    if budget.truncated:
+        print(f"Extraction truncated: {budget.report()}")
+    print(f"Classification result: {is_ok}, Details: {details}")
+    if emit:
+        emit("extracted", {"characters": len(text), "extraction": budget.report()})
+        emit("classified", {"accepted": is_ok, "details": details})
+    
+    if not is_ok:
+        return {
+            "error": "Rejected: Not a valid agreement.",
+            "details": details
+        }, 400, text, budget
+    return None, 200, text, budget
+
+def analysis_response(filename, text, budget, emit=None, previous_document_id=None, deadline=None):
+    """
+    Analyze classified text, store it under a new document id and build
+    the response body
+    
+    Args:
+        previous_document_id (str, optional): document_id of an earlier
+            version; only the clauses changed since it are analyzed
+        deadline (float, optional): See analyze_legal_document
+    
+    Returns:
+        tuple: (response body dict, HTTP status code)
+    """
+    store = get_document_store()
+    previous = store.get(previous_document_id) if previous_document_id else None
+    if previous_document_id and previous is None:
+        print(f"Previous document {previous_document_id} not found; analyzing in full")
+    
+    print("Performing enhanced analysis")
+    document_type = (previous or {}).get("document_type") or detect_document_type(text)
+    analysis = analyze_legal_document(text, document_type, emit=emit, previous=previous, deadline=deadline)
+    print(f"Analysis completed: {analysis.get('summary', 'No summary')[:100]}...")
+    
+    # Keep the text, analysis and chat index for follow-up requests by id;
+    # only model analyses are a base for analyzing later revisions
+    document_id = store.save(
+        text, analysis, document_type, filename,
+        previous_document_id=previous_document_id if previous else None,
+        model_analysis=analysis.get("served_by", {}).get("path") == "model",
+        index=get_index_cache().get_or_build(text)
+    )
+    
+    body = {
+        "document_id": document_id,
+        "filename": filename,
+        "extracted_text": text,
+        "extraction": budget.report(),
+        "analysis": analysis,
+        "timestamp": datetime.now().isoformat()
+    }
+    if previous_document_id:
+        body["previous_document_id"] = previous_document_id
+        if previous is None:
+            body["warning"] = "previous_document_id not found or expired; analyzed in full"
+    return body, 200
+
+def run_enhanced_analysis(file_stream, filename, set_stage=None, emit=None, previous_document_id=None, started=None):
+    """
+    Extract, classify and analyze one uploaded document
+    
+    Shared by the synchronous endpoint and background jobs.
+    
+    Args:
+        file_stream: Seekable binary stream of the upload
+        filename (str): Original file name
+        set_stage (callable, optional): Called with each stage name as it starts
+        emit (callable, optional): emit(event, data) callback for progress
+            events (see classify_upload and analyze_legal_document)
+        previous_document_id (str, optional): See analysis_response
+        started (float, optional): time.monotonic() when the request
+            started; the analysis deadline counts from it (default: now,
+            before extraction)
+    
+    Returns:
+        tuple: (response body dict, HTTP status code)
+    """
+    set_stage = set_stage or (lambda stage: None)
+    deadline = analysis_deadline(started)
+    
+    set_stage("extracting")
+    rejection, status, text, budget = classify_upload(file_stream, filename, emit)
+    if rejection is not None:
+        return rejection, status
+    
+    # Perform enhanced analysis
+    set_stage("analyzing")
+    return analysis_response(filename, text, budget, emit, previous_document_id, deadline)
+
+def coalesced_enhanced_analysis(file_stream, filename, set_stage=None, emit=None, previous_document_id=None, started=None):
+    """
+    run_enhanced_analysis, shared with identical uploads already in flight
+    
+    Uploads with the same content and previous_document_id wait for the
+    one running in any worker (a double-clicked upload, a retry after a
+    client timeout) and get its result. Waiting callers get a "waiting"
+    stage and none of the running call's progress events.
+    
+    Returns:
+        tuple: (response body dict, HTTP status code)
+    """
+    key = f"enhanced_analysis:{file_digest(file_stream)}:{previous_document_id or ''}"
+    (body, status), shared = get_single_flight().run(
+        key,
+        lambda: run_enhanced_analysis(file_stream, filename, set_stage, emit, previous_document_id, started),
+        on_wait=lambda: set_stage and set_stage("waiting")
+    )
+    if shared:
+        print(f"Shared the result of an identical in-flight analysis ({shared})")
+        body = dict(body, coalesced=True)
+        if "filename" in body:
+            body["filename"] = filename
+    return body, status
+
+def wants_async():
+    value = request.args.get("async") or request.form.get("async") or ""
+    return value.lower() in ("1", "true", "yes")
+
+def wants_stream(data=None):
+    value = request.args.get("stream") or request.form.get("stream") or (data or {}).get("stream") or ""
+    return str(value).lower() in ("1", "true", "yes") or "text/event-stream" in request.headers.get("Accept", "")
+
+def sse_event(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+def event_stream(task):
+    """
+    Run task(emit) on a background thread and stream whatever it emits as
+    server-sent events
+    
+    The first bytes go out immediately, and a comment is sent while
+    nothing else is, so proxies keep the connection open through long
+    model calls.
+    """
+    events = queue.Queue()
+    
+    def run():
+        try:
+            task(lambda event, data: events.put((event, data)))
+        except Exception as e:
+            print(f"Error in event stream: {e}")
+            events.put(("error", {"error": f"Internal server error: {str(e)}", "http_status": 500}))
+        finally:
+            events.put(None)
+    
+    threading.Thread(target=run, name="sse", daemon=True).start()
+    
+    def generate():
+        yield ": stream opened\n\n"
+        while True:
+            try:
+                item = events.get(timeout=SSE_KEEPALIVE_SECONDS)
+            except queue.Empty:
+                yield ": keep-alive\n\n"
+                continue
+            if item is None:
+                break
+            yield sse_event(*item)
+    
+    return Response(
+        stream_with_context(generate()),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+def stream_enhanced_analysis(file, previous_document_id=None, started=None):
+    """
+    Streaming variant of /enhanced_analysis
+    
+    Events: "stage", "extracted", "classified", "document_type", one
+    "section" per analysis field as the model writes it, then "complete"
+    with the body the JSON endpoint would return (or "error" with the
+    error body), both carrying "http_status". The final event is
+    authoritative: if the model output turns out not to be valid JSON,
+    its fallback analysis replaces any sections already sent.
+    """
+    filename = file.filename
+    # Flask closes the upload once this view returns
+    file_stream = detach_upload(file.stream)
+    
+    def task(emit):
+        try:
+            body, status = coalesced_enhanced_analysis(
+                file_stream, filename,
+                set_stage=lambda stage: emit("stage", {"stage": stage}),
+                emit=emit,
+                previous_document_id=previous_document_id,
+                started=started
+            )
+            emit("complete" if status == 200 else "error", dict(body, http_status=status))
+        finally:
+            file_stream.close()
+    
+    return event_stream(task)
+
+def build_chat_prompt(text, question):
+    return f"""
+    Based on the following document, answer the question accurately and concisely.
+    
+    Document:
+    {text}
+    
+    Question: {question}
+    
+    Answer:
+    """
+
+# Interactive document chat function
+def chat_about_document(text, question, on_token=None, index=None):
+    """
+    Interactive chat about the document
+    
+    Args:
+        text (str): Document text
+        question (str): User's question about the document
+        on_token (callable, optional): Called with each piece of the answer
+            as the model streams it
+        index (ChunkIndex, optional): Retrieval index of text, if already built
+    
+    Returns:
+        str: AI-generated answer
+    """
+    # Only the chunks most relevant to the question, within CHAT_TOKEN_BUDGET
+    index = index or get_index_cache().get_or_build(text)
+    excerpt, used = index.excerpt(question, CHAT_TOP_K, CHAT_TOKEN_BUDGET)
+    print(f"Chat context: chunks {used} of {len(index.chunks)}, ~{len(excerpt) // CHARS_PER_TOKEN} tokens")
+    prompt = build_chat_prompt(excerpt, question)
+    try:
+        llm = get_llm_client("chat")
+        if not on_token:
+            return llm.generate(prompt)
+        pieces = []
+        for piece in llm.generate_stream(prompt):
+            pieces.append(piece)
+            on_token(piece)
+        return "".join(pieces)
+    except Exception as e:
+        print(f"Chat failed: {e}")
+        return f"Unable to answer the question due to: {str(e)}"
+
 # Enhanced Flask route for document analysis
 @app.route("/enhanced_analysis", methods=["POST"])
 def enhanced_document_analysis():
     """
     Enhanced document analysis endpoint
+    
+    With async=true (query or form field) the upload is queued as a
+    background job and 202 is returned with a job id to poll at
+    /jobs/<job_id>. With stream=true (or Accept: text/event-stream)
+    progress and analysis sections are sent as server-sent events.
     """
     print("Received request to enhanced_analysis endpoint")
+    started = time.monotonic()
     
     if "file" not in request.files:
         print("No file uploaded")
@@ -353,89 +985,349 @@ def enhanced_document_analysis():
     if file.filename == "":
         print("No file selected")
         return jsonify({"error": "No file selected"}), 400
-
-    # Extract text (using existing functions)
-    filename = file.filename.lower()
-    text = ""
+    
+    if document_kind(file.filename.lower()) is None:
+        print(f"Unsupported file type: {file.filename}")
+        return jsonify({"error": "Unsupported file type"}), 400
+    
+    # document_id of an earlier version of this document, to analyze only the changes
+    previous_document_id = request.args.get("previous_document_id") or request.form.get("previous_document_id")
     
     try:
-        if filename.endswith(".pdf"):
-            print("Processing PDF file")
-            text = extract_pdf(file.stream)
-        elif filename.endswith(".docx"):
-            print("Processing DOCX file")
-            text = extract_docx(file.stream)
-        elif filename.endswith((".png", ".jpg", ".jpeg")):
-            print("Processing image file")
-            text = extract_image(file.stream)
-        else:
-            print(f"Unsupported file type: {filename}")
-            return jsonify({"error": "Unsupported file type"}), 400
-        
-        print(f"Extracted text length: {len(text)}")
-        
-        # Check if it's a valid agreement (using existing function)
-        is_ok, details = classify_agreement(text)
-        print(f"Classification result: {is_ok}, Details: {details}")
+        if wants_stream():
+            return stream_enhanced_analysis(file, previous_document_id, started)
         
-        if not is_ok:
+        if wants_async():
+            filename = file.filename
+            job_id = get_job_manager().submit(
+                "enhanced_analysis", file.stream, filename,
+                lambda stream, set_stage: coalesced_enhanced_analysis(stream, filename, set_stage,
+                                                                      previous_document_id=previous_document_id)
+            )
+            print(f"Queued job {job_id}")
             return jsonify({
-                "error": "Rejected: Not a valid agreement.",
-                "details": details
-            }), 400
-        
-        # Perform enhanced analysis
-        print("Performing enhanced analysis")
-        analysis = analyze_legal_document(text)
-        print(f"Analysis completed: {analysis.get('summary', 'No summary')[:100]}...")
+                "job_id": job_id,
+                "status": "queued",
+                "status_url": f"/jobs/{job_id}"
+            }), 202
         
-        return jsonify({
-            "filename": file.filename,
-            "extracted_text": text,
-            "analysis": analysis,
-            "timestamp": datetime.now().isoformat()
-        })
+        body, status = coalesced_enhanced_analysis(file.stream, file.filename, previous_document_id=previous_document_id,
+                                                   started=started)
+        return jsonify(body), status
+    except JobQueueFull as e:
+        print(f"Job queue full: {e}")
+        return jsonify({"error": "Server busy, please retry shortly"}), 503
     except Exception as e:
         print(f"Error in enhanced_document_analysis: {e}")
         import traceback
         traceback.print_exc()
         return jsonify({"error": f"Internal server error: {str(e)}"}), 500
 
-# File extraction functions
-def extract_pdf(file_stream):
+@app.route("/chat", methods=["POST"])
+def document_chat():
+    """
+    Interactive chat about a document
+    
+    The document is either sent as "document_text" or referred to by the
+    "document_id" returned by /enhanced_analysis. With "stream": true (or
+    Accept: text/event-stream) the answer is sent as server-sent "token"
+    events followed by "complete".
+    """
+    data = request.get_json(silent=True) or {}
+    document_text = data.get("document_text", "")
+    document_id = data.get("document_id")
+    question = data.get("question", "")
+    index = None
+    
+    if not (document_text or document_id) or not question:
+        return jsonify({"error": "Document text (or document_id) and question are required"}), 400
+    
+    if not document_text:
+        document = get_document_store().get(document_id)
+        if document is None:
+            return jsonify({"error": "Unknown or expired document_id"}), 404
+        document_text, index = document["text"], document["index"]
+    
+    if not LLM_AVAILABLE:
+        return jsonify({"error": "Chat is not available - Vertex AI is not configured"}), 503
+    
+    def response_body(answer):
+        return {
+            "question": question,
+            "answer": answer,
+            "timestamp": datetime.now().isoformat()
+        }
+    
+    if wants_stream(data):
+        def task(emit):
+            answer = chat_about_document(
+                document_text, question,
+                on_token=lambda piece: emit("token", {"text": piece}),
+                index=index
+            )
+            emit("complete", response_body(answer))
+        return event_stream(task)
+    
+    return jsonify(response_body(chat_about_document(document_text, question, index=index)))
+
+def run_batch(batch, on_result=None):
+    """
+    Extract and analyze the documents of a batch, closing it when done
+    
+    Yields one line per document, in completion order, with the body and
+    HTTP status /enhanced_analysis would have returned for it, then a
+    summary line. on_result(completed, total) is called after each document.
+    """
+    items = batch.items
+    
+    def extract(file_stream, filename):
+        rejection, status, text, budget = classify_upload(file_stream, filename)
+        if rejection is not None:
+            return rejection, status, None
+        return None, status, (filename, text, budget)
+    
+    def analyze(payload):
+        return analysis_response(*payload)
+    
+    counts = {"completed": 0, "rejected": 0, "failed": 0}
+    results = get_batch_runner().run(items, extract, analyze)
     try:
-        file_stream.seek(0)
-        with pdfplumber.open(file_stream) as pdf:
-            return safe_join_text([p.extract_text() for p in pdf.pages])
-    except Exception as e:
-        print(f"PDF extract error: {e}")
+        for done, (item, body, status) in enumerate(results, 1):
+            if status == 200:
+                counts["completed"] += 1
+            elif status == 400:
+                counts["rejected"] += 1
+            else:
+                counts["failed"] += 1
+            yield {
+                "index": item.index,
+                "filename": item.filename,
+                "http_status": status,
+                "result": body
+            }
+            if on_result:
+                on_result(done, len(items))
+    finally:
+        results.close()
+        batch.close()
+    yield {
+        "summary": dict(counts, total=len(items)),
+        "timestamp": datetime.now().isoformat()
+    }
+
+def batch_job(batch):
+    """
+    Background job task for a batch: the documents and summary that
+    /batch_analysis streams, collected into one result
+    """
+    def task(set_stage):
+        documents, summary = [], None
+        for line in run_batch(batch, lambda done, total: set_stage(f"{done} of {total} documents")):
+            if "summary" in line:
+                summary = line
+            else:
+                documents.append(line)
+        return dict(summary, documents=documents), 200
+    return task
+
+@app.route("/batch_analysis", methods=["POST"])
+def batch_document_analysis():
+    """
+    Analyze many documents in one request
+    
+    Accepts any number of "files" (or "file") fields; zip archives are
+    expanded into their documents. Documents are extracted concurrently and
+    those accepted as agreements are analyzed with bounded concurrency.
+    
+    Up to BATCH_STREAM_MAX_FILES documents, the response is streamed as
+    newline-delimited JSON: one line per document, in completion order,
+    then a summary line. With async=true (required for larger batches, up
+    to BATCH_MAX_FILES) the batch runs as a background job instead and a
+    job id is returned to poll at /jobs/<job_id>; the completed job's result
+    holds the summary and a "documents" list of the same lines.
+    """
+    print("Received request to batch_analysis endpoint")
+    
+    uploads = [
+        (f.filename, f.stream)
+        for f in request.files.getlist("files") + request.files.getlist("file")
+        if f.filename
+    ]
+    if not uploads:
+        print("No files uploaded")
+        return jsonify({"error": "No files uploaded"}), 400
+    
+    try:
+        batch = collect_batch(
+            uploads,
+            accept=lambda name: document_kind(name.lower()) is not None,
+            max_files=BATCH_MAX_FILES,
+            max_unzipped_bytes=BATCH_MAX_UNZIPPED_MB * 1024 * 1024
+        )
+    except BatchTooLarge as e:
+        print(f"Batch rejected: {e}")
+        return jsonify({"error": str(e)}), 413
+    items = batch.items
+    print(f"Batch of {len(items)} documents")
+    
+    if wants_async():
+        try:
+            job_id = get_job_manager().submit_task(
+                "batch_analysis", f"{len(items)} documents", batch_job(batch)
+            )
+        except JobQueueFull as e:
+            batch.close()
+            print(f"Job queue full: {e}")
+            return jsonify({"error": "Server busy, please retry shortly"}), 503
+        except Exception:
+            batch.close()
+            raise
+        print(f"Queued batch job {job_id}")
+        return jsonify({
+            "job_id": job_id,
+            "status": "queued",
+            "status_url": f"/jobs/{job_id}"
+        }), 202
+    
+    if len(items) > BATCH_STREAM_MAX_FILES:
+        batch.close()
+        print(f"Batch of {len(items)} documents too large to stream")
+        return jsonify({
+            "error": f"Batches of more than {BATCH_STREAM_MAX_FILES} documents must be "
+                     f"submitted with async=true and polled at /jobs/<job_id>"
+        }), 413
+    
+    def generate():
+        lines = run_batch(batch)
         try:
-            file_stream.seek(0)
-            doc = fitz.open(stream=file_stream.read(), filetype="pdf")
-            texts = []
-            for p in doc:
-                pix = p.get_pixmap(dpi=200)
-                img = Image.frombytes("RGB", [pix.width, pix.height], pix.samples)
-                texts.append(pytesseract.image_to_string(img))
-            return "\n".join(texts)
-        except Exception as e2:
-            print(f"PDF OCR error: {e2}")
-            return ""
+            for line in lines:
+                yield json.dumps(line) + "\n"
+        finally:
+            lines.close()
+    
+    return Response(stream_with_context(generate()), mimetype="application/x-ndjson")
+
+@app.route("/jobs/<job_id>", methods=["GET"])
+def job_status(job_id):
+    """
+    Endpoint to poll a background job
+    
+    Returns the job's status (queued, running, completed, failed), the
+    stage it has reached and, once completed, the same body the
+    synchronous endpoint would have returned along with its HTTP status.
+    """
+    try:
+        job = get_job_manager().get(job_id)
+        if job is None:
+            return jsonify({"error": "Job not found or expired"}), 404
+        
+        response = {
+            "job_id": job["id"],
+            "status": job["status"],
+            "stage": job["stage"],
+            "filename": job["filename"],
+            "created_at": datetime.fromtimestamp(job["created"]).isoformat(),
+            "updated_at": datetime.fromtimestamp(job["updated"]).isoformat(),
+            "expires_at": datetime.fromtimestamp(job["expires"]).isoformat()
+        }
+        if job["status"] == "completed":
+            response["http_status"] = job["http_status"]
+            response["result"] = job["result"]
+        elif job["status"] == "failed":
+            response["error"] = job["error"]
+        return jsonify(response), 200
+    except Exception as e:
+        print(f"Error in job_status: {e}")
+        return jsonify({"error": f"Internal server error: {str(e)}"}), 500
+
+# File extraction functions
+def extract_pdf(file_stream, budget=None):
+    pages = extract_pages(file_stream, "pdf", budget)
+    if budget is not None:
+        pages = budget.limit(pages)
+    return join_pages(pages)
 
 def extract_docx(file_stream):
+    return join_pages(extract_pages(file_stream, "docx"))
+
+def extract_image(file_stream):
+    return join_pages(extract_pages(file_stream, "image"))
+
+def extract_pages(file_stream, kind, budget=None):
+    """
+    Lazily extract an upload page by page, using the extraction cache
+    
+    PDFs are extracted one page at a time; DOCX files and images are
+    yielded as a single page.
+    
+    Args:
+        file_stream: Seekable binary stream of the upload
+        kind (str): "pdf", "docx" or "image"
+        budget (ExtractionBudget, optional): Told the page count; PDF pages
+            past its max_pages are not extracted
+        
+    Returns:
+        iterator: Page texts
+    """
+    extractors = {
+        "pdf": lambda s: iter_pdf_pages(s, budget=budget),
+        "docx": lambda s: [read_docx_text(s)],
+        "image": lambda s: [read_image_text(s)]
+    }
+    return get_extraction_cache().cached_pages(file_stream, kind, extractors[kind])
+
+def document_kind(filename):
+    """
+    Upload kind for a lower-cased file name: "pdf", "docx", "image" or None
+    """
+    if filename.endswith(".pdf"):
+        return "pdf"
+    if filename.endswith(".docx"):
+        return "docx"
+    if filename.endswith((".png", ".jpg", ".jpeg")):
+        return "image"
+    return None
+
+def iter_document_pages(file_stream, filename, budget=None):
+    """
+    Lazily extract an uploaded document based on its file name
+    
+    Returns:
+        iterator: Page texts, or None if the file type is unsupported
+    """
+    kind = document_kind(filename)
+    if kind is None:
+        return None
+    print(f"Processing {kind.upper()} file")
+    return extract_pages(file_stream, kind, budget)
+
+def read_docx_text(file_stream):
     try:
         file_stream.seek(0)
-        doc = docx.Document(io.BytesIO(file_stream.read()))
+        return extract_docx_text(file_stream)
+    except Exception as e:
+        print(f"DOCX stream extract error: {e}")
+    # Fall back to the python-docx object model for files the streaming
+    # reader can't handle
+    try:
+        file_stream.seek(0)
+        doc = docx.Document(file_stream)
         return "\n".join(p.text for p in doc.paragraphs if p.text)
     except Exception as e:
         print(f"DOCX extract error: {e}")
         return ""
 
-def extract_image(file_stream):
+def image_source(file_stream):
+    """
+    What to hand the OCR pool for an image upload: its path when the
+    upload was spooled to disk, otherwise its (small) contents
+    """
+    file_stream.seek(0)
+    return stream_path(file_stream) or file_stream.read()
+
+def read_image_text(file_stream):
     try:
-        file_stream.seek(0)
-        img = Image.open(file_stream).convert("RGB")
-        return pytesseract.image_to_string(img)
+        return get_ocr_pool().ocr_images([image_source(file_stream)])[0]
     except Exception as e:
         print(f"Image extract error: {e}")
         return ""
@@ -449,6 +1341,10 @@ def active():
 def submit_feedback():
     """
     Endpoint to submit user feedback for document analysis
+    
+    original_document and analysis_result may be left out when document_id
+    is one returned by /enhanced_analysis; they are then read from the
+    document store.
     """
     try:
         if not request.is_json:
@@ -456,6 +1352,14 @@ def submit_feedback():
         
         feedback_data = request.get_json()
         
+        if 'document_id' in feedback_data and not (
+            'original_document' in feedback_data and 'analysis_result' in feedback_data
+        ):
+            document = get_document_store().get(feedback_data['document_id'])
+            if document is not None:
+                feedback_data.setdefault('original_document', document["text"])
+                feedback_data.setdefault('analysis_result', document["analysis"])
+        
         required_fields = ['document_id', 'original_document', 'analysis_result', 'feedback']
         for field in required_fields:
             if field not in feedback_data:
@@ -499,6 +1403,25 @@ def learning_performance():
         print(f"Error in learning_performance: {e}")
         return jsonify({"error": f"Internal server error: {str(e)}"}), 500
 
+@app.route("/cache_stats", methods=["GET"])
+def cache_stats():
+    """
+    Endpoint to get hit/miss and size statistics for the shared caches
+    """
+    try:
+        return jsonify({
+            "extraction": get_extraction_cache().stats(),
+            "analysis": get_analysis_cache().stats(),
+            "documents": get_document_store().stats(),
+            "retrieval_indexes": get_index_cache().stats(),
+            "single_flight": get_single_flight().stats(),
+            "llm_circuit": get_llm_registry().breaker.stats(),
+            "timestamp": datetime.now().isoformat()
+        }), 200
+    except Exception as e:
+        print(f"Error in cache_stats: {e}")
+        return jsonify({"error": f"Internal server error: {str(e)}"}), 500
+
 @app.route("/export/pdf", methods=["POST"])
 def export_pdf():
     text = request.form.get("text", "")
@@ -0,0 +1,274 @@
+"""
+LegalKlarity Batch Analysis - Runs many uploaded documents (individual
+files or the contents of zip archives) through extraction and analysis
+concurrently, handing back each document's result as soon as it is ready.
+
+Extraction runs on one thread pool; documents that pass classification
+move on to a smaller analysis pool, so only a bounded number of LLM calls
+are in flight at once. A failure in one document is reported for that
+document only.
+"""
+import io
+import os
+import shutil
+import zipfile
+import threading
+import contextlib
+import queue
+from concurrent.futures import ThreadPoolExecutor
+
+from extraction import named_spool_file, stream_path, SPOOL_THRESHOLD_BYTES
+
+
+class BatchTooLarge(Exception):
+    """Raised when a batch has too many documents or too much unzipped data"""
+
+
+class BatchItem:
+    """
+    One document of a batch
+
+    Args:
+        index (int): Position in the batch, in upload order
+        filename (str): File name (archive members are "archive.zip/member")
+        opener (callable, optional): Returns a context manager yielding a
+            seekable binary stream of the document
+        error (str, optional): Set when the document cannot be processed at all
+    """
+
+    def __init__(self, index, filename, opener=None, error=None):
+        self.index = index
+        self.filename = filename
+        self.opener = opener
+        self.error = error
+
+    def open(self):
+        return self.opener()
+
+
+def detach_upload(file_stream):
+    """
+    A stream of the upload that outlives the request
+
+    Flask closes (and deletes) its upload files when the view returns,
+    before a streamed response is generated. Uploads spooled to disk are
+    reopened by path, which keeps the data readable after the unlink;
+    in-memory uploads are copied.
+    """
+    path = stream_path(file_stream)
+    if path is not None:
+        file_stream.flush()
+        return open(path, "rb")
+    return io.BytesIO(file_stream.getvalue())
+
+
+def _upload_opener(file_stream):
+    def opener():
+        file_stream.seek(0)
+        # Closed with the batch, once every document is done
+        return contextlib.nullcontext(file_stream)
+    return opener
+
+
+def _member_opener(archive, info, lock):
+    def opener():
+        suffix = os.path.splitext(info.filename)[1].lower()
+        spool = named_spool_file(suffix) if info.file_size > SPOOL_THRESHOLD_BYTES else io.BytesIO()
+        try:
+            # ZipFile reads share one underlying file object
+            with lock, archive.open(info) as member:
+                shutil.copyfileobj(member, spool, 1 << 20)
+            spool.seek(0)
+        except Exception:
+            spool.close()
+            raise
+        return contextlib.closing(spool)
+    return opener
+
+
+def _is_archive_junk(name):
+    base = os.path.basename(name)
+    return name.startswith("__MACOSX/") or base.startswith(".") or not base
+
+
+class Batch:
+    """
+    The documents of one batch request and the upload streams they read from
+    """
+
+    def __init__(self):
+        self.items = []
+        self.streams = []
+
+    def close(self):
+        for stream in self.streams:
+            try:
+                stream.close()
+            except Exception as e:
+                print(f"Batch cleanup error: {e}")
+        self.streams = []
+
+
+def collect_batch(uploads, accept, max_files, max_unzipped_bytes):
+    """
+    Expand a list of uploads into batch items
+
+    Zip archives are replaced by their supported members; unsupported
+    files become items carrying an error. The caller must close() the
+    returned Batch once its results have been consumed.
+
+    Args:
+        uploads (list): (filename, binary stream) pairs
+        accept (callable): accept(filename) -> True if the type is supported
+        max_files (int): Most documents allowed in one batch
+        max_unzipped_bytes (int): Most uncompressed bytes allowed across archives
+
+    Returns:
+        Batch: With a BatchItem per document
+
+    Raises:
+        BatchTooLarge: If the batch exceeds max_files or max_unzipped_bytes
+    """
+    batch, unzipped = Batch(), 0
+    items = batch.items
+
+    def add(filename, opener=None, error=None):
+        if len(items) >= max_files:
+            raise BatchTooLarge(f"A batch can contain at most {max_files} documents")
+        items.append(BatchItem(len(items), filename, opener, error))
+
+    try:
+        for filename, file_stream in uploads:
+            is_zip = filename.lower().endswith(".zip")
+            if not is_zip and not accept(filename):
+                add(filename, error="Unsupported file type")
+                continue
+
+            file_stream = detach_upload(file_stream)
+            batch.streams.append(file_stream)
+            if is_zip:
+                unzipped = _add_archive(add, filename, file_stream, accept, unzipped, max_unzipped_bytes)
+            else:
+                add(filename, _upload_opener(file_stream))
+    except Exception:
+        batch.close()
+        raise
+    return batch
+
+
+def _add_archive(add, filename, file_stream, accept, unzipped, max_unzipped_bytes):
+    """
+    Add the supported members of a zip archive; returns the running total
+    of uncompressed bytes
+    """
+    try:
+        archive = zipfile.ZipFile(file_stream)
+        members = [m for m in archive.infolist() if not m.is_dir() and not _is_archive_junk(m.filename)]
+    except (zipfile.BadZipFile, OSError) as e:
+        add(filename, error=f"Invalid zip archive: {e}")
+        return unzipped
+
+    lock = threading.Lock()
+    for info in members:
+        name = f"{filename}/{info.filename}"
+        if not accept(info.filename):
+            add(name, error="Unsupported file type")
+            continue
+        unzipped += info.file_size
+        if unzipped > max_unzipped_bytes:
+            raise BatchTooLarge(f"Archives expand to more than {max_unzipped_bytes // (1024 * 1024)} MB")
+        add(name, _member_opener(archive, info, lock))
+    return unzipped
+
+
+class BatchRunner:
+    """
+    Two-stage pipeline shared by every batch request in this worker
+
+    Args:
+        extract_workers (int): Documents extracted and classified at once
+        analysis_workers (int): Accepted documents analyzed at once
+    """
+
+    def __init__(self, extract_workers=4, analysis_workers=2):
+        self.extract_pool = ThreadPoolExecutor(max_workers=extract_workers, thread_name_prefix="batch-extract")
+        self.analysis_pool = ThreadPoolExecutor(max_workers=analysis_workers, thread_name_prefix="batch-analyze")
+
+    def run(self, items, extract, analyze):
+        """
+        Process items and yield their results in completion order
+
+        Args:
+            items (list): BatchItem per document
+            extract (callable): extract(file_stream, filename) ->
+                (response body, HTTP status, payload); a payload of None
+                means the document is finished (e.g. rejected)
+            analyze (callable): analyze(payload) -> (response body, HTTP status)
+
+        Yields:
+            tuple: (BatchItem, response body, HTTP status)
+
+        Closing the generator early (client went away) stops documents
+        that have not started yet.
+        """
+        results = queue.Queue()
+        cancelled = threading.Event()
+
+        def analyze_step(item, payload):
+            if cancelled.is_set():
+                return
+            try:
+                body, status = analyze(payload)
+            except Exception as e:
+                print(f"Batch analysis of {item.filename} failed: {e}")
+                body, status = {"error": f"Analysis failed: {str(e)}"}, 500
+            results.put((item, body, status))
+
+        def extract_step(item):
+            if cancelled.is_set():
+                return
+            try:
+                if item.error:
+                    body, status, payload = {"error": item.error}, 400, None
+                else:
+                    with item.open() as file_stream:
+                        body, status, payload = extract(file_stream, item.filename)
+                if payload is not None:
+                    self.analysis_pool.submit(analyze_step, item, payload)
+                    return
+            except Exception as e:
+                print(f"Batch extraction of {item.filename} failed: {e}")
+                body, status = {"error": f"Extraction failed: {str(e)}"}, 500
+            results.put((item, body, status))
+
+        futures = [self.extract_pool.submit(extract_step, item) for item in items]
+        try:
+            for _ in items:
+                yield results.get()
+        finally:
+            cancelled.set()
+            for future in futures:
+                future.cancel()
+
+    def shutdown(self):
+        self.extract_pool.shutdown(wait=False)
+        self.analysis_pool.shutdown(wait=False)
+
+
+# Global batch runner instance (one per gunicorn worker)
+batch_runner = None
+_batch_runner_lock = threading.Lock()
+
+
+def get_batch_runner():
+    """
+    Get the global batch runner instance
+    """
+    global batch_runner
+    with _batch_runner_lock:
+        if batch_runner is None:
+            batch_runner = BatchRunner(
+                extract_workers=int(os.getenv('BATCH_EXTRACT_WORKERS', '4')),
+                analysis_workers=int(os.getenv('BATCH_ANALYSIS_CONCURRENCY', '2'))
+            )
+    return batch_runner
@@ -0,0 +1,143 @@
+"""
+Benchmark keyword cue matching - Compares the previous per-cue regex and
+substring scans in heuristic_score, detect_document_type and
+DocumentAnalysisLearner.extract_features with the single-pass CueMatcher,
+on long synthetic documents, and checks both give identical results.
+
+Usage:
+    python benchmark_classification.py [--words N] [--repeat N] [--file PATH]
+"""
+import re
+import sys
+import time
+import random
+import argparse
+
+from classification import CueMatcher
+
+SECTION_CUES = [
+    "agreement", "security deposit", "rental period", "payment terms",
+    "termination", "arbitration", "jurisdiction",
+    "witness", "signatory", "governing law", "parties", "definitions",
+    "probation period", "internship duration", "performance",
+    "salary", "compensation", "notice period", "work expectations",
+    "attendance", "leaves", "certificate", "offer letter"
+]
+DOCUMENT_TYPE_PATTERNS = {
+    "rental agreement": ["rent", "lease", "tenant", "landlord", "security deposit"],
+    "employment contract": ["employment", "employee", "employer", "salary", "position"],
+    "service agreement": ["service", "provider", "client", "deliverable"],
+    "loan agreement": ["loan", "borrower", "lender", "interest rate"],
+    "nda": ["confidential", "non-disclosure", "secrecy"],
+    "purchase agreement": ["purchase", "buy", "sell", "buyer", "seller"],
+    "internship agreement": ["internship", "intern", "supervisor", "internship period"]
+}
+LEGAL_KEYWORDS = [
+    'agreement', 'contract', 'party', 'obligation', 'liability', 'warranty',
+    'indemnification', 'termination', 'jurisdiction', 'arbitration', 'dispute',
+    'compliance', 'regulation', 'penalty', 'remedy', 'condition', 'clause'
+]
+
+# Memoization is disabled so every call below pays for a full scan
+CUE_MATCHER = CueMatcher(SECTION_CUES + [k for keywords in DOCUMENT_TYPE_PATTERNS.values() for k in keywords], cache_size=0)
+LEGAL_KEYWORD_MATCHER = CueMatcher(LEGAL_KEYWORDS, cache_size=0)
+
+
+# Previous implementations
+def legacy_heuristic(text):
+    t = (text or "").lower()
+    return sum(1 for k in SECTION_CUES if re.search(r"\b" + re.escape(k) + r"\b", t))
+
+
+def legacy_document_scores(text):
+    text_lower = text.lower()
+    return {d: sum(1 for k in keywords if k in text_lower) for d, keywords in DOCUMENT_TYPE_PATTERNS.items()}
+
+
+def legacy_keyword_counts(text):
+    return [len(re.findall(r'\b' + re.escape(k) + r'\b', text.lower())) for k in LEGAL_KEYWORDS]
+
+
+# Single-pass implementations
+def matcher_heuristic(text):
+    counts = CUE_MATCHER.scan(text)
+    return sum(1 for k in SECTION_CUES if counts.present(k))
+
+
+def matcher_document_scores(text):
+    counts = CUE_MATCHER.scan(text)
+    return {d: sum(1 for k in keywords if counts.present(k, whole_word=False))
+            for d, keywords in DOCUMENT_TYPE_PATTERNS.items()}
+
+
+def matcher_keyword_counts(text):
+    counts = LEGAL_KEYWORD_MATCHER.scan(text)
+    return [counts.count(k) for k in LEGAL_KEYWORDS]
+
+
+# A request classifies the text, then detects its type. The app scores
+# the classification chunks with the matcher but keeps the substring checks
+# for the type, which stop at each keyword's first occurrence
+
+
+def legacy_classify_then_detect(text):
+    return legacy_heuristic(text), legacy_document_scores(text)
+
+
+def matcher_classify_then_detect(text):
+    return matcher_heuristic(text), legacy_document_scores(text)
+
+
+def synthetic_document(n_words, seed=7):
+    """
+    Filler prose with cue words sprinkled in, including near misses such
+    as "current" (contains "rent") and "buyers"
+    """
+    rng = random.Random(seed)
+    filler = ("the of and to in is that for it as was with be by on not this are or from at which "
+              "have an they were their has would when if so no out into time more some about other "
+              "current parent buyers intern's seller-side non-disclosure parties' clause7").split()
+    cues = SECTION_CUES + LEGAL_KEYWORDS + [k for v in DOCUMENT_TYPE_PATTERNS.values() for k in v]
+    words = [rng.choice(cues) if rng.random() < 0.02 else rng.choice(filler) for _ in range(n_words)]
+    return " ".join(words).upper()
+
+
+def timed(fn, text, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = fn(text)
+    return (time.perf_counter() - start) / repeat * 1000, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark keyword cue matching")
+    parser.add_argument("--words", type=int, default=50000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--file", help="Text file to use instead of a synthetic document")
+    args = parser.parse_args()
+
+    if args.file:
+        with open(args.file, encoding="utf-8", errors="ignore") as f:
+            text = f.read()
+    else:
+        text = synthetic_document(args.words)
+    print(f"Document: {len(text)} characters, {args.repeat} run(s)\n")
+    print(f"{'function':<22}{'legacy ms':>11}{'matcher ms':>12}{'speedup':>9}  same")
+
+    ok = True
+    for name, legacy, new in (
+        ("heuristic_score", legacy_heuristic, matcher_heuristic),
+        ("detect_document_type", legacy_document_scores, matcher_document_scores),
+        ("extract_features", legacy_keyword_counts, matcher_keyword_counts),
+        ("classify + detect", legacy_classify_then_detect, matcher_classify_then_detect),
+    ):
+        legacy_ms, legacy_result = timed(legacy, text, args.repeat)
+        new_ms, new_result = timed(new, text, args.repeat)
+        same = legacy_result == new_result
+        ok = ok and same
+        print(f"{name:<22}{legacy_ms:>11.2f}{new_ms:>12.2f}{legacy_ms / max(new_ms, 1e-9):>8.1f}x  {same}")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,100 @@
+"""
+Benchmark PDF text engines - Reports per-page extraction latency for each
+engine in extraction.engines over a corpus of PDFs.
+
+Usage:
+    python benchmark_extraction.py [PDF or directory ...] [--engines a,b] [--repeat N]
+
+With no paths, ../test.pdf is used. The ocr engine is skipped unless it
+is listed explicitly with --engines, since it needs the tesseract binary.
+"""
+import os
+import sys
+import time
+import argparse
+import statistics
+
+from extraction.engines import ENGINES, PDFSource, parse_engine_names
+from extraction.pages import has_text_layer
+
+
+def collect_pdfs(paths):
+    pdfs = []
+    for path in paths:
+        if os.path.isdir(path):
+            for root, _, files in os.walk(path):
+                pdfs.extend(os.path.join(root, f) for f in sorted(files) if f.lower().endswith(".pdf"))
+        elif path.lower().endswith(".pdf"):
+            pdfs.append(path)
+    return pdfs
+
+
+def benchmark_engine(name, pdf_path, repeat):
+    """
+    Time each page of one PDF with one engine
+
+    Returns:
+        tuple: (per-page seconds, pages with a usable text layer, characters)
+    """
+    timings, usable, chars = [], 0, 0
+    for run in range(repeat):
+        with open(pdf_path, "rb") as f:
+            engine = ENGINES[name](PDFSource(f))
+            try:
+                for i in range(engine.page_count()):
+                    start = time.perf_counter()
+                    text = engine.extract([i])[i]
+                    timings.append(time.perf_counter() - start)
+                    if run == 0:
+                        usable += has_text_layer(text)
+                        chars += len(text or "")
+            finally:
+                engine.close()
+    return timings, usable, chars
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark PDF text engines")
+    parser.add_argument("paths", nargs="*", default=[os.path.join("..", "test.pdf")])
+    parser.add_argument("--engines", default="pymupdf-fast,pdfplumber-layout")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    pdfs = collect_pdfs(args.paths)
+    if not pdfs:
+        print("No PDF files found")
+        return 1
+    engines = parse_engine_names(args.engines)
+
+    print(f"Corpus: {len(pdfs)} PDF(s), {args.repeat} run(s) per engine\n")
+    print(f"{'engine':<20}{'pages':>7}{'usable':>8}{'chars':>10}{'mean ms':>10}{'p50 ms':>9}{'p95 ms':>9}")
+    for name in engines:
+        timings, usable, chars = [], 0, 0
+        for pdf_path in pdfs:
+            try:
+                t, u, c = benchmark_engine(name, pdf_path, args.repeat)
+            except Exception as e:
+                print(f"{name}: {pdf_path} failed: {e}")
+                continue
+            timings.extend(t)
+            usable += u
+            chars += c
+        if not timings:
+            continue
+        pages = len(timings) // args.repeat
+        print(
+            f"{name:<20}{pages:>7}{usable:>8}{chars:>10}"
+            f"{statistics.mean(timings) * 1000:>10.2f}"
+            f"{percentile(timings, 50) * 1000:>9.2f}"
+            f"{percentile(timings, 95) * 1000:>9.2f}"
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,117 @@
+"""
+Load test /enhanced_analysis - Sends concurrent uploads and reports
+latency percentiles, throughput, status codes and cache statistics.
+
+Against a running server (e.g. gunicorn started with LLM_PROVIDER=mock):
+    python benchmark_load.py docs/*.pdf --url http://localhost:8000 --concurrency 8 --requests 200
+
+In-process, through the Flask test client (sets LLM_PROVIDER=mock unless
+already set):
+    python benchmark_load.py docs/*.pdf --concurrency 8 --requests 50
+
+Use MOCK_LLM_LATENCY, MOCK_LLM_ERROR_RATE and MOCK_LLM_MALFORMED_RATE to
+shape the simulated model (see analysis/mock.py).
+"""
+import os
+import sys
+import json
+import time
+import uuid
+import argparse
+import statistics
+import urllib.request
+import urllib.error
+from concurrent.futures import ThreadPoolExecutor
+
+
+def multipart_body(field, filename, data):
+    boundary = uuid.uuid4().hex
+    body = (
+        f"--{boundary}\r\n"
+        f'Content-Disposition: form-data; name="{field}"; filename="{os.path.basename(filename)}"\r\n'
+        f"Content-Type: application/octet-stream\r\n\r\n"
+    ).encode() + data + f"\r\n--{boundary}--\r\n".encode()
+    return body, f"multipart/form-data; boundary={boundary}"
+
+
+def http_sender(url):
+    def send(filename, data):
+        body, content_type = multipart_body("file", filename, data)
+        req = urllib.request.Request(f"{url}/enhanced_analysis", data=body, headers={"Content-Type": content_type})
+        try:
+            with urllib.request.urlopen(req, timeout=300) as resp:
+                resp.read()
+                return resp.status
+        except urllib.error.HTTPError as e:
+            return e.code
+
+    def stats():
+        with urllib.request.urlopen(f"{url}/cache_stats", timeout=30) as resp:
+            return json.loads(resp.read())
+    return send, stats
+
+
+def local_sender():
+    os.environ.setdefault("LLM_PROVIDER", "mock")
+    import io
+    import app
+    client = app.app.test_client()
+
+    def send(filename, data):
+        return client.post("/enhanced_analysis", data={"file": (io.BytesIO(data), os.path.basename(filename))}).status_code
+
+    def stats():
+        return client.get("/cache_stats").get_json()
+    return send, stats
+
+
+def percentile(values, q):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test /enhanced_analysis")
+    parser.add_argument("files", nargs="+", help="Documents to upload, sent round-robin")
+    parser.add_argument("--url", help="Server base URL (default: in-process test client)")
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--requests", type=int, default=20)
+    args = parser.parse_args()
+
+    documents = []
+    for path in args.files:
+        with open(path, "rb") as f:
+            documents.append((path, f.read()))
+    send, stats = http_sender(args.url.rstrip("/")) if args.url else local_sender()
+
+    def one(i):
+        filename, data = documents[i % len(documents)]
+        start = time.perf_counter()
+        status = send(filename, data)
+        return status, time.perf_counter() - start
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        results = list(pool.map(one, range(args.requests)))
+    elapsed = time.perf_counter() - start
+
+    latencies = [latency for _, latency in results]
+    codes = {}
+    for status, _ in results:
+        codes[status] = codes.get(status, 0) + 1
+
+    print(f"{args.requests} requests, concurrency {args.concurrency}, {elapsed:.1f} s "
+          f"({args.requests / elapsed:.2f} req/s)")
+    print(f"latency s: p50 {percentile(latencies, 0.5):.2f}  p95 {percentile(latencies, 0.95):.2f}  "
+          f"p99 {percentile(latencies, 0.99):.2f}  mean {statistics.mean(latencies):.2f}  max {max(latencies):.2f}")
+    print(f"status codes: {dict(sorted(codes.items()))}")
+    cache = stats()
+    for name in ("extraction", "analysis"):
+        if name in cache:
+            c = cache[name]
+            print(f"{name} cache: hits {c.get('hits')}  misses {c.get('misses')}  hit rate {c.get('hit_rate')}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,7 @@
+"""
+LegalKlarity Classification - Keyword cue matching shared by agreement
+classification, document type detection and the learning model, plus
+vectorized batch classification.
+"""
+from .matcher import CueMatcher, CueCounts
+from .batch import BatchClassifier
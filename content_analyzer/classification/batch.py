@@ -0,0 +1,181 @@
+"""
+Batch classification - Classifies many documents at once for backfill jobs.
+
+Every chunk and full text is scanned once with the shared CueMatcher into
+a sparse document x cue count matrix. Heuristic scores, chunk votes, vote
+ratios and document type scores are then computed with matrix operations
+over the whole batch instead of Python loops per document and keyword.
+Results are identical to classify_agreement and detect_document_type.
+"""
+import numpy as np
+from scipy import sparse
+
+
+class BatchClassifier:
+    """
+    Vectorized agreement classification and document type detection
+
+    Args:
+        matcher (CueMatcher): Matcher covering every cue below
+        section_cues (list): Cues whose whole-word presence makes up the heuristic score
+        document_types (dict): Document type -> keywords (substring presence)
+        chunker (callable): chunker(text, max_words, max_chunks) -> list of chunks
+        chunk_threshold (float): Heuristic score for a chunk to vote "agreement"
+        accept_threshold (float): Vote ratio or full-text score needed to accept
+        default_type (str): Document type when no keyword is found
+    """
+
+    def __init__(self, matcher, section_cues, document_types, chunker,
+                 chunk_threshold=0.5, accept_threshold=0.4,
+                 default_type="general legal document"):
+        self.matcher = matcher
+        self.chunker = chunker
+        self.chunk_threshold = chunk_threshold
+        self.accept_threshold = accept_threshold
+        self.default_type = default_type
+        self.columns = {cue: i for i, cue in enumerate(matcher.cues)}
+
+        self.section_columns = np.array([self.columns[c.lower()] for c in section_cues], dtype=np.intp)
+        self.section_total = max(1, len(section_cues))
+
+        # Cue x type indicator: presence matrix @ indicator = keyword hits per type
+        self.type_names = list(document_types)
+        rows, cols = [], []
+        for j, keywords in enumerate(document_types.values()):
+            for keyword in keywords:
+                rows.append(self.columns[keyword.lower()])
+                cols.append(j)
+        self.type_indicator = sparse.csr_matrix(
+            (np.ones(len(rows)), (rows, cols)), shape=(len(self.columns), len(self.type_names))
+        )
+
+    def cue_matrix(self, texts, whole_word=True):
+        """
+        Sparse text x cue occurrence counts
+
+        Args:
+            texts (list): Texts to scan
+            whole_word (bool): Count whole-word matches instead of substrings
+
+        Returns:
+            scipy.sparse.csr_matrix: Shape (len(texts), number of cues)
+        """
+        matrices = self._scan(texts)
+        return matrices[0] if whole_word else matrices[1]
+
+    def _scan(self, texts):
+        rows, ww_cols, ww_data = [], [], []
+        sub_rows, sub_cols, sub_data = [], [], []
+        columns = self.columns
+        for i, text in enumerate(texts):
+            counts = self.matcher.scan(text)
+            for cue, n in counts.whole_word.items():
+                rows.append(i)
+                ww_cols.append(columns[cue])
+                ww_data.append(n)
+            for cue, n in counts.substring.items():
+                sub_rows.append(i)
+                sub_cols.append(columns[cue])
+                sub_data.append(n)
+        shape = (len(texts), len(columns))
+        whole_word = sparse.csr_matrix((np.array(ww_data, dtype=np.int64), (rows, ww_cols)), shape=shape)
+        substring = sparse.csr_matrix((np.array(sub_data, dtype=np.int64), (sub_rows, sub_cols)), shape=shape)
+        return whole_word, substring
+
+    def _heuristic(self, whole_word):
+        found = (whole_word[:, self.section_columns] > 0).sum(axis=1)
+        return np.asarray(found).ravel() / self.section_total
+
+    def heuristic_scores(self, texts):
+        """
+        heuristic_score for every text
+
+        Returns:
+            numpy.ndarray: Fraction of section cues present, per text
+        """
+        return self._heuristic(self.cue_matrix(texts))
+
+    def _document_types(self, substring):
+        scores = (substring > 0).astype(np.float64) @ self.type_indicator
+        scores = np.asarray(scores.todense()) if sparse.issparse(scores) else np.asarray(scores)
+        if not len(self.type_names):
+            return [self.default_type] * substring.shape[0]
+        # argmax keeps the first of tied types, like max() over the dict
+        best = scores.argmax(axis=1)
+        best_score = scores[np.arange(scores.shape[0]), best]
+        return [self.type_names[b] if s > 0 else self.default_type for b, s in zip(best, best_score)]
+
+    def document_types(self, texts):
+        """
+        detect_document_type for every text
+
+        Returns:
+            list: Detected document type per text
+        """
+        return self._document_types(self.cue_matrix(texts, whole_word=False))
+
+    def classify(self, texts, max_words=300, max_chunks=10, with_document_type=False):
+        """
+        classify_agreement for every text
+
+        Args:
+            texts (list): Document texts
+            with_document_type (bool): Also add a "document_type" entry to
+                each details dict, from the same scan
+
+        Returns:
+            list: (accepted, details) per text, as classify_agreement returns
+        """
+        texts = [t or "" for t in texts]
+        n = len(texts)
+        non_empty = np.array([bool(t.strip()) for t in texts], dtype=bool)
+
+        # Rows 0..n-1 are the full texts, followed by every chunk
+        rows, doc_index, chunk_index = list(texts), [], []
+        for i in np.flatnonzero(non_empty):
+            chunks = self.chunker(texts[i], max_words=max_words, max_chunks=max_chunks)
+            rows.extend(chunks)
+            doc_index.extend([i] * len(chunks))
+            chunk_index.extend(range(len(chunks)))
+        doc_index = np.array(doc_index, dtype=np.intp)
+        chunk_index = np.array(chunk_index, dtype=np.intp)
+
+        whole_word, substring = self._scan(rows)
+        scores = self._heuristic(whole_word)
+        heuristic, chunk_scores = scores[:n], scores[n:]
+
+        n_chunks = np.bincount(doc_index, minlength=n)
+        votes = np.bincount(doc_index, weights=chunk_scores >= self.chunk_threshold, minlength=n).astype(np.int64)
+        ratio = np.divide(votes, n_chunks, out=np.zeros(n), where=n_chunks > 0)
+
+        # Sum chunk scores left to right, column by column, so the float
+        # result is bit-identical to sum() over the list
+        width = int(n_chunks.max()) if n else 0
+        padded = np.zeros((n, width))
+        padded[doc_index, chunk_index] = chunk_scores
+        total = np.zeros(n)
+        for j in range(width):
+            total = total + padded[:, j]
+        avg = total / np.maximum(1, n_chunks)
+
+        accept = non_empty & ((ratio >= self.accept_threshold) | (heuristic >= self.accept_threshold))
+        types = self._document_types(substring[:n]) if with_document_type else None
+
+        results = []
+        for i in range(n):
+            if not non_empty[i]:
+                details = {"chunks": 0, "votes": 0, "vote_ratio": 0.0, "heuristic": 0.0,
+                           "avg_chunk_score": 0.0, "reason": "empty_text"}
+            else:
+                details = {
+                    "chunks": int(n_chunks[i]),
+                    "votes": int(votes[i]),
+                    "vote_ratio": round(float(ratio[i]), 3),
+                    "heuristic": round(float(heuristic[i]), 3),
+                    "avg_chunk_score": round(float(avg[i]), 3),
+                    "reason": "" if accept[i] else "low_confidence"
+                }
+            if types is not None:
+                details["document_type"] = types[i]
+            results.append((bool(accept[i]), details))
+        return results
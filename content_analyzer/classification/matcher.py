@@ -0,0 +1,104 @@
+"""
+Single-pass keyword cue matching - Counts every cue in a text with one
+precompiled regex instead of one search per cue.
+
+The cues are compiled into a trie-shaped pattern wrapped in a lookahead,
+so the regex engine branches on the next character rather than trying
+each cue in turn, and matches that overlap are all found. Each match is
+counted both as a plain substring occurrence (like `cue in text`) and, if
+it sits on word boundaries, as a whole-word occurrence (like
+`re.search(r"\bcue\b", text)`).
+"""
+import re
+import functools
+from collections import Counter
+
+
+def _is_word_char(ch):
+    return ch.isalnum() or ch == "_"
+
+
+def _trie_pattern(words):
+    """
+    Regex source matching the longest of words at the current position
+    """
+    trie = {}
+    for word in words:
+        node = trie
+        for ch in word:
+            node = node.setdefault(ch, {})
+        node[""] = True
+
+    def build(node):
+        branches = [re.escape(ch) + build(child) for ch, child in sorted(node.items()) if ch]
+        if not branches:
+            return ""
+        body = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+        # A word ending here makes the rest optional; greedy keeps the longest
+        return "(?:" + body + ")?" if "" in node else body
+
+    return build(trie)
+
+
+class CueCounts:
+    """
+    Occurrence counts for every cue of a CueMatcher in one text
+    """
+
+    def __init__(self, substring, whole_word):
+        self.substring = substring
+        self.whole_word = whole_word
+
+    def count(self, cue, whole_word=True):
+        return (self.whole_word if whole_word else self.substring)[cue.lower()]
+
+    def present(self, cue, whole_word=True):
+        return self.count(cue, whole_word) > 0
+
+
+class CueMatcher:
+    """
+    Precompiled matcher for a fixed set of lower-case cue phrases
+
+    The most recent scans are memoized, so several callers looking at the
+    same text share a single pass.
+
+    Args:
+        cues (iterable): Cue words or phrases (case-insensitive)
+        cache_size (int): Number of recent texts whose counts are kept
+    """
+
+    def __init__(self, cues, cache_size=4):
+        self.cues = sorted({c.lower() for c in cues if c}, key=len, reverse=True)
+        self.pattern = re.compile("(?=(" + _trie_pattern(self.cues) + "))")
+        # The regex reports the longest cue at each position; shorter cues
+        # that are prefixes of it occur there too
+        self.prefixes = {
+            cue: [other for other in self.cues if other != cue and cue.startswith(other)]
+            for cue in self.cues
+        }
+        self._cached_scan = functools.lru_cache(maxsize=cache_size)(self._scan) if cache_size else self._scan
+
+    def scan(self, text):
+        """
+        Count every cue in text in a single pass
+
+        Returns:
+            CueCounts: Substring and whole-word counts per cue
+        """
+        return self._cached_scan(text or "")
+
+    def _scan(self, text):
+        t = text.lower()
+        n = len(t)
+        substring, whole_word = Counter(), Counter()
+        for match in self.pattern.finditer(t):
+            start = match.start()
+            longest = match.group(1)
+            left_ok = start == 0 or not _is_word_char(t[start - 1])
+            for cue in (longest, *self.prefixes[longest]):
+                substring[cue] += 1
+                end = start + len(cue)
+                if left_ok and (end == n or not _is_word_char(t[end])):
+                    whole_word[cue] += 1
+        return CueCounts(substring, whole_word)
@@ -0,0 +1,187 @@
+"""
+LegalKlarity Documents - Server-side sessions for analyzed documents: the
+extracted text, its analysis and its chat retrieval index, kept under a
+document id so follow-up requests (/chat, /submit_feedback, the next
+redline of a contract) send only the id.
+
+Each worker keeps recently used documents in memory, bounded by size with
+LRU eviction. Documents are also spilled to one SQLite database in WAL
+mode, shared by every gunicorn worker and bounded in size and age, so a
+document analyzed by one worker can be used from any other.
+"""
+import os
+import re
+import json
+import time
+import zlib
+import uuid
+import threading
+from collections import OrderedDict
+
+from extraction import DiskCache
+from analysis import ChunkIndex
+
+
+DOCUMENT_ID = re.compile(r"^[0-9a-f]{32}$")
+
+
+class MemoryLRU:
+    """
+    Thread-safe in-memory LRU bounded by the total size of its values
+
+    Args:
+        max_bytes (int): Total size before the least recently used entries go
+    """
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            self._entries.move_to_end(key)
+            return entry[0]
+
+    def set(self, key, value, size):
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.size -= old[1]
+            self._entries[key] = (value, size)
+            self.size += size
+            while self.size > self.max_bytes:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self.size -= evicted
+
+    def delete(self, key):
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is not None:
+                self.size -= entry[1]
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class DocumentStore:
+    """
+    Analyzed documents by document id
+
+    Records are never changed after they are saved (a revised document
+    gets a new id), so the per-worker memory copies cannot go stale.
+
+    Args:
+        cache_dir (str): Directory for the shared SQLite database
+        max_bytes (int): Total size of spilled documents before LRU eviction
+        ttl_seconds (int): Age after which a document is forgotten
+        memory_bytes (int): Size of the per-worker in-memory LRU
+        spill (bool): Also keep documents on disk, shared across workers
+    """
+
+    def __init__(self, cache_dir, max_bytes, ttl_seconds, memory_bytes=64 * 1024 * 1024, spill=True):
+        self.ttl_seconds = ttl_seconds or None
+        self.memory = MemoryLRU(memory_bytes)
+        self.disk = DiskCache(os.path.join(cache_dir, 'documents.sqlite3'), max_bytes, ttl_seconds=ttl_seconds) if spill else None
+        self.memory_hits = 0
+        self.memory_misses = 0
+
+    def save(self, text, analysis=None, document_type=None, filename=None, previous_document_id=None,
+             model_analysis=False, index=None):
+        """
+        Store a document
+
+        Args:
+            text (str): Extracted text
+            analysis (dict, optional): Its analysis
+            document_type (str, optional): Detected document type
+            filename (str, optional): Uploaded file name
+            previous_document_id (str, optional): Earlier version this one revises
+            model_analysis (bool): analysis came from the model (not a
+                fallback), so later revisions can be analyzed against it
+            index (ChunkIndex, optional): Chat retrieval index of the text
+
+        Returns:
+            str: New document id
+        """
+        document_id = uuid.uuid4().hex
+        record = {
+            "text": text,
+            "analysis": analysis,
+            "document_type": document_type,
+            "filename": filename,
+            "previous_document_id": previous_document_id,
+            "model_analysis": model_analysis,
+            "created": time.time(),
+        }
+        serialized = json.dumps(dict(record, index=index.to_dict() if index else None)).encode('utf-8')
+        self.memory.set(document_id, dict(record, index=index), len(serialized))
+        if self.disk is not None:
+            self.disk.set(document_id, zlib.compress(serialized))
+        return document_id
+
+    def get(self, document_id):
+        """
+        The stored document, or None if the id is unknown or expired
+
+        Returns:
+            dict: With "text", "analysis", "document_type", "filename",
+                "previous_document_id", "model_analysis", "created" and
+                "index" (ChunkIndex or None)
+        """
+        if not document_id or not DOCUMENT_ID.match(document_id):
+            return None
+        record = self.memory.get(document_id)
+        if record is not None and self.ttl_seconds and record["created"] < time.time() - self.ttl_seconds:
+            self.memory.delete(document_id)
+            record = None
+        if record is not None:
+            self.memory_hits += 1
+            return record
+        self.memory_misses += 1
+
+        value = self.disk.get(document_id) if self.disk is not None else None
+        if value is None:
+            return None
+        serialized = zlib.decompress(value)
+        record = json.loads(serialized.decode('utf-8'))
+        record["index"] = ChunkIndex.from_dict(record["index"]) if record.get("index") else None
+        self.memory.set(document_id, record, len(serialized))
+        return record
+
+    def stats(self):
+        return {
+            "memory": {
+                "hits": self.memory_hits,
+                "misses": self.memory_misses,
+                "entries": len(self.memory),
+                "size_bytes": self.memory.size,
+                "max_bytes": self.memory.max_bytes
+            },
+            "disk": self.disk.stats() if self.disk is not None else None
+        }
+
+
+# Global document store instance
+document_store = None
+
+
+def get_document_store():
+    """
+    Get the global document store instance
+    """
+    global document_store
+    if document_store is None:
+        cache_dir = os.getenv('DOCUMENTS_DIR', 'documents_data')
+        max_mb = int(os.getenv('DOCUMENTS_MAX_MB', '256'))
+        memory_mb = int(os.getenv('DOCUMENTS_MEMORY_MB', '64'))
+        ttl = int(os.getenv('DOCUMENTS_TTL_SECONDS', str(30 * 24 * 3600)))
+        spill = os.getenv('DOCUMENTS_SPILL', 'true').lower() in ('1', 'true', 'yes')
+        document_store = DocumentStore(cache_dir, max_mb * 1024 * 1024, ttl, memory_mb * 1024 * 1024, spill)
+    return document_store
@@ -0,0 +1,12 @@
+"""
+LegalKlarity Extraction - Text extraction helpers shared by the content
+analyzer endpoints.
+"""
+from .raster import RasterOptions, choose_dpi, render_page
+from .spool import SpooledFile, named_spool_file, stream_path, SPOOL_THRESHOLD_BYTES
+from .ocr import OCRPool, get_ocr_pool, shutdown_ocr_pool
+from .engines import ENGINES, PDFSource, TextEngine
+from .pages import PageStream, has_text_layer, iter_pdf_pages
+from .docx_stream import extract_docx_text, iter_docx_lines
+from .budget import ExtractionBudget, admit_extraction, current_rss_bytes
+from .cache import SQLiteConnections, DiskCache, ExtractionCache, file_digest, get_extraction_cache
@@ -0,0 +1,145 @@
+"""
+Memory-budgeted extraction - Caps how much of a very large document one
+request may extract, so a single 500-page upload can't push a worker into
+OOM and take down other in-flight requests.
+
+Each request is bounded by its own pages and characters, so documents
+extracted at the same time in one worker never count against each other.
+The worker's memory as a whole is checked once, when an extraction starts.
+"""
+import os
+
+
+# Returned by next() when a page iterator is exhausted
+_END = object()
+
+
+def current_rss_bytes():
+    """
+    Resident set size of this process, or None where it can't be read
+
+    Reads /proc on Linux. The peak RSS available elsewhere is not used:
+    it never comes down, so a gate based on it would stay shut after one
+    large document.
+    """
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def admit_extraction(max_rss_mb=None):
+    """
+    Whether this worker has the memory to start another extraction
+
+    A process-wide gate: the worker's resident memory is compared with
+    max_rss_mb before an extraction starts. Extractions already running
+    are never cut short by what their neighbours use.
+
+    Args:
+        max_rss_mb (int, optional): Limit in MB (default:
+            EXTRACTION_MAX_RSS_MB); 0 disables the check
+
+    Returns:
+        bool: False if the worker is over the limit
+    """
+    if max_rss_mb is None:
+        max_rss_mb = int(os.getenv('EXTRACTION_MAX_RSS_MB', '1024'))
+    rss = current_rss_bytes()
+    return not max_rss_mb or rss is None or rss <= max_rss_mb * 1024 * 1024
+
+
+class ExtractionBudget:
+    """
+    Limits on the pages and characters one request may extract
+
+    A limit of 0 or None disables that check. Sources given the budget
+    (iter_pdf_pages) set page_count once they have opened the document
+    and don't start extracting pages past max_pages.
+
+    Args:
+        max_pages (int): Maximum pages to read
+        max_chars (int): Maximum characters of text to keep
+    """
+
+    def __init__(self, max_pages=None, max_chars=None):
+        self.max_pages = max_pages or None
+        self.max_chars = max_chars or None
+        self.page_count = None
+        self.pages_read = 0
+        self.chars = 0
+        self.truncated = False
+        self.reason = None
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            max_pages=int(os.getenv('EXTRACTION_MAX_PAGES', '500')),
+            max_chars=int(os.getenv('EXTRACTION_MAX_CHARS', '2000000'))
+        )
+
+    def _stop(self, reason):
+        self.truncated = True
+        self.reason = reason
+
+    def _more_pages(self, pages):
+        # Whether pages beyond max_pages exist, asking the source for
+        # another page only when it did not report its page count
+        if self.page_count is not None:
+            return self.page_count > self.pages_read
+        return next(pages, _END) is not _END
+
+    def limit(self, pages):
+        """
+        Pass pages through until a limit is hit, then close the source
+
+        The page limit is checked before the next page is asked for, so
+        no page (or OCR window) is extracted only to be thrown away, and
+        closing the source generator stops any further parsing or OCR. The
+        page that crosses max_chars is cut to fit.
+
+        Args:
+            pages (iterator): Page texts
+
+        Yields:
+            str: Page texts within the budget
+        """
+        source, pages = pages, iter(pages)
+        try:
+            while True:
+                if self.max_pages and self.pages_read >= self.max_pages:
+                    if self._more_pages(pages):
+                        self._stop("max_pages")
+                    break
+                page = next(pages, _END)
+                if page is _END:
+                    break
+                page = page or ""
+                if self.max_chars and self.chars + len(page) > self.max_chars:
+                    page = page[:self.max_chars - self.chars]
+                    self._stop("max_chars")
+                self.pages_read += 1
+                self.chars += len(page)
+                yield page
+                if self.truncated:
+                    break
+        finally:
+            if hasattr(source, "close"):
+                source.close()
+
+    def report(self):
+        """
+        Summary for API responses
+        """
+        return {
+            "pages_read": self.pages_read,
+            "page_count": self.page_count,
+            "characters": self.chars,
+            "truncated": self.truncated,
+            "truncation_reason": self.reason,
+            "limits": {
+                "max_pages": self.max_pages,
+                "max_chars": self.max_chars
+            }
+        }
@@ -0,0 +1,305 @@
+"""
+Content-addressed extraction cache - Stores extracted page text on disk
+keyed by a hash of the uploaded bytes, so re-uploads of the same file skip
+parsing and OCR entirely.
+
+The cache is a single SQLite database in WAL mode, which lets every
+gunicorn worker read and write it concurrently.
+"""
+import os
+import json
+import time
+import zlib
+import sqlite3
+import hashlib
+import threading
+
+
+# Bump when extractor output changes so stale entries are never served
+EXTRACTION_VERSION = 3
+
+
+def file_digest(file_stream, chunk_size=1 << 20):
+    """
+    SHA-256 of a seekable binary stream, read in chunks
+
+    The stream is rewound before and after hashing.
+    """
+    digest = hashlib.sha256()
+    file_stream.seek(0)
+    for chunk in iter(lambda: file_stream.read(chunk_size), b""):
+        digest.update(chunk)
+    file_stream.seek(0)
+    return digest.hexdigest()
+
+
+class SQLiteConnections:
+    """
+    Per-thread connections to one SQLite database in WAL mode, reopened
+    after a fork, so the database can be shared by threads and gunicorn
+    workers
+
+    Args:
+        path (str): SQLite database file (its directory is created)
+        row_factory (optional): Row factory for the connections, e.g. sqlite3.Row
+    """
+
+    def __init__(self, path, row_factory=None):
+        self.path = path
+        self.row_factory = row_factory
+        self._local = threading.local()
+        directory = os.path.dirname(path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory, exist_ok=True)
+
+    def get(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            if self.row_factory is not None:
+                conn.row_factory = self.row_factory
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+
+class DiskCache:
+    """
+    Size-bounded LRU key/value store backed by SQLite
+
+    Safe to share between threads and processes. Any storage error is
+    logged and treated as a miss so the cache can never break a request.
+
+    Args:
+        path (str): SQLite database file
+        max_bytes (int): Total size of stored values before LRU eviction
+        ttl_seconds (int, optional): Age after which entries are treated as
+            misses and dropped (no expiry if unset)
+    """
+
+    def __init__(self, path, max_bytes, ttl_seconds=None):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds or None
+        self._connections = SQLiteConnections(path)
+        self._init_schema()
+
+    def _connect(self):
+        return self._connections.get()
+
+    def _init_schema(self):
+        try:
+            conn = self._connect()
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS entries ("
+                "key TEXT PRIMARY KEY, value BLOB NOT NULL, "
+                "size INTEGER NOT NULL, accessed REAL NOT NULL, "
+                "created REAL NOT NULL DEFAULT 0)"
+            )
+            columns = [row[1] for row in conn.execute("PRAGMA table_info(entries)")]
+            if 'created' not in columns:
+                # Databases from before TTL support
+                conn.execute("ALTER TABLE entries ADD COLUMN created REAL NOT NULL DEFAULT 0")
+            conn.execute("CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed)")
+            conn.execute("CREATE TABLE IF NOT EXISTS stats (name TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+        except sqlite3.Error as e:
+            print(f"Cache init error ({self.path}): {e}")
+
+    def _bump(self, conn, name, amount=1):
+        conn.execute(
+            "INSERT INTO stats (name, value) VALUES (?, ?) "
+            "ON CONFLICT(name) DO UPDATE SET value = value + excluded.value",
+            (name, amount)
+        )
+
+    def get(self, key):
+        """
+        Return the stored bytes for key, or None on a miss
+        """
+        try:
+            conn = self._connect()
+            row = conn.execute("SELECT value, created FROM entries WHERE key = ?", (key,)).fetchone()
+            now = time.time()
+            if row is not None and self.ttl_seconds and row[1] < now - self.ttl_seconds:
+                conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+                self._bump(conn, 'expirations')
+                row = None
+            if row is None:
+                self._bump(conn, 'misses')
+                return None
+            conn.execute("UPDATE entries SET accessed = ? WHERE key = ?", (now, key))
+            self._bump(conn, 'hits')
+            return row[0]
+        except sqlite3.Error as e:
+            print(f"Cache read error: {e}")
+            return None
+
+    def set(self, key, value):
+        """
+        Store bytes under key, evicting least recently used entries to
+        stay within max_bytes
+        """
+        size = len(value)
+        if size > self.max_bytes:
+            return
+        try:
+            conn = self._connect()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                now = time.time()
+                conn.execute(
+                    "INSERT OR REPLACE INTO entries (key, value, size, accessed, created) VALUES (?, ?, ?, ?, ?)",
+                    (key, sqlite3.Binary(value), size, now, now)
+                )
+                self._bump(conn, 'stores')
+                self._evict(conn)
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        except sqlite3.Error as e:
+            print(f"Cache write error: {e}")
+
+    def _evict(self, conn):
+        if self.ttl_seconds:
+            expired = conn.execute(
+                "DELETE FROM entries WHERE created < ?", (time.time() - self.ttl_seconds,)
+            ).rowcount
+            if expired:
+                self._bump(conn, 'expirations', expired)
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        evicted = []
+        for key, size in conn.execute("SELECT key, size FROM entries ORDER BY accessed ASC"):
+            if total <= self.max_bytes:
+                break
+            evicted.append((key,))
+            total -= size
+        conn.executemany("DELETE FROM entries WHERE key = ?", evicted)
+        self._bump(conn, 'evictions', len(evicted))
+
+    def clear(self):
+        try:
+            conn = self._connect()
+            conn.execute("DELETE FROM entries")
+            conn.execute("DELETE FROM stats")
+        except sqlite3.Error as e:
+            print(f"Cache clear error: {e}")
+
+    def stats(self):
+        """
+        Hit/miss counters and current size, aggregated across all workers
+        """
+        try:
+            conn = self._connect()
+            counters = dict(conn.execute("SELECT name, value FROM stats").fetchall())
+            entries, size = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries").fetchone()
+        except sqlite3.Error as e:
+            print(f"Cache stats error: {e}")
+            return {'error': str(e)}
+        hits, misses = counters.get('hits', 0), counters.get('misses', 0)
+        return {
+            'hits': hits,
+            'misses': misses,
+            'hit_rate': round(hits / (hits + misses), 3) if hits + misses else 0.0,
+            'stores': counters.get('stores', 0),
+            'evictions': counters.get('evictions', 0),
+            'expirations': counters.get('expirations', 0),
+            'entries': entries,
+            'size_bytes': size,
+            'max_bytes': self.max_bytes,
+            'ttl_seconds': self.ttl_seconds
+        }
+
+
+class ExtractionCache:
+    """
+    Caches the page texts extracted from an upload, keyed by file content
+    """
+
+    def __init__(self, cache_dir, max_bytes):
+        self.store = DiskCache(os.path.join(cache_dir, 'extraction.sqlite3'), max_bytes)
+
+    @staticmethod
+    def make_key(digest, kind):
+        return f"v{EXTRACTION_VERSION}:{kind}:{digest}"
+
+    def get_pages(self, key):
+        value = self.store.get(key)
+        if value is None:
+            return None
+        return json.loads(zlib.decompress(value).decode('utf-8'))
+
+    def set_pages(self, key, pages):
+        # Empty results are usually failed extractions; don't pin them
+        if not any((p or "").strip() for p in pages) or any(p is None for p in pages):
+            return
+        self.store.set(key, zlib.compress(json.dumps(pages).encode('utf-8')))
+
+    def cached_pages(self, file_stream, kind, extractor):
+        """
+        Page texts for an upload, served from the cache when possible
+
+        On a miss the extractor's pages are passed through lazily and only
+        stored once every page has been read, so a caller that stops early
+        never caches a partial document. Nor is a document cached when
+        the extractor reports failed pages (a "failed" attribute listing
+        them, as iter_pdf_pages does) or that it stopped short of the last
+        page (a true "truncated" attribute).
+
+        Args:
+            file_stream: Seekable binary stream of the upload
+            kind (str): Upload type, e.g. "pdf", "docx" or "image"
+            extractor (callable): Returns an iterable of page texts for a stream
+
+        Returns:
+            iterator: Page texts
+        """
+        key = self.make_key(file_digest(file_stream), kind)
+        pages = self.get_pages(key)
+        if pages is not None:
+            print(f"Extraction cache hit ({kind})")
+            return iter(pages)
+        return self._store_when_complete(key, extractor(file_stream))
+
+    def _store_when_complete(self, key, pages):
+        seen = []
+        try:
+            for page in pages:
+                seen.append(page)
+                yield page
+        finally:
+            if hasattr(pages, 'close'):
+                pages.close()
+        if getattr(pages, 'truncated', False):
+            print("Extraction not cached: stopped before the last page")
+            return
+        failed = getattr(pages, 'failed', None)
+        if failed:
+            # Pages that errored are retried on the next upload rather
+            # than served blank until the entry expires
+            print(f"Extraction not cached: {len(failed)} pages failed")
+            return
+        self.set_pages(key, seen)
+
+    def stats(self):
+        return self.store.stats()
+
+
+# Global extraction cache instance
+extraction_cache = None
+
+
+def get_extraction_cache():
+    """
+    Get the global extraction cache instance
+    """
+    global extraction_cache
+    if extraction_cache is None:
+        cache_dir = os.getenv('EXTRACTION_CACHE_DIR', 'extraction_cache')
+        max_mb = int(os.getenv('EXTRACTION_CACHE_MAX_MB', '512'))
+        extraction_cache = ExtractionCache(cache_dir, max_mb * 1024 * 1024)
+    return extraction_cache
@@ -0,0 +1,123 @@
+"""
+Streaming DOCX extraction - Reads text straight from the WordprocessingML
+parts inside the .docx zip with iterparse, instead of building the full
+python-docx object model.
+
+Unlike doc.paragraphs this also covers tables (one line per row, cells
+separated by " | "), text boxes, content controls and tracked insertions,
+plus the page headers and footers where party names and reference numbers
+often live. Parsed elements are discarded as soon as their text is taken,
+so memory stays flat however large the document is.
+"""
+import re
+import zipfile
+import xml.etree.ElementTree as ET
+
+
+W = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+
+# Elements whose children can be dropped once each child is processed
+_CONTAINERS = {W + "body", W + "hdr", W + "ftr"}
+
+
+def _part_sort_key(name):
+    # header1.xml, header2.xml, ... in numeric order
+    match = re.search(r"(\d+)\.xml$", name)
+    return int(match.group(1)) if match else 0
+
+
+def docx_parts(names):
+    """
+    The text-bearing parts of a .docx in reading order: headers, body,
+    footers
+    """
+    headers = sorted((n for n in names if re.match(r"word/header\d*\.xml$", n)), key=_part_sort_key)
+    footers = sorted((n for n in names if re.match(r"word/footer\d*\.xml$", n)), key=_part_sort_key)
+    body = ["word/document.xml"] if "word/document.xml" in names else []
+    return headers + body + footers
+
+
+def iter_part_lines(xml_file):
+    """
+    Yield the text lines of one WordprocessingML part
+
+    Args:
+        xml_file: Binary file object of the part XML
+
+    Yields:
+        str: One paragraph, or one table row
+    """
+    elems, paras, rows, cells = [], [], [], []
+    for event, elem in ET.iterparse(xml_file, events=("start", "end")):
+        tag = elem.tag
+        if event == "start":
+            elems.append(elem)
+            if tag == W + "p":
+                paras.append([])
+            elif tag == W + "tr":
+                rows.append([])
+            elif tag == W + "tc":
+                cells.append([])
+            continue
+
+        elems.pop()
+        line = None
+        if tag == W + "t" and paras:
+            paras[-1].append(elem.text or "")
+        elif tag == W + "tab" and paras:
+            paras[-1].append("\t")
+        elif tag in (W + "br", W + "cr") and paras:
+            paras[-1].append("\n")
+        elif tag == W + "p":
+            text = "".join(paras.pop())
+            if paras:
+                # Text box inside a paragraph: keep it inline
+                paras[-1].append(text)
+            else:
+                line = text
+        elif tag == W + "tc":
+            rows[-1].append(" ".join(t.strip() for t in cells.pop() if t.strip()))
+        elif tag == W + "tr":
+            row = rows.pop()
+            line = " | ".join(row) if any(row) else None
+
+        if line:
+            if cells:
+                # Paragraph or nested table row inside a table cell
+                cells[-1].append(line)
+            else:
+                yield line
+
+        parent = elems[-1] if elems else None
+        if parent is not None and parent.tag in _CONTAINERS:
+            parent.clear()
+
+
+def iter_docx_lines(file):
+    """
+    Yield the text lines of a .docx: headers, body and footers
+
+    Identical header/footer lines repeated across sections are only
+    yielded once.
+
+    Args:
+        file: Path or seekable binary file object of the .docx
+    """
+    with zipfile.ZipFile(file) as zf:
+        seen_edges = set()
+        for part in docx_parts(zf.namelist()):
+            is_edge = part != "word/document.xml"
+            with zf.open(part) as xml_file:
+                for line in iter_part_lines(xml_file):
+                    if is_edge:
+                        if line in seen_edges:
+                            continue
+                        seen_edges.add(line)
+                    yield line
+
+
+def extract_docx_text(file):
+    """
+    Full text of a .docx, one paragraph or table row per line
+    """
+    return "\n".join(iter_docx_lines(file))
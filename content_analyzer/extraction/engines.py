@@ -0,0 +1,143 @@
+"""
+Pluggable PDF text engines - Each engine extracts text for a set of pages;
+iter_pdf_pages tries them in order per page and keeps the first usable
+result.
+
+Engines:
+    pymupdf-fast       PyMuPDF's native text layer (fastest)
+    pdfplumber-layout  pdfplumber's layout-aware extraction (slower, copes
+                       with some PDFs PyMuPDF reads poorly)
+    ocr                Rasterize and OCR on the shared OCR pool
+"""
+import fitz
+import pdfplumber
+
+from .ocr import get_ocr_pool
+from .spool import SpooledFile
+
+
+class PDFSource:
+    """
+    An uploaded PDF shared by every engine working on it
+
+    Engines open the document by path. Streams not already backed by a
+    file on disk are spooled to a temp file once, on first use, and the
+    temp file is removed by close().
+    """
+
+    def __init__(self, file_stream):
+        self.file_stream = file_stream
+        self._spool = None
+
+    @property
+    def path(self):
+        if self._spool is None:
+            self._spool = SpooledFile(self.file_stream, suffix=".pdf")
+        return self._spool.path
+
+    def close(self):
+        if self._spool is not None:
+            self._spool.close()
+            self._spool = None
+
+
+class TextEngine:
+    """
+    Base class for PDF text engines
+    """
+    name = None
+
+    def __init__(self, source):
+        self.source = source
+
+    def page_count(self):
+        raise NotImplementedError
+
+    def extract(self, page_numbers):
+        """
+        Extract text for the given zero-based page indexes
+
+        Returns:
+            dict: Mapping of page index to text (None if the page failed)
+        """
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class PyMuPDFEngine(TextEngine):
+    name = "pymupdf-fast"
+
+    def __init__(self, source):
+        super().__init__(source)
+        self.doc = fitz.open(source.path, filetype="pdf")
+
+    def page_count(self):
+        return len(self.doc)
+
+    def extract(self, page_numbers):
+        texts = {}
+        for i in page_numbers:
+            try:
+                texts[i] = self.doc.load_page(i).get_text("text")
+            except Exception as e:
+                print(f"{self.name} page {i} error: {e}")
+                texts[i] = None
+        return texts
+
+    def close(self):
+        self.doc.close()
+
+
+class PdfPlumberEngine(TextEngine):
+    name = "pdfplumber-layout"
+
+    def __init__(self, source):
+        super().__init__(source)
+        self.pdf = pdfplumber.open(source.path)
+
+    def page_count(self):
+        return len(self.pdf.pages)
+
+    def extract(self, page_numbers):
+        texts = {}
+        for i in page_numbers:
+            page = self.pdf.pages[i]
+            try:
+                texts[i] = page.extract_text()
+            except Exception as e:
+                print(f"{self.name} page {i} error: {e}")
+                texts[i] = None
+            finally:
+                # Drop the parsed layout objects; only the text is kept
+                page.close()
+        return texts
+
+    def close(self):
+        self.pdf.close()
+
+
+class OCREngine(TextEngine):
+    name = "ocr"
+
+    def page_count(self):
+        with fitz.open(self.source.path, filetype="pdf") as doc:
+            return len(doc)
+
+    def extract(self, page_numbers):
+        return get_ocr_pool().ocr_pdf_pages(self.source.path, page_numbers)
+
+
+ENGINES = {engine.name: engine for engine in (PyMuPDFEngine, PdfPlumberEngine, OCREngine)}
+
+
+def parse_engine_names(value):
+    """
+    Parse a comma-separated engine list, dropping unknown names
+    """
+    names = [name.strip() for name in (value or "").split(",") if name.strip()]
+    unknown = [name for name in names if name not in ENGINES]
+    if unknown:
+        print(f"Ignoring unknown PDF text engines: {unknown}")
+    return [name for name in names if name in ENGINES]
@@ -0,0 +1,208 @@
+"""
+Parallel OCR for scanned PDFs and images - Fans pages out across a
+process pool so a long scanned document uses every core instead of one.
+"""
+import io
+import os
+import atexit
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import fitz
+import pytesseract
+from PIL import Image
+
+from .raster import RasterOptions, render_page, prepare_image
+
+
+def _open_pdf(pdf):
+    # Paths are opened in place; raw bytes are wrapped as a stream
+    if isinstance(pdf, str):
+        return fitz.open(pdf, filetype="pdf")
+    return fitz.open(stream=pdf, filetype="pdf")
+
+
+def _ocr_pdf_batch(pdf, page_numbers, options):
+    """
+    Worker task: OCR a batch of pages from one PDF
+
+    The document is opened once per batch rather than once per page. A
+    page that fails (e.g. a tesseract error) gets None instead of failing
+    the whole batch.
+    """
+    doc = _open_pdf(pdf)
+    try:
+        results = []
+        for i in page_numbers:
+            try:
+                results.append((i, pytesseract.image_to_string(render_page(doc[i], options))))
+            except Exception as e:
+                print(f"OCR page {i} error: {e}")
+                results.append((i, None))
+        return results
+    finally:
+        doc.close()
+
+
+def _ocr_image(image, options):
+    """
+    Worker task: OCR a single image given as a path or encoded bytes
+    """
+    with Image.open(image if isinstance(image, str) else io.BytesIO(image)) as img:
+        return pytesseract.image_to_string(prepare_image(img, options))
+
+
+def _mp_context():
+    """
+    Start method for OCR processes
+
+    The pool is created lazily from a gunicorn worker that already runs
+    job, batch and streaming threads and a gRPC channel; forking such a
+    process can deadlock the children. A fork server (or spawning, where
+    there is none) starts them from a clean process instead.
+    """
+    if "forkserver" in multiprocessing.get_all_start_methods():
+        context = multiprocessing.get_context("forkserver")
+        context.set_forkserver_preload([__name__])
+        return context
+    return multiprocessing.get_context("spawn")
+
+
+def default_workers():
+    """
+    OCR processes per web worker: the CPUs shared out among the
+    WEB_CONCURRENCY gunicorn workers, so together they don't oversubscribe
+    the machine
+    """
+    web_workers = max(1, int(os.getenv('WEB_CONCURRENCY', '4')))
+    return max(1, (os.cpu_count() or 1) // web_workers)
+
+
+def _split_batches(items, n_batches):
+    """
+    Split items into at most n_batches contiguous, similarly sized batches
+    """
+    n_batches = max(1, min(n_batches, len(items)))
+    size, extra = divmod(len(items), n_batches)
+    batches, start = [], 0
+    for b in range(n_batches):
+        end = start + size + (1 if b < extra else 0)
+        batches.append(items[start:end])
+        start = end
+    return batches
+
+
+class OCRPool:
+    """
+    Process pool that OCRs PDF pages and images in parallel and returns
+    results in input order.
+
+    With max_workers <= 1 everything runs inline in the calling process.
+    Otherwise even a single task (one image, one batch of pages) goes to
+    the pool, so the OCR of documents extracted concurrently (a batch
+    request, background jobs) shares its processes instead of running on
+    the calling threads.
+    """
+
+    def __init__(self, max_workers=None, raster=None):
+        self.max_workers = max_workers if max_workers is not None else default_workers()
+        self.raster = raster or RasterOptions()
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(max_workers=self.max_workers, mp_context=_mp_context())
+            return self._executor
+
+    def _reset_executor(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False)
+                self._executor = None
+
+    def _run(self, fn, arg_lists):
+        """
+        Run fn over arg_lists on the pool, falling back to inline execution
+        if the pool is unavailable or a worker died.
+        """
+        if self.max_workers <= 1 or not arg_lists:
+            return [fn(*args) for args in arg_lists]
+        try:
+            executor = self._get_executor()
+            futures = [executor.submit(fn, *args) for args in arg_lists]
+            return [f.result() for f in futures]
+        except BrokenProcessPool as e:
+            print(f"OCR pool broken, retrying inline: {e}")
+            self._reset_executor()
+            return [fn(*args) for args in arg_lists]
+
+    def ocr_pdf_pages(self, pdf, page_numbers=None):
+        """
+        OCR pages of a PDF in parallel
+
+        Passing a path is preferred: workers then open the file themselves
+        instead of receiving a pickled copy of the whole document.
+
+        Args:
+            pdf (str or bytes): Path to the PDF, or its raw content
+            page_numbers (list, optional): Zero-based page indexes (all pages if None)
+
+        Returns:
+            dict: Mapping of page index to OCR text (None if the page failed)
+        """
+        if page_numbers is None:
+            with _open_pdf(pdf) as doc:
+                page_numbers = list(range(len(doc)))
+        page_numbers = list(page_numbers)
+        if not page_numbers:
+            return {}
+
+        # Two batches per worker keeps cores busy when page costs vary
+        batches = _split_batches(page_numbers, self.max_workers * 2)
+        results = self._run(_ocr_pdf_batch, [(pdf, batch, self.raster) for batch in batches])
+        return {i: text for batch in results for i, text in batch}
+
+    def ocr_images(self, images):
+        """
+        OCR images in parallel
+
+        Args:
+            images (list): Image paths or raw image bytes (PNG, JPEG, ...)
+
+        Returns:
+            list: OCR text for each image, in input order
+        """
+        return self._run(_ocr_image, [(image, self.raster) for image in images])
+
+    def shutdown(self):
+        self._reset_executor()
+
+
+# Global OCR pool instance (created lazily so each gunicorn worker gets its own)
+ocr_pool = None
+
+
+def get_ocr_pool():
+    """
+    Get the global OCR pool instance
+    """
+    global ocr_pool
+    if ocr_pool is None:
+        max_workers = int(os.getenv('OCR_WORKERS', str(default_workers())))
+        ocr_pool = OCRPool(max_workers=max_workers, raster=RasterOptions.from_env())
+        atexit.register(shutdown_ocr_pool)
+    return ocr_pool
+
+
+def shutdown_ocr_pool():
+    """
+    Shut down the OCR worker processes
+    """
+    global ocr_pool
+    if ocr_pool:
+        ocr_pool.shutdown()
+        ocr_pool = None
@@ -0,0 +1,170 @@
+"""
+Lazy page-by-page PDF extraction - Lets callers stop reading a document
+as soon as they have seen enough of it.
+"""
+import os
+
+from .ocr import get_ocr_pool
+from .engines import ENGINES, PDFSource, parse_engine_names
+
+
+# Pages with fewer alphanumeric characters than this are OCR'd
+MIN_TEXT_LAYER_CHARS = int(os.getenv('MIN_TEXT_LAYER_CHARS', '25'))
+
+# Engines tried in order for each page until one returns usable text
+PDF_TEXT_ENGINES = parse_engine_names(
+    os.getenv('PDF_TEXT_ENGINES', 'pymupdf-fast,pdfplumber-layout,ocr')
+) or list(ENGINES)
+
+
+def has_text_layer(text, min_chars=MIN_TEXT_LAYER_CHARS):
+    """
+    Check whether a page's embedded text is substantial enough to trust
+
+    Scanned pages often carry no text layer at all, or only a stray page
+    number or watermark, so short results are treated as missing. Text
+    that is mostly replacement characters (fonts without a Unicode map)
+    is treated as missing too.
+    """
+    if not text:
+        return False
+    alnum = sum(1 for c in text if c.isalnum())
+    garbled = text.count("\ufffd")
+    return alnum >= min_chars and garbled * 10 < alnum
+
+
+def _ocr_window_size():
+    # Enough pages per window to keep every OCR worker busy
+    return max(1, get_ocr_pool().max_workers) * 2
+
+
+class PageStream:
+    """
+    Iterator over the page texts of a document that also records the
+    pages no engine could read
+
+    Attributes:
+        failed (list): Zero-based indexes of the pages read so far that
+            an engine failed on and none got usable text from
+        truncated (bool): Whether it stopped at the budget's max_pages
+            before the last page
+    """
+
+    def __init__(self, pages):
+        self.failed = []
+        self.truncated = False
+        self._pages = pages(self)
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        return next(self._pages)
+
+    def close(self):
+        self._pages.close()
+
+
+def iter_pdf_pages(file_stream, engines=None, budget=None):
+    """
+    Iterate over the text of each PDF page in order
+
+    Each page goes through the engines in order and keeps the first
+    result with a usable text layer. Pages are processed a window at a
+    time so pages falling through to OCR still run in parallel. Closing
+    the iterator early skips the remaining pages entirely.
+
+    Args:
+        file_stream: Seekable binary stream of the PDF
+        engines (list, optional): Engine names (defaults to PDF_TEXT_ENGINES)
+        budget (ExtractionBudget, optional): Gets the page count; no page
+            past its max_pages is extracted
+
+    Returns:
+        PageStream: Text of each page (possibly empty); pages that failed
+            are listed in its "failed" attribute
+    """
+    return PageStream(lambda stream: _pdf_pages(file_stream, engines, budget, stream))
+
+
+def _pdf_pages(file_stream, engines, budget, stream):
+    source = PDFSource(file_stream)
+    names = engines or PDF_TEXT_ENGINES
+    sessions = {}
+    used = {}
+
+    def session(name):
+        # Engines are opened on first use; one that can't open is skipped
+        if name not in sessions:
+            try:
+                sessions[name] = ENGINES[name](source)
+            except Exception as e:
+                print(f"PDF engine {name} unavailable: {e}")
+                sessions[name] = None
+        return sessions[name]
+
+    try:
+        page_count = None
+        for name in names:
+            engine = session(name)
+            if engine is not None:
+                try:
+                    page_count = engine.page_count()
+                    break
+                except Exception as e:
+                    print(f"PDF engine {name} error: {e}")
+        if page_count is None:
+            print("PDF extract error: no engine could open the document")
+            stream.failed.append(0)
+            return
+
+        last = page_count
+        if budget is not None:
+            budget.page_count = page_count
+            if budget.max_pages and budget.max_pages < page_count:
+                last = budget.max_pages
+                stream.truncated = True
+
+        window = _ocr_window_size()
+        for start in range(0, last, window):
+            texts = {i: None for i in range(start, min(start + window, last))}
+            chosen = {}
+            # Pages an engine errored on or could not be asked about
+            errored = set()
+            pending = list(texts)
+            for name in names:
+                if not pending:
+                    break
+                engine = session(name)
+                if engine is None:
+                    errored.update(pending)
+                    continue
+                if name != names[0]:
+                    print(f"PDF fallback to {name} for {len(pending)} of {len(texts)} pages")
+                try:
+                    results = engine.extract(pending)
+                except Exception as e:
+                    print(f"PDF engine {name} error: {e}")
+                    errored.update(pending)
+                    continue
+                errored.update(i for i in pending if results.get(i) is None)
+                for i, text in results.items():
+                    # Keep the longest partial result in case no engine does better
+                    if has_text_layer(text) or len((text or "").strip()) > len((texts[i] or "").strip()):
+                        texts[i] = text
+                        chosen[i] = name
+                pending = [i for i in pending if not has_text_layer(texts[i])]
+
+            for i in sorted(texts):
+                if not has_text_layer(texts[i]) and (i in errored or texts[i] is None):
+                    stream.failed.append(i)
+                if i in chosen:
+                    used[chosen[i]] = used.get(chosen[i], 0) + 1
+                yield texts[i]
+    finally:
+        for engine in sessions.values():
+            if engine is not None:
+                engine.close()
+        source.close()
+        if used:
+            print(f"PDF pages by engine: {used}")
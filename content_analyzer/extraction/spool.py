@@ -0,0 +1,72 @@
+"""
+Upload spooling - Keeps large uploads in a named temp file on disk so
+PyMuPDF, pdfplumber, python-docx and PIL can open them by path instead of
+each holding its own in-memory copy, and OCR workers can be handed a path
+instead of the whole document.
+"""
+import os
+import shutil
+import tempfile
+
+
+# Uploads larger than this are written to disk as they are received
+SPOOL_THRESHOLD_BYTES = int(os.getenv('UPLOAD_SPOOL_THRESHOLD_KB', '512')) * 1024
+
+# Directory for spooled uploads (system temp dir if unset)
+SPOOL_DIR = os.getenv('UPLOAD_SPOOL_DIR') or None
+
+
+def named_spool_file(suffix=""):
+    """
+    A named temp file that is deleted as soon as it is closed
+    """
+    return tempfile.NamedTemporaryFile("w+b", suffix=suffix, dir=SPOOL_DIR, delete=True)
+
+
+def stream_path(file_stream):
+    """
+    Path of the file backing a stream, or None for in-memory streams
+    """
+    name = getattr(file_stream, "name", None)
+    if isinstance(name, str) and os.path.isfile(name):
+        return name
+    return None
+
+
+class SpooledFile:
+    """
+    A path on disk holding the contents of file_stream
+
+    Streams already backed by a named file are used in place; anything else
+    is copied to a temp file once, in chunks, and removed on close().
+    """
+
+    def __init__(self, file_stream, suffix=""):
+        self.path = stream_path(file_stream)
+        self._owned = False
+        if self.path is None:
+            file_stream.seek(0)
+            with tempfile.NamedTemporaryFile("wb", suffix=suffix, dir=SPOOL_DIR, delete=False) as tmp:
+                shutil.copyfileobj(file_stream, tmp, 1 << 20)
+            self.path = tmp.name
+            self._owned = True
+        else:
+            # Make sure everything written so far is visible to other readers
+            if hasattr(file_stream, "flush"):
+                file_stream.flush()
+        file_stream.seek(0)
+
+    def close(self):
+        if self._owned and self.path:
+            try:
+                os.unlink(self.path)
+            except OSError as e:
+                print(f"Spool cleanup error: {e}")
+            self.path = None
+            self._owned = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
@@ -0,0 +1,174 @@
+"""
+LegalKlarity Jobs - Runs long document analyses in the background so the
+upload request can return a job id immediately instead of holding a
+gunicorn worker until the analysis finishes.
+"""
+import os
+import uuid
+import shutil
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from .store import JobStore
+
+
+class JobQueueFull(Exception):
+    """Raised when this worker already has the maximum number of pending jobs"""
+
+
+class JobManager:
+    """
+    Bounded pool of background job runners backed by a shared JobStore
+
+    Uploads are copied (hard-linked when possible) into the job directory
+    before the request returns, because Flask deletes its own copy when
+    the request ends.
+    """
+
+    def __init__(self, store, upload_dir, max_workers=2, max_pending=16):
+        self.store = store
+        self.upload_dir = upload_dir
+        self.max_pending = max_pending
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="job")
+        self._pending = 0
+        self._lock = threading.Lock()
+        if not os.path.exists(upload_dir):
+            os.makedirs(upload_dir, exist_ok=True)
+
+    def _save_upload(self, job_id, file_stream, filename):
+        path = os.path.join(self.upload_dir, job_id + os.path.splitext(filename)[1].lower())
+        source = getattr(file_stream, "name", None)
+        if isinstance(source, str) and os.path.isfile(source):
+            try:
+                file_stream.flush()
+                os.link(source, path)
+                return path
+            except (OSError, AttributeError):
+                pass
+        file_stream.seek(0)
+        with open(path, "wb") as out:
+            shutil.copyfileobj(file_stream, out, 1 << 20)
+        return path
+
+    def submit(self, kind, file_stream, filename, task):
+        """
+        Queue a job for an uploaded file
+
+        Args:
+            kind (str): Job type, e.g. "enhanced_analysis"
+            file_stream: Binary stream of the upload
+            filename (str): Original file name
+            task (callable): task(file_stream, set_stage) -> (result dict, http status)
+
+        Returns:
+            str: Job id
+
+        Raises:
+            JobQueueFull: If max_pending jobs are already queued or running here
+        """
+        def prepare(job_id):
+            path = self._save_upload(job_id, file_stream, filename)
+
+            def run(set_stage):
+                try:
+                    with open(path, "rb") as saved:
+                        return task(saved, set_stage)
+                finally:
+                    try:
+                        os.remove(path)
+                    except OSError:
+                        pass
+            return run
+
+        return self._queue(kind, filename, prepare)
+
+    def submit_task(self, kind, label, task):
+        """
+        Queue a job whose input the task already holds (e.g. the detached
+        upload streams of a batch), so nothing is copied to the job directory
+
+        Args:
+            kind (str): Job type, e.g. "batch_analysis"
+            label (str): Shown as the job's filename when polled
+            task (callable): task(set_stage) -> (result dict, http status)
+
+        Returns:
+            str: Job id
+
+        Raises:
+            JobQueueFull: If max_pending jobs are already queued or running here
+        """
+        return self._queue(kind, label, lambda job_id: task)
+
+    def _queue(self, kind, label, prepare):
+        with self._lock:
+            if self._pending >= self.max_pending:
+                raise JobQueueFull(f"{self._pending} jobs already pending")
+            self._pending += 1
+
+        try:
+            self.store.purge_expired()
+            job_id = uuid.uuid4().hex
+            run = prepare(job_id)
+            self.store.create(job_id, kind, label)
+            self.executor.submit(self._run, job_id, run)
+            return job_id
+        except Exception:
+            with self._lock:
+                self._pending -= 1
+            raise
+
+    def _run(self, job_id, run):
+        try:
+            self.store.update(job_id, status="running", stage="started")
+
+            def set_stage(stage):
+                self.store.update(job_id, stage=stage)
+
+            result, http_status = run(set_stage)
+            self.store.update(job_id, status="completed", stage="completed", result=result, http_status=http_status)
+        except Exception as e:
+            print(f"Job {job_id} failed: {e}")
+            self.store.update(job_id, status="failed", error=str(e), http_status=500)
+        finally:
+            with self._lock:
+                self._pending -= 1
+
+    def get(self, job_id):
+        return self.store.get(job_id)
+
+    def stats(self):
+        return {
+            'jobs_by_status': self.store.counts(),
+            'pending_in_this_worker': self._pending,
+            'max_pending_per_worker': self.max_pending
+        }
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False)
+
+
+# Global job manager instance (one pool per gunicorn worker, shared store)
+job_manager = None
+_job_manager_lock = threading.Lock()
+
+
+def get_job_manager():
+    """
+    Get the global job manager instance
+    """
+    global job_manager
+    with _job_manager_lock:
+        if job_manager is None:
+            jobs_dir = os.getenv('JOBS_DIR', 'jobs_data')
+            store = JobStore(
+                os.path.join(jobs_dir, 'jobs.sqlite3'),
+                ttl_seconds=int(os.getenv('JOB_TTL_SECONDS', '3600'))
+            )
+            job_manager = JobManager(
+                store,
+                upload_dir=os.path.join(jobs_dir, 'uploads'),
+                max_workers=int(os.getenv('JOB_WORKERS', '2')),
+                max_pending=int(os.getenv('JOB_MAX_PENDING', '16'))
+            )
+    return job_manager
@@ -0,0 +1,129 @@
+"""
+Job store - Persists analysis job state in SQLite so any gunicorn worker
+can answer a status request for a job another worker is running.
+"""
+import os
+import json
+import time
+import socket
+import sqlite3
+
+from extraction import SQLiteConnections
+
+
+def _process_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        # Exists but belongs to someone else
+        return True
+    return True
+
+
+class JobStore:
+    """
+    SQLite-backed table of jobs with status, stage and result
+
+    Rows expire ttl_seconds after they were created. Each job records the
+    worker process that runs it; jobs left queued or running by a worker
+    that has since exited are marked failed when a store is opened.
+    """
+
+    def __init__(self, path, ttl_seconds):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.host = socket.gethostname()
+        self._connections = SQLiteConnections(path, row_factory=sqlite3.Row)
+        conn = self._connect()
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            "id TEXT PRIMARY KEY, kind TEXT NOT NULL, status TEXT NOT NULL, stage TEXT NOT NULL, "
+            "filename TEXT, http_status INTEGER, result TEXT, error TEXT, "
+            "created REAL NOT NULL, updated REAL NOT NULL, expires REAL NOT NULL, owner TEXT)"
+        )
+        columns = [row[1] for row in conn.execute("PRAGMA table_info(jobs)")]
+        if 'owner' not in columns:
+            # Databases from before owners were recorded
+            conn.execute("ALTER TABLE jobs ADD COLUMN owner TEXT")
+        conn.execute("CREATE INDEX IF NOT EXISTS jobs_expires ON jobs (expires)")
+        self.fail_orphaned()
+
+    def _connect(self):
+        return self._connections.get()
+
+    def create(self, job_id, kind, filename):
+        now = time.time()
+        self._connect().execute(
+            "INSERT INTO jobs (id, kind, status, stage, filename, created, updated, expires, owner) "
+            "VALUES (?, ?, 'queued', 'queued', ?, ?, ?, ?, ?)",
+            (job_id, kind, filename, now, now, now + self.ttl_seconds, f"{self.host}:{os.getpid()}")
+        )
+
+    def fail_orphaned(self):
+        """
+        Mark queued or running jobs whose worker process on this host has
+        exited (or that have no recorded owner) as failed
+
+        Returns:
+            int: Number of jobs marked failed
+        """
+        conn = self._connect()
+        rows = conn.execute(
+            "SELECT id, owner FROM jobs WHERE status IN ('queued', 'running') AND expires > ?", (time.time(),)
+        ).fetchall()
+        orphaned = []
+        for job_id, owner in rows:
+            host, _, pid = (owner or "").rpartition(":")
+            if owner and host != self.host:
+                continue
+            if owner and pid.isdigit() and _process_alive(int(pid)):
+                continue
+            orphaned.append(job_id)
+        for job_id in orphaned:
+            conn.execute(
+                "UPDATE jobs SET status = 'failed', error = ?, http_status = 500, updated = ? "
+                "WHERE id = ? AND status IN ('queued', 'running')",
+                ("The worker running this job exited before it finished", time.time(), job_id)
+            )
+        if orphaned:
+            print(f"Marked {len(orphaned)} orphaned jobs failed")
+        return len(orphaned)
+
+    def update(self, job_id, **fields):
+        """
+        Update status, stage, http_status, result or error for a job
+        """
+        if 'result' in fields and fields['result'] is not None:
+            fields['result'] = json.dumps(fields['result'])
+        fields['updated'] = time.time()
+        columns = ", ".join(f"{name} = ?" for name in fields)
+        self._connect().execute(f"UPDATE jobs SET {columns} WHERE id = ?", (*fields.values(), job_id))
+
+    def get(self, job_id):
+        """
+        Job as a dict, or None if it doesn't exist or has expired
+        """
+        row = self._connect().execute("SELECT * FROM jobs WHERE id = ? AND expires > ?", (job_id, time.time())).fetchone()
+        if row is None:
+            return None
+        job = dict(row)
+        if job['result'] is not None:
+            job['result'] = json.loads(job['result'])
+        return job
+
+    def purge_expired(self):
+        """
+        Delete expired jobs
+
+        Returns:
+            int: Number of jobs removed
+        """
+        return self._connect().execute("DELETE FROM jobs WHERE expires <= ?", (time.time(),)).rowcount
+
+    def counts(self):
+        rows = self._connect().execute(
+            "SELECT status, COUNT(*) FROM jobs WHERE expires > ? GROUP BY status", (time.time(),)
+        ).fetchall()
+        return {status: count for status, count in rows}
@@ -11,7 +11,17 @@ from sklearn.feature_extraction.text import TfidfVectorizer
 from sklearn.ensemble import RandomForestClassifier
 from sklearn.model_selection import train_test_split
 from sklearn.metrics import classification_report
-import re
+
+from classification import CueMatcher
+
+
+# Legal-specific keywords counted as model features
+LEGAL_KEYWORDS = [
+    'agreement', 'contract', 'party', 'obligation', 'liability', 'warranty',
+    'indemnification', 'termination', 'jurisdiction', 'arbitration', 'dispute',
+    'compliance', 'regulation', 'penalty', 'remedy', 'condition', 'clause'
+]
+LEGAL_KEYWORD_MATCHER = CueMatcher(LEGAL_KEYWORDS)
 
 
 class DocumentAnalysisLearner:
@@ -45,16 +55,9 @@ class DocumentAnalysisLearner:
         char_count = len(text)
         avg_word_length = np.mean([len(word) for word in text.split()]) if text.split() else 0
         
-        # Legal-specific features
-        legal_keywords = [
-            'agreement', 'contract', 'party', 'obligation', 'liability', 'warranty',
-            'indemnification', 'termination', 'jurisdiction', 'arbitration', 'dispute',
-            'compliance', 'regulation', 'penalty', 'remedy', 'condition', 'clause'
-        ]
-        
-        keyword_counts = []
-        for keyword in legal_keywords:
-            keyword_counts.append(len(re.findall(r'\b' + re.escape(keyword) + r'\b', text.lower())))
+        # Legal-specific features, counted in a single pass
+        counts = LEGAL_KEYWORD_MATCHER.scan(text)
+        keyword_counts = [counts.count(keyword) for keyword in LEGAL_KEYWORDS]
         
         # Combine text features with statistics
         features = {
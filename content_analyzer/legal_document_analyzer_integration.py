@@ -20,11 +20,13 @@ Integration points with existing LegalKlarity:
 """
 
 # Required imports (add to existing imports)
-import json
 import textwrap
 from datetime import datetime
 import google.cloud.aiplatform as aiplatform
-from vertexai.generative_models import GenerativeModel, Part
+from analysis import (
+    get_llm_client, prewarm_llm, compact_text, get_index_cache, salvage_analysis,
+    ANALYSIS_SECTION_CHARS, ANALYSIS_TOKEN_BUDGET, CHARS_PER_TOKEN, CHAT_TOP_K, CHAT_TOKEN_BUDGET
+)
 
 # Configuration (add to environment variables)
 GOOGLE_CLOUD_PROJECT = "your-google-cloud-project-id"  # Add to .env
@@ -37,6 +39,8 @@ def initialize_vertex_ai():
         project=GOOGLE_CLOUD_PROJECT,
         location=GOOGLE_CLOUD_LOCATION
     )
+    # Open the shared LLM client's connection before the first request
+    prewarm_llm()
 
 # Enhanced document analysis function (replace or add to existing functions)
 def analyze_legal_document(text, document_type=None):
@@ -55,6 +59,10 @@ def analyze_legal_document(text, document_type=None):
     if not document_type:
         document_type = detect_document_type(text)
     
+    # Strip headers, footers and page numbers and fit the text into the
+    # app's budget; this reference sends one prompt, so at most one section's worth
+    text = compact_text(text, max_tokens=min(ANALYSIS_TOKEN_BUDGET, ANALYSIS_SECTION_CHARS // CHARS_PER_TOKEN)).text
+    
     # Enhanced prompt engineering for comprehensive analysis
     prompt = f"""
     Analyze the following {document_type or 'legal document'} and provide a comprehensive analysis.
@@ -121,31 +129,20 @@ def analyze_legal_document(text, document_type=None):
     }}
     
     Document Text:
-    {text[:50000]}  # Limit to prevent token overflow
+    {text}
     """
     
     try:
-        # Initialize Gemini model
-        model = GenerativeModel("gemini-1.5-flash-001")
-        
-        # Generate response
-        response = model.generate_content(
-            prompt,
-            generation_config={
-                "temperature": 0.4,
-                "top_p": 0.8,
-                "top_k": 40,
-                "max_output_tokens": 8192,
-            }
-        )
+        # Shared client; model and generation settings live in analysis/llm.py
+        response_text = get_llm_client("analysis").generate(prompt)
         
-        # Parse and validate JSON response
-        analysis = json.loads(response.text)
-        return analysis
+        # Keep every field that parses, even from fenced or truncated output
+        salvaged = salvage_analysis(response_text)
+        if not salvaged.fields:
+            return create_fallback_analysis(text)
+        fallback = create_fallback_analysis(text)
+        return dict(salvaged.fields, **{field: fallback[field] for field in salvaged.missing})
         
-    except json.JSONDecodeError as e:
-        # Fallback to basic analysis if JSON parsing fails
-        return create_fallback_analysis(text)
     except Exception as e:
         # Return error structure
         return {
@@ -234,11 +231,14 @@ def chat_about_document(text, question):
     Returns:
         str: AI-generated answer
     """
+    # BM25 over clause-sized chunks, built once per document; send only the
+    # top CHAT_TOP_K chunks for this question (CHAT_TOKEN_BUDGET tokens at most)
+    excerpt, _ = get_index_cache().get_or_build(text).excerpt(question, k=CHAT_TOP_K, max_tokens=CHAT_TOKEN_BUDGET)
     prompt = f"""
     Based on the following document, answer the question accurately and concisely.
     
     Document:
-    {text[:10000]}  # Limit for context window
+    {excerpt}
     
     Question: {question}
     
@@ -246,9 +246,7 @@ def chat_about_document(text, question):
     """
     
     try:
-        model = GenerativeModel("gemini-1.5-flash-001")
-        response = model.generate_content(prompt)
-        return response.text
+        return get_llm_client("chat").generate(prompt)
     except Exception as e:
         return f"Unable to answer the question due to: {str(e)}"
 
@@ -0,0 +1,288 @@
+"""
+LegalKlarity Single-Flight - Coalesces identical requests that are in
+flight at the same time, so a double-clicked upload or a client retry
+after a timeout waits for the running extraction and analysis and shares
+its result instead of starting a second one.
+
+Within a worker, callers with the same key wait on the first caller's
+thread. Across gunicorn workers, the first caller holds an exclusive lock
+on a per-key lock file and writes a fresh run token into it; the others
+register as waiters for that token, block on the lock and, once it is
+released, read the result the holder left next to it for them. A result
+is only handed to callers that waited for that run (a re-upload after
+it finished is analyzed again) and is removed once the last of them has
+read it.
+
+Cross-worker coordination needs fcntl (Linux, macOS); elsewhere only
+callers in the same worker are coalesced.
+"""
+import os
+import copy
+import json
+import time
+import uuid
+import hashlib
+import tempfile
+import threading
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+
+# Lock files untouched for this long are removed
+LOCK_MAX_AGE_SECONDS = 24 * 3600
+
+
+class Flight:
+    """
+    One computation in progress in this worker
+    """
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Runs one computation per key at a time and shares its result
+
+    Args:
+        lock_dir (str): Directory for lock and result files, shared by the
+            workers to coordinate
+        wait_seconds (float): Longest a caller waits for another's result
+            before computing its own
+        result_ttl_seconds (float): Longest a finished result is kept for
+            waiters that have not read it yet
+    """
+
+    def __init__(self, lock_dir, wait_seconds=110, result_ttl_seconds=30):
+        self.lock_dir = lock_dir
+        self.wait_seconds = wait_seconds
+        self.result_ttl_seconds = result_ttl_seconds
+        self._flights = {}
+        self._lock = threading.Lock()
+        self.counters = {"leaders": 0, "shared_thread": 0, "shared_process": 0, "wait_timeouts": 0}
+
+    def _bump(self, name):
+        with self._lock:
+            self.counters[name] += 1
+
+    def run(self, key, fn, on_wait=None):
+        """
+        Run fn() unless an identical call is already running, in which case
+        wait for it and return its result
+
+        Args:
+            key (str): Identifies identical calls (e.g. content hash and options)
+            fn (callable): The computation; its result must be JSON-serializable
+            on_wait (callable, optional): Called once if this call has to wait
+
+        Returns:
+            tuple: (result, shared) where shared is None if this call ran
+                fn, "thread" if it got the result of another thread in this
+                worker and "process" if it got it from another worker
+
+        Raises:
+            Exception: Whatever fn raised, in this call or in the
+                same-worker call it waited for
+        """
+        name = hashlib.sha256(key.encode('utf-8')).hexdigest()[:32]
+        with self._lock:
+            flight = self._flights.get(name)
+            leader = flight is None
+            if leader:
+                flight = self._flights[name] = Flight()
+
+        if not leader:
+            on_wait and on_wait()
+            if not flight.done.wait(self.wait_seconds):
+                self._bump("wait_timeouts")
+                return fn(), None
+            if flight.error is not None:
+                raise flight.error
+            self._bump("shared_thread")
+            return copy.deepcopy(flight.result), "thread"
+
+        try:
+            result, shared = self._run_locked(name, fn, on_wait)
+            flight.result = result
+            return result, shared
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                self._flights.pop(name, None)
+            flight.done.set()
+
+    def _run_locked(self, name, fn, on_wait):
+        """
+        Run fn() holding the cross-worker lock for name, or return the
+        result of the run this call waited for in another worker
+        """
+        if fcntl is None:
+            self._bump("leaders")
+            return fn(), None
+        try:
+            os.makedirs(self.lock_dir, exist_ok=True)
+            lock_file = open(os.path.join(self.lock_dir, name + ".lock"), "a+")
+        except OSError as e:
+            print(f"Single-flight lock unavailable: {e}")
+            self._bump("leaders")
+            return fn(), None
+
+        result_path = os.path.join(self.lock_dir, name + ".json")
+        with lock_file:
+            acquired, waited_for, wait_path = self._acquire(lock_file, name, on_wait)
+            try:
+                if acquired and waited_for:
+                    # Keep a lock file in use from looking abandoned to _purge
+                    os.utime(lock_file.name)
+                    result = self._read_result(result_path, waited_for)
+                    self._leave(name, waited_for, wait_path, result_path)
+                    wait_path = None
+                    if result is not None:
+                        self._bump("shared_process")
+                        return result, "process"
+                self._bump("leaders")
+                if not acquired:
+                    return fn(), None
+                # Waiters from now on wait for this run; a result left by an
+                # earlier one is never handed out
+                token = uuid.uuid4().hex
+                lock_file.seek(0)
+                lock_file.truncate()
+                lock_file.write(token)
+                lock_file.flush()
+                self._remove(result_path)
+                result = fn()
+                if self._waiting(name, token):
+                    self._write_result(result_path, token, result)
+                return result, None
+            finally:
+                if wait_path:
+                    self._remove(wait_path)
+                if acquired:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _acquire(self, lock_file, name, on_wait):
+        """
+        Take the lock for name, waiting up to wait_seconds if it is held
+
+        Returns:
+            tuple: (acquired, token of the run waited for or None, path of
+                this caller's wait file or None)
+        """
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            return True, None, None
+        except BlockingIOError:
+            pass
+        # Register as a waiter of the run holding the lock
+        lock_file.seek(0)
+        token = lock_file.read().strip() or None
+        wait_path = None
+        if token:
+            wait_path = os.path.join(self.lock_dir, f"{name}.{token}.{uuid.uuid4().hex}.wait")
+            try:
+                open(wait_path, "w").close()
+            except OSError:
+                token = wait_path = None
+        on_wait and on_wait()
+        deadline = time.monotonic() + self.wait_seconds
+        delay = 0.05
+        while time.monotonic() < deadline:
+            time.sleep(delay)
+            delay = min(delay * 2, 0.5)
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                return True, token, wait_path
+            except BlockingIOError:
+                continue
+        self._bump("wait_timeouts")
+        return False, None, wait_path
+
+    def _wait_files(self, name, token):
+        prefix = f"{name}.{token}."
+        try:
+            return [e.path for e in os.scandir(self.lock_dir) if e.name.startswith(prefix) and e.name.endswith(".wait")]
+        except OSError:
+            return []
+
+    def _waiting(self, name, token):
+        return bool(self._wait_files(name, token))
+
+    def _leave(self, name, token, wait_path, result_path):
+        """
+        Deregister a waiter that holds the lock; the last one removes the result
+        """
+        if wait_path:
+            self._remove(wait_path)
+        if not self._wait_files(name, token):
+            self._remove(result_path)
+
+    @staticmethod
+    def _remove(path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    def _read_result(self, path, token):
+        try:
+            if time.time() - os.path.getmtime(path) > self.result_ttl_seconds:
+                return None
+            with open(path) as f:
+                stored = json.load(f)
+            return stored["result"] if stored.get("token") == token else None
+        except (OSError, ValueError, KeyError, AttributeError):
+            return None
+
+    def _write_result(self, path, token, result):
+        try:
+            with tempfile.NamedTemporaryFile("w", dir=self.lock_dir, suffix=".tmp", delete=False) as f:
+                json.dump({"token": token, "result": result}, f)
+            os.replace(f.name, path)
+            self._purge()
+        except (OSError, TypeError, ValueError) as e:
+            print(f"Single-flight result not shared: {e}")
+
+    def _purge(self):
+        now = time.time()
+        for entry in os.scandir(self.lock_dir):
+            try:
+                age = now - entry.stat().st_mtime
+                if (entry.name.endswith(".json") and age > self.result_ttl_seconds) or \
+                        (entry.name.endswith((".lock", ".tmp", ".wait")) and age > LOCK_MAX_AGE_SECONDS):
+                    os.remove(entry.path)
+            except OSError:
+                continue
+
+    def stats(self):
+        with self._lock:
+            return dict(self.counters, in_flight=len(self._flights), cross_process=fcntl is not None)
+
+
+# Global single-flight instance (one per gunicorn worker, coordinating
+# with the others through SINGLEFLIGHT_DIR)
+single_flight = None
+_single_flight_lock = threading.Lock()
+
+
+def get_single_flight():
+    """
+    Get the global single-flight instance
+    """
+    global single_flight
+    with _single_flight_lock:
+        if single_flight is None:
+            single_flight = SingleFlight(
+                os.getenv('SINGLEFLIGHT_DIR', os.path.join(tempfile.gettempdir(), 'legalklarity_singleflight')),
+                wait_seconds=float(os.getenv('SINGLEFLIGHT_WAIT_SECONDS', '110')),
+                result_ttl_seconds=float(os.getenv('SINGLEFLIGHT_RESULT_SECONDS', '30'))
+            )
+    return single_flight
@@ -0,0 +1,92 @@
+import sys
+import os
+
+# Add the content_analyzer directory to the Python path
+sys.path.append(os.path.join(os.path.dirname(__file__), '.'))
+
+from analysis.compaction import clean_text, PAGE_BREAK
+
+
+def rent_schedule_pages():
+    """
+    Three pages with a running header and footer, a rent table whose
+    amounts and years stand on lines of their own, and signature blocks
+    """
+    header = "RESIDENTIAL LEASE AGREEMENT"
+    footer = "Acme Properties Ltd - Confidential"
+    return [
+        "\n".join([
+            header,
+            "Rent schedule",
+            "Year",
+            "2024",
+            "Monthly rent",
+            "9500",
+            "Year",
+            "2025",
+            "Monthly rent",
+            "9975",
+            footer,
+            "Page 1 of 3",
+        ]),
+        "\n".join([
+            header,
+            "The Tenant shall pay the rent on the first day of each month.",
+            "Landlord",
+            "Signature: ____________",
+            "Tenant",
+            "Signature: ____________",
+            footer,
+            "2",
+        ]),
+        "\n".join([
+            header,
+            "Witnesses",
+            "Landlord",
+            "Signature: ____________",
+            "Tenant",
+            "Signature: ____________",
+            "Landlord",
+            "Tenant",
+            footer,
+            "3",
+        ]),
+    ]
+
+
+def test_table_and_signature_blocks_are_kept():
+    text, removed = clean_text(PAGE_BREAK.join(rent_schedule_pages()))
+    lines = text.split("\n")
+
+    for value in ("9500", "9975", "2024", "2025"):
+        assert value in lines, f"{value} was removed"
+    assert lines.count("Landlord") == 3
+    assert lines.count("Tenant") == 3
+    assert lines.count("Signature: ____________") == 4
+
+
+def test_page_numbers_headers_and_footers_are_removed():
+    text, removed = clean_text(PAGE_BREAK.join(rent_schedule_pages()))
+    lines = text.split("\n")
+
+    assert removed["page_numbers"] == 3
+    assert "Page 1 of 3" not in lines
+    assert "2" not in lines and "3" not in lines
+    # The first header and footer are kept, the repeats are not
+    assert lines.count("RESIDENTIAL LEASE AGREEMENT") == 1
+    assert lines.count("Acme Properties Ltd - Confidential") == 1
+    assert removed["headers_footers"] == 4
+
+
+def test_bare_numbers_without_page_breaks_are_kept():
+    text, removed = clean_text("Deposit\n9500\nTerm in months\n12\nYear\n2024")
+
+    assert removed["page_numbers"] == 0
+    assert text.split("\n") == ["Deposit", "9500", "Term in months", "12", "Year", "2024"]
+
+
+if __name__ == "__main__":
+    test_table_and_signature_blocks_are_kept()
+    test_page_numbers_headers_and_footers_are_removed()
+    test_bare_numbers_without_page_breaks_are_kept()
+    print("Compaction tests passed!")